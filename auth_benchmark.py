@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Auth hot-path benchmark suite for The Melanin Bank Content Planner
+Measures hash_password, verify_password, create_access_token, verify_token and the
+get_current_user dependency (in-process through the FastAPI app) at several
+concurrency levels, reporting ops/sec, p50/p95/p99 latency and event-loop blocking,
+then compares get_current_user with and without the decoded token cache.
+
+Loop lag is report-only by default, since it depends on the box. With
+AUTH_BENCH_MAX_LOOP_LAG_MS set, exits non-zero if an operation that is supposed to
+be loop-safe stalls the event loop for longer than that, so regressions in
+backend/auth.py can be caught before deploy.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+
+import httpx
+from fastapi import Depends
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth
+from main import app
+
+auth.revocation_list.load_empty()
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+OPS = int(os.environ.get("AUTH_BENCH_OPS", 2000))
+BCRYPT_OPS = int(os.environ.get("AUTH_BENCH_BCRYPT_OPS", 16))
+CONCURRENCY_LEVELS = [int(c) for c in os.environ.get("AUTH_BENCH_CONCURRENCY", "1,8,32").split(",")]
+DISTINCT_TOKENS = int(os.environ.get("AUTH_BENCH_TOKENS", 50))
+CACHE_ITERATIONS = int(os.environ.get("AUTH_BENCH_CACHE_ITERATIONS", 20000))
+# Unset means lag is only reported
+MAX_LOOP_LAG_MS = float(os.environ["AUTH_BENCH_MAX_LOOP_LAG_MS"]) if os.environ.get("AUTH_BENCH_MAX_LOOP_LAG_MS") else None
+LAG_PROBE_INTERVAL = 0.001
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LoopLagMonitor:
+    """Wakes up every millisecond and records how late each wake-up was"""
+
+    def __init__(self):
+        self.blocked = 0.0
+        self.max_lag = 0.0
+        self._task = None
+
+    async def _probe(self):
+        while True:
+            expected = time.perf_counter() + LAG_PROBE_INTERVAL
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            lag = time.perf_counter() - expected
+            if lag > LAG_PROBE_INTERVAL:
+                self.blocked += lag
+            self.max_lag = max(self.max_lag, lag)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+async def measure(operation, concurrency, total):
+    """Run operation total times across concurrency workers"""
+    samples = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for i in remaining:
+            started = time.perf_counter()
+            await operation(i)
+            samples.append(time.perf_counter() - started)
+            # Yield so the lag probe can observe any time the operation held the loop
+            await asyncio.sleep(0)
+
+    # Let the lag probe start before any work is queued
+    with LoopLagMonitor() as monitor:
+        await asyncio.sleep(LAG_PROBE_INTERVAL * 2)
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    return {
+        "ops_per_sec": len(samples) / elapsed,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "loop_blocked_ms": monitor.blocked * 1000,
+        "max_loop_lag_ms": monitor.max_lag * 1000,
+    }
+
+
+def build_cases(client, tokens, hashed):
+    """(name, operation, total ops, must not block the loop)"""
+
+    async def hash_sync(i):
+        auth.hash_password("SecurePassword123!")
+
+    async def hash_async(i):
+        await auth.hash_password_async("SecurePassword123!")
+
+    async def verify_sync(i):
+        auth.verify_password("SecurePassword123!", hashed)
+
+    async def verify_async(i):
+        await auth.verify_password_async("SecurePassword123!", hashed)
+
+    async def create_token(i):
+        auth.create_access_token(f"user-{i}", f"user-{i}@melaninbank.com", token_version=i)
+
+    async def verify_token_cold(i):
+        auth.token_cache.clear()
+        auth.verify_token(tokens[i % len(tokens)])
+
+    async def verify_token_cached(i):
+        auth.verify_token(tokens[i % len(tokens)])
+
+    async def current_user(i):
+        response = await client.get(
+            "/api/__bench/whoami",
+            headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+        )
+        assert response.status_code == 200, response.text
+
+    return [
+        ("hash_password (on loop)", hash_sync, BCRYPT_OPS, False),
+        ("hash_password_async", hash_async, BCRYPT_OPS, True),
+        ("verify_password (on loop)", verify_sync, BCRYPT_OPS, False),
+        ("verify_password_async", verify_async, BCRYPT_OPS, True),
+        ("create_access_token", create_token, OPS, True),
+        ("verify_token (cache cold)", verify_token_cold, OPS, True),
+        ("verify_token (cache warm)", verify_token_cached, OPS, True),
+        ("get_current_user via ASGI", current_user, OPS, True),
+    ]
+
+
+async def run_suite():
+    async def whoami(current_user: dict = Depends(auth.get_current_user)):
+        return current_user
+
+    app.add_api_route("/api/__bench/whoami", whoami, methods=["GET"])
+
+    tokens = [
+        auth.create_access_token(f"user-{i}", f"user-{i}@melaninbank.com")
+        for i in range(DISTINCT_TOKENS)
+    ]
+    hashed = auth.hash_password("SecurePassword123!")
+    failures = []
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, operation, total, loop_safe in build_cases(client, tokens, hashed):
+            print(f"\n📊 {name} ({total} ops)")
+            print(f"   {'conc':>5} {'ops/sec':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'blocked ms':>11} {'max lag ms':>11}")
+            for concurrency in CONCURRENCY_LEVELS:
+                result = await measure(operation, concurrency, max(total, concurrency))
+                print(
+                    f"   {concurrency:>5} {result['ops_per_sec']:>10,.0f} {result['p50_ms']:>9.3f} "
+                    f"{result['p95_ms']:>9.3f} {result['p99_ms']:>9.3f} "
+                    f"{result['loop_blocked_ms']:>11.1f} {result['max_loop_lag_ms']:>11.2f}"
+                )
+                if loop_safe and MAX_LOOP_LAG_MS is not None and result["max_loop_lag_ms"] > MAX_LOOP_LAG_MS:
+                    failures.append(f"{name} @ {concurrency}: loop lag {result['max_loop_lag_ms']:.1f} ms")
+
+    print(f"\nPassword pool: {auth.password_pool.stats()}")
+    print(f"Token cache:   {auth.token_cache.stats()}")
+    await compare_token_cache(tokens)
+    auth.password_pool.shutdown()
+    return failures
+
+
+async def time_get_current_user(tokens, iterations):
+    """Call the get_current_user dependency the way FastAPI would"""
+    credentials = [
+        HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        for token in tokens
+    ]
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        await auth.get_current_user(credentials[i % len(credentials)])
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def compare_token_cache(tokens):
+    print(f"\n📊 get_current_user with and without the token cache ({CACHE_ITERATIONS} requests)")
+    print(f"   {'cache':<8} {'ops/sec':>10} {'mean µs':>9} {'p50 µs':>9} {'p99 µs':>9}")
+    original = auth.token_cache
+    means = {}
+    try:
+        for label, cache in (("off", auth.TokenCache(max_size=0)), ("on", auth.TokenCache(max_size=auth.JWT_CACHE_SIZE))):
+            auth.token_cache = cache
+            samples = await time_get_current_user(tokens, CACHE_ITERATIONS)
+            means[label] = sum(samples) / len(samples)
+            print(
+                f"   {label:<8} {len(samples) / sum(samples):>10,.0f} {means[label] * 1e6:>9.2f} "
+                f"{percentile(samples, 0.50) * 1e6:>9.2f} {percentile(samples, 0.99) * 1e6:>9.2f}"
+            )
+    finally:
+        auth.token_cache = original
+    print(f"   speedup {means['off'] / means['on']:.1f}x")
+
+
+def main():
+    failures = asyncio.run(run_suite())
+    if MAX_LOOP_LAG_MS is None:
+        print("\nLoop lag is report-only; set AUTH_BENCH_MAX_LOOP_LAG_MS to enforce a limit")
+        return
+    if failures:
+        print(f"\n❌ Event loop blocked for more than {MAX_LOOP_LAG_MS} ms:")
+        for failure in failures:
+            print(f"   {failure}")
+        sys.exit(1)
+    print("\n✅ No loop-safe auth operation blocked the event loop")
+
+
+if __name__ == "__main__":
+    main()
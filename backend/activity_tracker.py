@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from database import users_collection
+from query_monitor import query_tag
+
+# Activity tracker configuration
+ACTIVITY_FLUSH_INTERVAL_SECONDS = float(os.environ.get('ACTIVITY_FLUSH_INTERVAL_SECONDS', 10))
+ACTIVITY_FLUSH_MAX_BUFFER = int(os.environ.get('ACTIVITY_FLUSH_MAX_BUFFER', 500))
+
+logger = logging.getLogger(__name__)
+
+class ActivityTracker:
+    """Write-behind buffer for last_active and login_count on the users collection.
+
+    Logins are merged per user in memory and flushed with a single unordered
+    bulk_write every ACTIVITY_FLUSH_INTERVAL_SECONDS, or as soon as
+    ACTIVITY_FLUSH_MAX_BUFFER users are pending. Reads overlay the buffer and
+    the batch being written so callers never see a value older than the last
+    recorded login; a read that races a flush may briefly count that batch's
+    logins twice, but never drops them.
+    """
+
+    def __init__(self, collection, flush_interval: float = 10, max_buffer: int = 500):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._pending = {}  # user_id -> {"last_active": datetime, "logins": int}
+        self._flushing = {}  # the batch currently being written, same shape
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self._flush_task = None
+        self._flushes = 0
+        self._flushed_users = 0
+
+    def record_login(self, user_id: str, at: Optional[datetime] = None):
+        """Buffer a login for user_id"""
+        self._merge(user_id, {"last_active": at or datetime.utcnow(), "logins": 1})
+
+        if len(self._pending) >= self.max_buffer and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    def _merge(self, user_id: str, entry: dict):
+        current = self._pending.setdefault(user_id, {"last_active": entry["last_active"], "logins": 0})
+        current["last_active"] = max(current["last_active"], entry["last_active"])
+        current["logins"] += entry["logins"]
+
+    def overlay(self, user: dict) -> dict:
+        """Return user with any buffered or in-flight activity applied"""
+        entries = [
+            entry for entry in (self._flushing.get(user.get("id")), self._pending.get(user.get("id")))
+            if entry is not None
+        ]
+        if not entries:
+            return user
+
+        user = dict(user)
+        for entry in entries:
+            last_active = user.get("last_active")
+            if last_active is None or entry["last_active"] > last_active:
+                user["last_active"] = entry["last_active"]
+            user["login_count"] = user.get("login_count", 0) + entry["logins"]
+        return user
+
+    async def flush(self) -> int:
+        """Write all buffered activity in one bulk_write, returning users flushed"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            pending, self._pending = self._pending, {}
+            self._flushing = pending
+            operations = [
+                UpdateOne(
+                    {"id": user_id},
+                    {
+                        "$max": {"last_active": entry["last_active"]},
+                        "$inc": {"login_count": entry["logins"]}
+                    }
+                )
+                for user_id, entry in pending.items()
+            ]
+
+            try:
+                with query_tag("activity_tracker.flush"):
+                    await self.collection.bulk_write(operations, ordered=False)
+            except Exception as e:
+                logger.error(f"Activity flush failed, keeping {len(pending)} users buffered: {str(e)}")
+                for user_id, entry in pending.items():
+                    self._merge(user_id, entry)
+                return 0
+            finally:
+                self._flushing = {}
+
+            self._flushes += 1
+            self._flushed_users += len(pending)
+            return len(pending)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write out anything still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_users": len(self._pending),
+            "flushing_users": len(self._flushing),
+            "flushes": self._flushes,
+            "flushed_users": self._flushed_users,
+            "flush_interval_seconds": self.flush_interval,
+            "max_buffer": self.max_buffer
+        }
+
+activity_tracker = ActivityTracker(
+    users_collection,
+    flush_interval=ACTIVITY_FLUSH_INTERVAL_SECONDS,
+    max_buffer=ACTIVITY_FLUSH_MAX_BUFFER
+)
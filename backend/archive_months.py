@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Move months older than ARCHIVE_AFTER_MONTHS into the compressed month_archive.
+
+Each user-month becomes one archive document with its posts embedded and long
+text fields zlib-compressed. Archived months are restored automatically the
+next time they are read or written. Months restored within the last
+ARCHIVE_RESTORE_GRACE_DAYS are left alone. Safe to run repeatedly, e.g. nightly.
+
+    python archive_months.py [--user USER_ID] [--dry-run]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from database import archive_cold_months, client
+
+async def main(user_id, dry_run: bool) -> int:
+    report = await archive_cold_months(user_id=user_id, dry_run=dry_run)
+    if report["cutoff"] is None:
+        print("Archiving is disabled (ARCHIVE_AFTER_MONTHS=0)")
+        client.close()
+        return 0
+    
+    print(f"Months before {report['cutoff']}: {report['months_checked']} checked, "
+          f"{report['skipped']} skipped, {report['failed']} failed")
+    saved = report["live_bytes"] - report["archived_bytes"]
+    print(f"{report['archived']} months / {report['posts']} posts: "
+          f"{report['live_bytes'] / 1024:.0f} KiB live -> {report['archived_bytes'] / 1024:.0f} KiB archived "
+          f"({saved / 1024:.0f} KiB saved)")
+    if dry_run:
+        print("Dry run: nothing was archived")
+    else:
+        print(f"✅ Archived {report['archived']} user-months")
+    
+    client.close()
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", help="only archive months of this user id")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be archived without moving anything")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.user, args.dry_run)))
@@ -2,15 +2,33 @@ from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections import deque, OrderedDict
+import asyncio
 import bcrypt
+import hashlib
 import os
+import time
 from typing import Optional
 
+from database import get_user_principal
+
 # JWT Configuration
 JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'melanin-bank-secret-key-change-in-production')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_TIME_HOURS = 24
 
+# Password hashing pool configuration
+PASSWORD_POOL_KIND = os.environ.get('PASSWORD_POOL_KIND', 'thread')  # thread or process
+PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', min(4, os.cpu_count() or 1)))
+PASSWORD_POOL_MAX_QUEUE = int(os.environ.get('PASSWORD_POOL_MAX_QUEUE', 32))
+
+# Decoded token cache configuration
+JWT_CACHE_SIZE = int(os.environ.get('JWT_CACHE_SIZE', 4096))
+
+# Revocation list configuration
+REVOCATION_REFRESH_SECONDS = float(os.environ.get('REVOCATION_REFRESH_SECONDS', 5))
+
 security = HTTPBearer()
 
 def hash_password(password: str) -> str:
@@ -23,29 +41,286 @@ def verify_password(password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
 
-def create_access_token(user_id: str, email: str) -> str:
-    """Create a JWT access token"""
+def _timed_call(func, *args):
+    """Run func in a pool worker and report when it actually started"""
+    started = time.monotonic()
+    return started, func(*args)
+
+class PasswordPool:
+    """Bounded worker pool that keeps bcrypt work off the event loop.
+
+    At most ``workers + max_queue`` operations may be in flight; anything
+    beyond that is rejected with a 503 instead of queueing behind a login storm.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 1, max_queue: int = 0):
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = None
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_samples = deque(maxlen=1024)
+        self._max_wait = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="password-pool"
+                )
+        return self._executor
+
+    async def run(self, func, *args):
+        """Run a password function on the pool, rejecting when saturated"""
+        if self._in_flight >= self.workers + self.max_queue:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, please try again",
+                headers={"Retry-After": "1"}
+            )
+
+        self._in_flight += 1
+        submitted = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            started, result = await loop.run_in_executor(
+                self._get_executor(), _timed_call, func, *args
+            )
+        finally:
+            self._in_flight -= 1
+
+        wait = max(0.0, started - submitted)
+        self._wait_samples.append(wait)
+        self._max_wait = max(self._max_wait, wait)
+        self._completed += 1
+        return result
+
+    def stats(self) -> dict:
+        """Snapshot of pool usage and wait time (milliseconds)"""
+        samples = sorted(self._wait_samples)
+
+        def percentile(p: float) -> float:
+            if not samples:
+                return 0.0
+            index = min(len(samples) - 1, int(round(p * (len(samples) - 1))))
+            return round(samples[index] * 1000, 3)
+
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "wait_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(self._max_wait * 1000, 3)
+            }
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_pool = PasswordPool(
+    kind=PASSWORD_POOL_KIND,
+    workers=PASSWORD_POOL_WORKERS,
+    max_queue=PASSWORD_POOL_MAX_QUEUE
+)
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the password pool"""
+    return await password_pool.run(hash_password, password)
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    """Verify a password on the password pool"""
+    return await password_pool.run(verify_password, password, hashed_password)
+
+def create_access_token(
+    user_id: str,
+    email: str,
+    role: str = "user",
+    approval_status: str = "approved",
+    token_version: int = 0
+) -> str:
+    """Create a JWT access token carrying the user's authorization claims"""
     expire = datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_TIME_HOURS)
     payload = {
         "user_id": user_id,
         "email": email,
+        "role": role,
+        "approval_status": approval_status,
+        "tv": token_version,
         "exp": expire,
         "iat": datetime.utcnow()
     }
     token = jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
     return token
 
+class TokenCache:
+    """Bounded LRU of decoded token payloads keyed by a digest of the token.
+
+    Entries are dropped once the token's ``exp`` passes, so a hit never
+    outlives the token it was decoded from.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max(0, max_size)
+        self._entries = OrderedDict()  # digest -> (exp, payload)
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evicted = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return a cached payload for token, or None on a miss"""
+        if not self.max_size:
+            self._misses += 1
+            return None
+
+        key = self._digest(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+
+        exp, payload = entry
+        if exp <= time.time():
+            del self._entries[key]
+            self._expired += 1
+            self._misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return dict(payload)
+
+    def put(self, token: str, payload: dict):
+        """Cache a verified payload until its exp claim"""
+        exp = payload.get("exp")
+        if not self.max_size or not isinstance(exp, (int, float)):
+            return
+
+        key = self._digest(token)
+        self._entries[key] = (exp, dict(payload))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evicted += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self._hits,
+            "misses": self._misses,
+            "expired": self._expired,
+            "evicted": self._evicted,
+            "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0
+        }
+
+token_cache = TokenCache(max_size=JWT_CACHE_SIZE)
+
+class RevocationList:
+    """In-memory view of which users' tokens must be rejected.
+
+    Holds the ids of suspended or denied users plus the current token
+    version of anyone whose version was bumped. It is rebuilt from Mongo
+    every REVOCATION_REFRESH_SECONDS and patched locally on admin actions,
+    so checking a token never needs a database read once it has loaded.
+    Until the first rebuild succeeds it knows nothing, and callers must
+    check users against the database instead.
+
+    Deleted users are remembered for tombstone_ttl, after which every token
+    they held has expired.
+    """
+
+    def __init__(self, tombstone_ttl: timedelta = timedelta(hours=JWT_EXPIRATION_TIME_HOURS)):
+        self.tombstone_ttl = tombstone_ttl
+        self._blocked = set()
+        self._versions = {}
+        self._deleted = {}  # user_id -> deleted_at
+        self.loaded_at = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def replace(self, blocked: set, versions: dict):
+        self._blocked = set(blocked)
+        self._versions = dict(versions)
+        self.loaded_at = datetime.utcnow()
+        self._prune_deleted(self.loaded_at)
+
+    def load_empty(self):
+        """Mark the list loaded with nobody revoked, for processes that never run the refresh task"""
+        self.replace(set(), {})
+
+    def _prune_deleted(self, now: datetime):
+        cutoff = now - self.tombstone_ttl
+        self._deleted = {user_id: at for user_id, at in self._deleted.items() if at > cutoff}
+
+    def revoke_user(self, user_id: str, token_version: Optional[int] = None):
+        self._blocked.add(user_id)
+        if token_version is not None:
+            self._versions[user_id] = max(token_version, self._versions.get(user_id, 0))
+
+    def restore_user(self, user_id: str):
+        self._blocked.discard(user_id)
+
+    def mark_deleted(self, user_id: str, at: Optional[datetime] = None):
+        # Deleted users have no document left to rebuild from, so keep them across refreshes
+        self._deleted[user_id] = at or datetime.utcnow()
+
+    def is_revoked(self, payload: dict) -> bool:
+        user_id = payload.get("user_id")
+        if user_id in self._blocked or user_id in self._deleted:
+            return True
+        return payload.get("tv", 0) < self._versions.get(user_id, 0)
+
+    def stats(self) -> dict:
+        return {
+            "blocked_users": len(self._blocked),
+            "versioned_users": len(self._versions),
+            "deleted_users": len(self._deleted),
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None
+        }
+
+revocation_list = RevocationList()
+
 def verify_token(token: str) -> Optional[dict]:
-    """Verify and decode a JWT token"""
+    """Verify and decode a JWT token, skipping verification on a cache hit"""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        token_cache.put(token, payload)
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has expired"
         )
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
@@ -62,7 +337,24 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Invalid authentication token"
         )
     
+    if revocation_list.is_revoked(payload):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked"
+        )
+    
+    if not revocation_list.loaded:
+        # An empty list would accept suspended users, so ask the database until it loads
+        principal = await get_user_principal(payload.get("user_id"))
+        if not principal or not principal["is_active"] or principal["approval_status"] == "denied":
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked"
+            )
+    
     return {
         "user_id": payload.get("user_id"),
-        "email": payload.get("email")
+        "email": payload.get("email"),
+        "role": payload.get("role"),
+        "approval_status": payload.get("approval_status")
     }
\ No newline at end of file
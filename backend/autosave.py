@@ -0,0 +1,465 @@
+import asyncio
+import copy
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from autosave_entries import (
+    new_entry, apply_set, apply_unset, apply_entry, fold, view, blocking_prefix, unchanged_paths
+)
+from database import (
+    monthly_data_collection, upsert_monthly_data, patch_monthly_data,
+    merge_patch_update, bump_change_counters, set_analytics_metrics, is_cold_month,
+    restore_archived_month, upgrade_stored_month
+)
+from indexes import index_status
+from query_monitor import query_tag
+from schema import SCHEMA_VERSIONS
+
+# Autosave coalescing configuration
+AUTOSAVE_COALESCE = os.environ.get('AUTOSAVE_COALESCE', 'true').lower() == 'true'
+AUTOSAVE_FLUSH_INTERVAL_SECONDS = float(os.environ.get('AUTOSAVE_FLUSH_INTERVAL_SECONDS', 0.5))
+AUTOSAVE_IDLE_SECONDS = float(os.environ.get('AUTOSAVE_IDLE_SECONDS', 1.5))
+AUTOSAVE_MAX_DELAY_SECONDS = float(os.environ.get('AUTOSAVE_MAX_DELAY_SECONDS', 5))
+AUTOSAVE_MAX_BUFFER = int(os.environ.get('AUTOSAVE_MAX_BUFFER', 1000))
+
+# Fields of a saved month that are never written through $set
+INSERT_ONLY_FIELDS = ("_id", "id", "created_at", "user_id", "month_key", "updated_at", "schema_version")
+
+# The stale-flush guard relies on this index to turn a lost race into a duplicate key
+MONTH_UNIQUE_INDEX = "monthly_data.user_month_unique"
+
+# Attempts at merging a superseded month before its changes are dropped
+MERGE_ATTEMPTS = 3
+
+logger = logging.getLogger(__name__)
+
+class AutosaveBuffer:
+    """Write-behind buffer that coalesces autosaves of the same month.
+
+    Saves and merge patches of a (user_id, month_key) are folded into one set
+    of $set/$unset paths in memory. A month is written with a single upsert
+    once it has been idle for idle_seconds or pending for max_delay seconds,
+    whichever comes first, and everything left is written at shutdown.
+    overlay() applies pending changes to reads served by this worker. Other
+    workers keep serving the stored month until the flush, for at most
+    max_delay; the month's change counter is bumped as soon as a burst of
+    saves starts, so none of them answers 304 to an ETag from before it.
+    Deployments that need every worker to read a save at once should set
+    AUTOSAVE_COALESCE=false.
+
+    A flush only overwrites a stored month older than the buffered saves. When
+    another worker has written the month since, the buffered paths are merged
+    instead: each is applied only where the stored value still matches the
+    month as it was when buffering began, so the newer save wins where both
+    changed something and nothing else is lost. Coalescing waits for the
+    unique (user_id, month_key) index; until it exists saves go straight to
+    Mongo, since without it a stale flush would insert a second month.
+
+    Change counters and the analytics store are updated again after a flush;
+    until that has succeeded has_pending() stays true, so reads never hand
+    out an ETag for counters that do not cover the write. Folding saves into
+    entries lives in autosave_entries.py.
+    """
+
+    def __init__(self, collection, enabled: bool = True, flush_interval: float = 0.5,
+                 idle_seconds: float = 1.5, max_delay: float = 5, max_buffer: int = 1000):
+        self.collection = collection
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.idle_seconds = idle_seconds
+        self.max_delay = max_delay
+        self.max_buffer = max_buffer
+        self._pending = {}  # (user_id, month_key) -> entry
+        self._flushing = {}  # entries being written by the current flush
+        self._followups = {}  # written months whose counters are not bumped yet -> their metrics
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self._flush_task = None
+        self._saves = 0
+        self._flushes = 0
+        self._written = 0
+        self._dropped = 0
+        self._superseded = 0
+        self._conflicts = 0
+        self._discarded = set()  # users being deleted; their in-flight months are not written
+
+    async def _entry(self, user_id: str, month_key: str) -> dict:
+        key = (user_id, month_key)
+        entry = self._pending.get(key)
+        if entry is not None:
+            return entry
+
+        flushing = self._flushing.get(key)
+        if flushing is not None:
+            data_id = flushing["id"]
+            base = view(flushing)
+        else:
+            if is_cold_month(month_key):
+                await restore_archived_month(user_id, month_key)
+            # The flush stamps the current schema_version, so a legacy month is upgraded first
+            await upgrade_stored_month(user_id, month_key)
+            # The month as it is before these saves, to merge against if another worker writes it
+            base = await self.collection.find_one({"user_id": user_id, "month_key": month_key})
+            data_id = (base.get("id") or str(base["_id"])) if base else str(uuid.uuid4())
+
+        # Other workers read the month from Mongo until this entry is flushed. Moving
+        # its counter now means none of them answers 304 to a client holding an ETag
+        # from before the save; the bump after the flush retires the ETags they hand
+        # out meanwhile.
+        await bump_change_counters(user_id, [f"months:{month_key}"])
+
+        # A concurrent save may have created the entry while we looked up the id
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = new_entry(data_id, base)
+        return entry
+
+    def _touched(self, entry: dict):
+        self._saves += 1
+        entry["saves"] += 1
+        entry["last_at"] = time.monotonic()
+        entry["updated_at"] = datetime.utcnow()
+        if len(self._pending) >= self.max_buffer and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.get_running_loop().create_task(self._try_flush(force=True))
+
+    def coalescing(self) -> bool:
+        """Whether saves are buffered right now"""
+        return self.enabled and MONTH_UNIQUE_INDEX in index_status["ready"]
+
+    async def save(self, user_id: str, month_key: str, data: dict) -> str:
+        """Buffer a full save of a month, returning its stable id"""
+        if not self.coalescing():
+            return await upsert_monthly_data(user_id, month_key, data)
+
+        entry = await self._entry(user_id, month_key)
+        for field, value in data.items():
+            if field not in INSERT_ONLY_FIELDS:
+                apply_set(entry, field, copy.deepcopy(value))
+        # Same metric filter as upsert_monthly_data
+        entry["metrics"].update({
+            name: value for name, value in (data.get("analytics") or {}).items()
+            if name and "." not in name and not name.startswith("$")
+        })
+        self._touched(entry)
+        return entry["id"]
+
+    async def patch(self, user_id: str, month_key: str, patch: dict) -> str:
+        """Buffer a JSON Merge Patch of a month, returning its stable id"""
+        if not self.coalescing():
+            return await patch_monthly_data(user_id, month_key, patch)
+
+        sets, unsets = merge_patch_update(patch)
+        key = (user_id, month_key)
+        started = key not in self._pending
+        entry = await self._entry(user_id, month_key)
+        try:
+            await self._check_paths(user_id, month_key, sets)
+        except ValueError:
+            # Don't leave an empty entry behind to be flushed
+            if started and not entry["saves"] and self._pending.get(key) is entry:
+                del self._pending[key]
+            raise
+        for path in unsets:
+            apply_unset(entry, path)
+        for path, value in sets.items():
+            apply_set(entry, path, copy.deepcopy(value))
+        analytics = patch.get("analytics")
+        if isinstance(analytics, dict):
+            entry["metrics"].update({
+                name: value for name, value in analytics.items() if not isinstance(value, dict)
+            })
+        self._touched(entry)
+        return entry["id"]
+
+    async def _check_paths(self, user_id: str, month_key: str, sets: dict):
+        """Refuse paths Mongo could not set on the month, as patch_monthly_data would"""
+        nested = [path for path in sets if "." in path]
+        if not nested:
+            return
+        projection = {path.split(".", 1)[0]: 1 for path in nested}
+        stored = await self.collection.find_one({"user_id": user_id, "month_key": month_key}, dict(projection, _id=0))
+        month = self.overlay(user_id, month_key, stored)
+        for path in nested:
+            prefix = blocking_prefix(month, path)
+            if prefix is not None:
+                raise ValueError(f"Patch does not apply to the stored month: {prefix} is not an object")
+
+    def has_pending(self, user_id: str, month_key: str) -> bool:
+        """Whether the month has saves not yet stored or not yet reflected in its change counter"""
+        key = (user_id, month_key)
+        return key in self._pending or key in self._flushing or key in self._followups
+
+    def overlay(self, user_id: str, month_key: str, data: Optional[dict]) -> Optional[dict]:
+        """Return a stored month (or None) with any buffered saves applied"""
+        key = (user_id, month_key)
+        entries = [entry for entry in (self._flushing.get(key), self._pending.get(key)) if entry is not None]
+        if not entries:
+            return data
+
+        data = dict(data) if data else {"id": entries[0]["id"], "user_id": user_id, "month_key": month_key}
+        for entry in entries:
+            apply_entry(data, entry)
+        return data
+
+    async def discard_user(self, user_id: str) -> int:
+        """Drop buffered saves of a deleted user so a flush cannot recreate their months.
+
+        A flush already writing is waited for; it skips the user's months from
+        here on, so nothing of theirs is written once this returns.
+        """
+        self._discarded.add(user_id)
+        try:
+            async with self._flush_lock:
+                keys = [key for key in self._pending if key[0] == user_id]
+                for key in keys:
+                    del self._pending[key]
+                for key in [key for key in self._followups if key[0] == user_id]:
+                    del self._followups[key]
+        finally:
+            self._discarded.discard(user_id)
+        return len(keys)
+
+    @staticmethod
+    def _update(user_id: str, month_key: str, entry: dict) -> UpdateOne:
+        update = {
+            "$set": dict(
+                entry["sets"],
+                user_id=user_id,
+                month_key=month_key,
+                updated_at=entry["updated_at"],
+                schema_version=SCHEMA_VERSIONS["monthly_data"]
+            ),
+            "$setOnInsert": {"id": entry["id"], "created_at": entry["created_at"]}
+        }
+        if entry["unsets"]:
+            update["$unset"] = {path: "" for path in entry["unsets"]}
+        # Only a month last written before these saves (or never) matches
+        query = {
+            "user_id": user_id,
+            "month_key": month_key,
+            "$or": [{"updated_at": {"$lt": entry["updated_at"]}}, {"updated_at": None}]
+        }
+        return UpdateOne(query, update, upsert=True)
+
+    async def _merge(self, user_id: str, month_key: str, entry: dict) -> Optional[set]:
+        """Write the paths of a superseded entry that the newer save left alone.
+
+        Returns the paths written, or None if there were none.
+        """
+        query = {"user_id": user_id, "month_key": month_key}
+        for attempt in range(MERGE_ATTEMPTS):
+            stored = await self.collection.find_one(query)
+            if stored is None:
+                logger.warning(f"Dropping autosave of {month_key} for {user_id}: the month was deleted")
+                self._dropped += 1
+                return None
+            sets, unsets = unchanged_paths(entry, stored)
+            skipped = len(entry["sets"]) + len(entry["unsets"]) - len(sets) - len(unsets)
+            if not sets and not unsets:
+                self._conflicts += skipped
+                return None
+
+            update = {"$set": sets} if sets else {}
+            if unsets:
+                update["$unset"] = {path: "" for path in unsets}
+            # The stored month is newer, so its updated_at stays; fence on it against a third writer
+            try:
+                result = await self.collection.update_one(
+                    {"_id": stored["_id"], "updated_at": stored.get("updated_at")}, update
+                )
+            except OperationFailure as e:
+                logger.error(f"Dropping autosave of {month_key} for {user_id}: {(e.details or {}).get('errmsg', str(e))}")
+                self._dropped += 1
+                return None
+            if result.matched_count:
+                self._conflicts += skipped
+                if skipped:
+                    logger.info(f"Merged autosave of {month_key} for {user_id}; {skipped} paths changed by a newer save were kept")
+                return set(sets) | unsets
+
+        logger.warning(f"Dropping autosave of {month_key} for {user_id}: the month kept changing while merging")
+        self._dropped += 1
+        return None
+
+    async def _write(self, batch: dict, written: dict):
+        """Upsert every entry of batch in one unordered bulk_write.
+
+        Fills written with the keys that changed the stored month, mapped to
+        the paths written (None for all of them), as soon as each is stored.
+        """
+        keys = list(batch)
+        superseded = []
+        for attempt in range(2):
+            keys = [key for key in keys if key[0] not in self._discarded]
+            if not keys:
+                break
+            operations = [self._update(*key, batch[key]) for key in keys]
+            retry_keys = []
+            try:
+                with query_tag("autosave.flush"):
+                    await self.collection.bulk_write(operations, ordered=False)
+                failed = set()
+            except BulkWriteError as e:
+                failed = set()
+                for error in e.details.get("writeErrors", []):
+                    key = keys[error["index"]]
+                    failed.add(key)
+                    if error.get("code") == 11000 and not attempt:
+                        # A concurrent upsert inserted the month first, or the stored
+                        # month is newer; retrying as an update tells the two apart
+                        retry_keys.append(key)
+                    elif error.get("code") == 11000:
+                        superseded.append(key)
+                    else:
+                        # The paths do not fit the stored month; retrying cannot help
+                        logger.error(f"Dropping autosave of {key[1]} for {key[0]}: {error.get('errmsg')}")
+                        self._dropped += 1
+            for key in keys:
+                if key not in failed:
+                    written[key] = None
+            if not retry_keys:
+                break
+            keys = retry_keys
+
+        for key in superseded:
+            if key[0] in self._discarded:
+                continue
+            self._superseded += 1
+            with query_tag("autosave.merge"):
+                paths = await self._merge(*key, batch[key])
+            if paths:
+                written[key] = paths
+
+    def _requeue(self, batch: dict):
+        """Put a failed batch back under any saves made while it was being written"""
+        for key, entry in batch.items():
+            if key[0] in self._discarded:
+                continue
+            newer = self._pending.get(key)
+            if newer is not None:
+                fold(entry, newer)
+            self._pending[key] = entry
+
+    @staticmethod
+    def _written_metrics(entry: dict, paths: Optional[set]) -> dict:
+        """Metrics of entry whose analytics paths were written (all of them for a full write)"""
+        if paths is None or "analytics" in paths:
+            return entry["metrics"]
+        return {name: value for name, value in entry["metrics"].items() if f"analytics.{name}" in paths}
+
+    async def _run_followups(self):
+        """Bump change counters and store metrics of written months, keeping any that fail"""
+        by_user = {}
+        for key in self._followups:
+            by_user.setdefault(key[0], []).append(key)
+        for user_id, keys in by_user.items():
+            if user_id not in self._discarded:
+                await bump_change_counters(user_id, [f"months:{month_key}" for _, month_key in keys])
+                for key in keys:
+                    metrics = self._followups[key]
+                    if metrics:
+                        await set_analytics_metrics(user_id, key[1], metrics)
+                        # Not stored twice if a later month of this user fails
+                        self._followups[key] = {}
+            for key in keys:
+                self._followups.pop(key, None)
+
+    async def flush(self, force: bool = False) -> int:
+        """Write months that are idle or overdue (all of them with force), returning months written.
+
+        Raises if the change counters of written months could not be bumped;
+        they are retried on the next flush.
+        """
+        async with self._flush_lock:
+            # Counters left behind by a failed flush come first
+            await self._run_followups()
+
+            now = time.monotonic()
+            due = [
+                key for key, entry in self._pending.items()
+                if force or now - entry["last_at"] >= self.idle_seconds or now - entry["first_at"] >= self.max_delay
+            ]
+            if not due:
+                return 0
+
+            batch = {key: self._pending.pop(key) for key in due}
+            self._flushing = batch
+            written = {}
+            try:
+                await self._write(batch, written)
+            except Exception:
+                # Whatever was not stored stays buffered for the next flush
+                self._requeue({key: entry for key, entry in batch.items() if key not in written})
+                raise
+            finally:
+                # Written months move to the follow-ups with no await in between,
+                # so has_pending() never drops them before their counters are bumped
+                for key, paths in written.items():
+                    if key[0] not in self._discarded:
+                        metrics = self._followups.setdefault(key, {})
+                        metrics.update(self._written_metrics(batch[key], paths))
+                self._flushing = {}
+                self._written += len(written)
+            self._flushes += 1
+
+            # Cached reads revalidate and the analytics store follows, as for a direct save
+            await self._run_followups()
+            return len(written)
+
+    async def _try_flush(self, force: bool = False) -> int:
+        try:
+            return await self.flush(force=force)
+        except Exception as e:
+            logger.error(
+                f"Autosave flush failed, {len(self._pending)} months buffered and "
+                f"{len(self._followups)} awaiting counters: {str(e)}"
+            )
+            return 0
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._try_flush()
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write out every buffered month"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._try_flush(force=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "coalescing": self.coalescing(),
+            "pending_months": len(self._pending),
+            "saves": self._saves,
+            "flushes": self._flushes,
+            "months_written": self._written,
+            "dropped": self._dropped,
+            "superseded": self._superseded,
+            "conflicting_paths": self._conflicts,
+            "unbumped_months": len(self._followups),
+            "idle_seconds": self.idle_seconds,
+            "max_delay_seconds": self.max_delay
+        }
+
+autosave_buffer = AutosaveBuffer(
+    monthly_data_collection,
+    enabled=AUTOSAVE_COALESCE,
+    flush_interval=AUTOSAVE_FLUSH_INTERVAL_SECONDS,
+    idle_seconds=AUTOSAVE_IDLE_SECONDS,
+    max_delay=AUTOSAVE_MAX_DELAY_SECONDS,
+    max_buffer=AUTOSAVE_MAX_BUFFER
+)
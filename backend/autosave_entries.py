@@ -0,0 +1,177 @@
+"""
+Buffered autosave entries for autosave.py.
+
+An entry holds the saves of one (user_id, month_key) folded into a single set
+of $set paths and $unset paths, plus the month as it was stored when buffering
+began ("base"). Everything here is pure: folding saves into an entry, applying
+an entry to a stored month for reads, and picking the paths of an entry that a
+newer write has left alone.
+"""
+import copy
+import time
+from datetime import datetime
+from typing import Optional
+
+_MISSING = object()
+
+def new_entry(data_id: str, base: Optional[dict]) -> dict:
+    now = time.monotonic()
+    return {
+        "id": data_id,
+        "base": base,
+        "sets": {},
+        "unsets": set(),
+        "metrics": {},
+        "saves": 0,
+        "first_at": now,
+        "last_at": now,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+
+def _ancestors(path: str):
+    """Dotted parent paths of path, outermost first"""
+    parts = path.split(".")
+    return [".".join(parts[:i]) for i in range(1, len(parts))]
+
+def _set_in(container: dict, path: str, value):
+    """Set a dotted path inside container, replacing non-objects on the way"""
+    keys = path.split(".")
+    node = container
+    for key in keys[:-1]:
+        child = node.get(key)
+        if not isinstance(child, dict):
+            child = node[key] = {}
+        node = child
+    node[keys[-1]] = value
+
+def _unset_in(container: dict, path: str):
+    keys = path.split(".")
+    node = container
+    for key in keys[:-1]:
+        node = node.get(key)
+        if not isinstance(node, dict):
+            return
+    node.pop(keys[-1], None)
+
+def get_path(doc: Optional[dict], path: str):
+    """Value at a dotted path of doc, or _MISSING"""
+    node = doc
+    for key in path.split("."):
+        if not isinstance(node, dict) or key not in node:
+            return _MISSING
+        node = node[key]
+    return node
+
+def blocking_prefix(doc: dict, path: str) -> Optional[str]:
+    """The part of path that holds a value $set cannot descend into, if any"""
+    keys = path.split(".")
+    node = doc
+    for depth, key in enumerate(keys[:-1]):
+        if isinstance(node, dict):
+            node = node.get(key)
+        elif isinstance(node, list) and key.isdigit():
+            node = node[int(key)] if int(key) < len(node) else None
+        else:
+            return ".".join(keys[:depth])
+        if node is None:
+            return None
+    if isinstance(node, dict) or (isinstance(node, list) and keys[-1].isdigit()):
+        return None
+    return ".".join(keys[:-1])
+
+def apply_set(entry: dict, path: str, value):
+    """Fold a $set of path into entry"""
+    sets, unsets = entry["sets"], entry["unsets"]
+    for ancestor in _ancestors(path):
+        if ancestor in sets:
+            if not isinstance(sets[ancestor], dict):
+                sets[ancestor] = {}
+            _set_in(sets[ancestor], path[len(ancestor) + 1:], value)
+            return
+        if ancestor in unsets:
+            # Setting below a removed key recreates it as an object
+            unsets.discard(ancestor)
+            sets[ancestor] = {}
+            _set_in(sets[ancestor], path[len(ancestor) + 1:], value)
+            return
+    prefix = path + "."
+    for stale in [p for p in sets if p.startswith(prefix)]:
+        del sets[stale]
+    for stale in [p for p in unsets if p.startswith(prefix)]:
+        unsets.discard(stale)
+    unsets.discard(path)
+    sets[path] = value
+
+def apply_unset(entry: dict, path: str):
+    """Fold an $unset of path into entry"""
+    sets, unsets = entry["sets"], entry["unsets"]
+    for ancestor in _ancestors(path):
+        if ancestor in sets:
+            if isinstance(sets[ancestor], dict):
+                _unset_in(sets[ancestor], path[len(ancestor) + 1:])
+            return
+        if ancestor in unsets:
+            return
+    prefix = path + "."
+    for stale in [p for p in sets if p.startswith(prefix)]:
+        del sets[stale]
+    for stale in [p for p in unsets if p.startswith(prefix)]:
+        unsets.discard(stale)
+    sets.pop(path, None)
+    unsets.add(path)
+
+def fold(entry: dict, newer: dict):
+    """Fold the saves of newer, buffered after entry, into entry"""
+    for path in newer["unsets"]:
+        apply_unset(entry, path)
+    for path, value in newer["sets"].items():
+        apply_set(entry, path, value)
+    entry["metrics"].update(newer["metrics"])
+    entry["saves"] += newer["saves"]
+    entry["last_at"] = newer["last_at"]
+    entry["updated_at"] = newer["updated_at"]
+
+def _overlay_path(data: dict, path: str, value, remove: bool = False):
+    # Copy each level on the way down so the stored document is left alone
+    keys = path.split(".")
+    node = data
+    for key in keys[:-1]:
+        child = node.get(key)
+        child = dict(child) if isinstance(child, dict) else {}
+        if remove and not child:
+            return
+        node[key] = child
+        node = child
+    if remove:
+        node.pop(keys[-1], None)
+    else:
+        node[keys[-1]] = value
+
+def apply_entry(data: dict, entry: dict):
+    """Apply the buffered saves of entry to data, a copy of a stored month"""
+    for path in entry["unsets"]:
+        _overlay_path(data, path, None, remove=True)
+    for path, value in entry["sets"].items():
+        _overlay_path(data, path, copy.deepcopy(value))
+    data["updated_at"] = entry["updated_at"]
+
+def view(entry: dict) -> dict:
+    """The month as it will be once entry is written over its base"""
+    data = dict(entry["base"]) if entry["base"] else {"id": entry["id"]}
+    apply_entry(data, entry)
+    return data
+
+def unchanged_paths(entry: dict, stored: Optional[dict]) -> tuple:
+    """The $set and $unset paths of entry that no newer write has touched.
+
+    A path is untouched when its stored value is still the one it had in the
+    month entry was buffered against.
+    """
+    base = entry["base"]
+    sets = {
+        path: value for path, value in entry["sets"].items()
+        if get_path(stored, path) == get_path(base, path)
+    }
+    unsets = {path for path in entry["unsets"] if get_path(stored, path) == get_path(base, path)}
+    return sets, unsets
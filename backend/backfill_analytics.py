@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Copy the analytics saved inside monthly_data into the analytics collection.
+
+Months that already have analytics documents are left alone, so it is safe
+to run repeatedly. Use --dry-run to only count the months that would be read.
+
+    python backfill_analytics.py [--dry-run]
+"""
+import argparse
+import asyncio
+import sys
+
+from database import backfill_analytics, client
+
+async def main(dry_run: bool) -> int:
+    report = await backfill_analytics(dry_run=dry_run)
+    
+    print(f"Checked {report['months_checked']} user-months with saved analytics")
+    if dry_run:
+        print("Dry run: no analytics were copied")
+    else:
+        print(f"✅ Copied {report['copied']} user-months into the analytics collection")
+    
+    client.close()
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="count months without copying them")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.dry_run)))
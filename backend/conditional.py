@@ -0,0 +1,40 @@
+from fastapi import Request, Response, status
+import hashlib
+from typing import Tuple
+
+from database import get_change_counter
+
+def _representation_tag(request: Request) -> str:
+    """Distinguish representations of the same resource (query string, media type)"""
+    variant = f"{request.url.query}|{request.headers.get('accept', '')}"
+    return hashlib.sha256(variant.encode('utf-8')).hexdigest()[:12]
+
+def _owner_tag(user_id: str) -> str:
+    """Tie the ETag to its owner so one user's tag never validates another's response"""
+    return hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:12]
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag[2:] == etag if tag.startswith("W/") else tag == etag for tag in candidates)
+
+async def check_etag(request: Request, user_id: str, scope: str) -> Tuple[str, bool]:
+    """Build the ETag for a user's resource from its change counter.
+
+    Returns the ETag and whether the client's If-None-Match already has it.
+    Only a tiny counter document is read, so a 304 never loads the resource.
+    """
+    version = await get_change_counter(user_id, scope)
+    etag = f'"{scope}-{version}-{_owner_tag(user_id)}-{_representation_tag(request)}"'
+    if_none_match = request.headers.get("if-none-match")
+    return etag, bool(if_none_match) and _etag_matches(if_none_match, etag)
+
+def etag_headers(etag: str) -> dict:
+    # no-cache: clients may store the response but must revalidate it each time.
+    # The body depends on who is asking and the media type they asked for
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization, Accept"}
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
@@ -1,16 +1,35 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, InsertOne, UpdateOne, ReplaceOne, DeleteOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError, DocumentTooLarge, OperationFailure
+from datetime import datetime, timedelta
+import asyncio
+import base64
+import bson
+import json
+import logging
 import os
-from typing import Optional
+import time
+import uuid
+import zlib
+from typing import Optional, List
 from dotenv import load_dotenv
 from pathlib import Path
+from urllib.parse import unquote
+
+from schema import (
+    SCHEMA_VERSIONS, migrated_collections, needs_upgrade, upgrade, upgrade_document, upgrade_documents, write_back
+)
+from query_monitor import monitored, query_monitor
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+logger = logging.getLogger(__name__)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[query_monitor])
 db = client[os.environ.get('DB_NAME', 'melanin_bank')]
 
 # Collections
@@ -18,73 +37,564 @@ users_collection = db.users
 monthly_data_collection = db.monthly_data
 content_ideas_collection = db.content_ideas
 posts_collection = db.posts
+month_stats_collection = db.month_stats
+change_counters_collection = db.change_counters
+purge_jobs_collection = db.purge_jobs
+analytics_collection = db.analytics
+month_archive_collection = db.month_archive
+schema_migrations_collection = db.schema_migrations
+
+# Post fields counted in month_stats, and the bucket each is counted under
+STAT_FIELDS = (("content_type", "content_types"), ("category", "categories"), ("pillar", "pillars"))
+STATS_PROJECTION = {"_id": 0, "month_key": 1, "content_type": 1, "category": 1, "pillar": 1}
+
+# Bump to rebuild every month_stats counter once more on the next deploy
+MONTH_STATS_BACKFILL_VERSION = 1
+MONTH_STATS_BACKFILL_LEASE_SECONDS = float(os.environ.get('MONTH_STATS_BACKFILL_LEASE_SECONDS', 3600))
+MONTH_STATS_BACKFILL_RETRY_SECONDS = float(os.environ.get('MONTH_STATS_BACKFILL_RETRY_SECONDS', 600))
+# Passes at a month whose counters keep changing under a rebuild before giving up on it
+MONTH_STATS_REBUILD_ATTEMPTS = 3
+
+# Until the backfill is known to be done, stats are counted from posts instead
+month_stats_status = {"backfilled": False}
+
+# Keyset pagination order for ideas and posts
+PAGE_SORT = [("created_at", 1), ("id", 1)]
+
+# Collections searched by GET /api/search, as (result kind, collection)
+SEARCH_SOURCES = (("idea", content_ideas_collection), ("post", posts_collection))
+
+# Month archive configuration; 0 disables archiving and restore lookups
+ARCHIVE_AFTER_MONTHS = int(os.environ.get('ARCHIVE_AFTER_MONTHS', 12))
+ARCHIVE_RESTORE_GRACE_DAYS = float(os.environ.get('ARCHIVE_RESTORE_GRACE_DAYS', 30))
+ARCHIVE_RESTORE_LEASE_SECONDS = float(os.environ.get('ARCHIVE_RESTORE_LEASE_SECONDS', 30))
+ARCHIVE_RESTORE_WAIT_SECONDS = float(os.environ.get('ARCHIVE_RESTORE_WAIT_SECONDS', 5))
+ARCHIVE_COMPRESS_MIN_LENGTH = int(os.environ.get('ARCHIVE_COMPRESS_MIN_LENGTH', 64))
+# Fenced post deletes an archive run keeps in flight at once
+ARCHIVE_DELETE_CONCURRENCY = max(1, int(os.environ.get('ARCHIVE_DELETE_CONCURRENCY', 8)))
+
+# Free-text fields stored zlib-compressed in the month archive
+ARCHIVE_MONTH_TEXT_FIELDS = ("goals", "themes")
+ARCHIVE_POST_TEXT_FIELDS = ("topic", "caption", "notes", "audio_link")
+
+# Documents fetched per round trip when streaming a cursor
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', 500))
 
+# Principal cache configuration
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', 30))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000))
+
+class PrincipalCache:
+    """TTL cache of the role and active state of users, keyed by user id"""
+
+    def __init__(self, ttl: float = 30, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}  # user_id -> (expires_at, principal)
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, user_id: str) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            self._entries.pop(user_id, None)
+            self._misses += 1
+            return None
+        self._hits += 1
+        return entry[1]
+
+    def put(self, user_id: str, principal: dict):
+        if len(self._entries) >= self.max_size:
+            now = time.monotonic()
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            if len(self._entries) >= self.max_size:
+                self._entries.pop(next(iter(self._entries)))
+        self._entries[user_id] = (time.monotonic() + self.ttl, principal)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "ttl_seconds": self.ttl,
+            "hits": self._hits,
+            "misses": self._misses
+        }
+
+principal_cache = PrincipalCache(ttl=PRINCIPAL_CACHE_TTL_SECONDS, max_size=PRINCIPAL_CACHE_SIZE)
+
+@monitored
 async def find_user_by_email(email: str) -> Optional[dict]:
     """Find a user by email"""
     return await users_collection.find_one({"email": email})
 
+@monitored
 async def create_user(user_data: dict) -> str:
     """Create a new user and return the ID"""
     result = await users_collection.insert_one(user_data)
     return str(result.inserted_id)
 
+@monitored
 async def find_user_by_id(user_id: str) -> Optional[dict]:
     """Find a user by ID"""
     return await users_collection.find_one({"id": user_id})
+
+@monitored
+async def get_user_principal(user_id: str) -> Optional[dict]:
+    """Get the cached role and active state for a user"""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    
+    user = await users_collection.find_one(
+        {"id": user_id},
+        {"_id": 0, "id": 1, "email": 1, "is_admin": 1, "is_active": 1, "approval_status": 1}
+    )
+    if not user:
+        return None
+    
+    principal = {
+        "user_id": user["id"],
+        "email": user.get("email"),
+        "is_admin": user.get("is_admin", False),
+        "is_active": user.get("is_active", False),
+        "approval_status": user.get("approval_status", "pending")
+    }
+    principal_cache.put(user_id, principal)
+    return principal
+
+@monitored
 async def get_all_users() -> list:
-    """Get all users"""
-    cursor = users_collection.find({})
+    """Get all users, without _id or password hashes"""
+    cursor = users_collection.find({}, {"_id": 0, "password_hash": 0})
     users = await cursor.to_list(length=None)
     return users
 
+@monitored
+def iter_all_users():
+    """Cursor over all users, without password hashes"""
+    return users_collection.find({}, {"_id": 0, "password_hash": 0}).batch_size(STREAM_BATCH_SIZE)
+
+@monitored
 async def update_user_status(user_id: str, update_data: dict) -> bool:
-    """Update user status"""
-    result = await users_collection.update_one(
+    """Update user status, revoking issued tokens when it takes away what they claim"""
+    update = {"$set": update_data}
+    # Tokens embed role and active state; reactivation needs no bump because
+    # deactivating already revoked every older token
+    if "is_admin" in update_data or update_data.get("is_active") is False:
+        update["$inc"] = {"token_version": 1}
+    result = await users_collection.update_one({"id": user_id}, update)
+    principal_cache.invalidate(user_id)
+    return result.modified_count > 0
+
+@monitored
+async def revoke_user_tokens(user_id: str, update_data: dict) -> Optional[int]:
+    """Update a user and bump their token version, returning the new version"""
+    user = await users_collection.find_one_and_update(
         {"id": user_id},
-        {"$set": update_data}
+        {"$set": update_data, "$inc": {"token_version": 1}},
+        projection={"_id": 0, "token_version": 1},
+        return_document=ReturnDocument.AFTER
     )
-    return result.modified_count > 0
+    principal_cache.invalidate(user_id)
+    return user["token_version"] if user else None
 
+@monitored
+async def get_revoked_users(deleted_since: Optional[datetime] = None) -> tuple:
+    """Get the ids of blocked users and the token versions that were bumped.
+    
+    Users deleted before deleted_since are left out: every token they held has expired.
+    """
+    cursor = users_collection.find(
+        {"$or": [
+            {"is_active": False},
+            {"approval_status": "denied"},
+            {"token_version": {"$gt": 0}}
+        ]},
+        {"_id": 0, "id": 1, "is_active": 1, "approval_status": 1, "token_version": 1}
+    )
+    blocked = set()
+    versions = {}
+    async for user in cursor:
+        if not user.get("is_active", False) or user.get("approval_status") == "denied":
+            blocked.add(user["id"])
+        if user.get("token_version", 0):
+            versions[user["id"]] = user["token_version"]
+    
+    # Deleted users no longer have a document, but their purge job remembers them.
+    # Jobs are queued just before the user is deleted and cancelled if that fails.
+    jobs = {"status": {"$ne": "cancelled"}}
+    if deleted_since:
+        jobs["created_at"] = {"$gte": deleted_since}
+    async for job in purge_jobs_collection.find(jobs, {"_id": 0, "user_id": 1}):
+        blocked.add(job["user_id"])
+    return blocked, versions
+
+@monitored
+async def delete_user(user_id: str) -> bool:
+    """Delete a user"""
+    result = await users_collection.delete_one({"id": user_id})
+    principal_cache.invalidate(user_id)
+    return result.deleted_count > 0
+
+@monitored
+async def get_change_counter(user_id: str, scope: str) -> int:
+    """Get the change counter of one of a user's resources (0 if never written)"""
+    counter = await change_counters_collection.find_one(
+        {"user_id": user_id, "scope": scope},
+        {"_id": 0, "version": 1}
+    )
+    return counter["version"] if counter else 0
+
+@monitored
+async def bump_change_counters(user_id: str, scopes) -> None:
+    """Advance change counters after a write so cached reads revalidate"""
+    requests = [
+        UpdateOne({"user_id": user_id, "scope": scope}, {"$inc": {"version": 1}}, upsert=True)
+        for scope in set(scopes)
+    ]
+    if requests:
+        await change_counters_collection.bulk_write(requests, ordered=False)
+
+@monitored
 async def get_monthly_data(user_id: str, month_key: str) -> Optional[dict]:
-    """Get monthly data for a user and month"""
-    return await monthly_data_collection.find_one({
+    """Get monthly data for a user and month, restoring it from the archive if needed"""
+    query = {"user_id": user_id, "month_key": month_key}
+    data = await monthly_data_collection.find_one(query)
+    if data is None and is_cold_month(month_key) and await restore_archived_month(user_id, month_key):
+        data = await monthly_data_collection.find_one(query)
+    return upgrade_document("monthly_data", data)
+
+@monitored
+async def get_monthly_data_range(user_id: str, from_month: str, to_month: str, fields: Optional[List[str]] = None) -> dict:
+    """Monthly data of an inclusive month range in one index range scan, keyed by month_key.
+    
+    With fields, only those fields (and month_key) are returned.
+    """
+    query = {"user_id": user_id, "month_key": month_range_filter(from_month, to_month)}
+    # Legacy documents have to be upgraded whole before their fields can be picked
+    projection = None
+    if fields and "monthly_data" in migrated_collections:
+        projection = dict({field: 1 for field in fields}, _id=0, month_key=1)
+    months = await monthly_data_collection.find(query, projection).to_list(length=None)
+    
+    cutoff = archive_cutoff()
+    if cutoff and from_month < cutoff:
+        found = {month["month_key"] for month in months}
+        archived = await month_archive_collection.find(
+            dict(query, state={"$in": ["archived", "restoring"]}), {"_id": 0, "month_key": 1}
+        ).to_list(length=None)
+        restored = False
+        for archive in archived:
+            if archive["month_key"] not in found:
+                restored = await restore_archived_month(user_id, archive["month_key"]) or restored
+        if restored:
+            months = await monthly_data_collection.find(query, projection).to_list(length=None)
+    
+    result = {}
+    for month in months:
+        month = upgrade_document("monthly_data", month)
+        if fields and projection is None:
+            month = {field: month[field] for field in list(fields) + ["month_key"] if field in month}
+        result[month["month_key"]] = month
+    return result
+
+@monitored
+async def upgrade_stored_month(user_id: str, month_key: str) -> bool:
+    """Write a legacy stored month back in the current schema before a partial update.
+    
+    Partial updates stamp the current schema_version, after which reads stop
+    upgrading the document, so legacy fields must be renamed first.
+    Returns True if a legacy month was upgraded.
+    """
+    if "monthly_data" in migrated_collections:
+        return False
+    stored = await monthly_data_collection.find_one({
         "user_id": user_id,
-        "month_key": month_key
+        "month_key": month_key,
+        "schema_version": {"$not": {"$gte": SCHEMA_VERSIONS["monthly_data"]}}
     })
+    if stored is None or not needs_upgrade("monthly_data", stored):
+        return False
+    change = write_back("monthly_data", stored, upgrade("monthly_data", dict(stored)))
+    if change is None:
+        return False
+    # A concurrent writer that got there first has upgraded it already
+    await monthly_data_collection.update_one(*change)
+    return True
 
+@monitored
 async def upsert_monthly_data(user_id: str, month_key: str, data: dict) -> str:
-    """Create or update monthly data"""
+    """Create or update monthly data, returning its stable id in one round trip"""
+    data = dict(data)
+    # id and created_at are only written when the document is first inserted
+    insert_only = {
+        "id": data.pop("id", None) or str(uuid.uuid4()),
+        "created_at": data.pop("created_at", None) or datetime.utcnow()
+    }
+    data.pop("_id", None)
     data["user_id"] = user_id
     data["month_key"] = month_key
-    data["updated_at"] = data.get("updated_at")
+    data["updated_at"] = data.get("updated_at") or datetime.utcnow()
+    data["schema_version"] = SCHEMA_VERSIONS["monthly_data"]
+    if is_cold_month(month_key):
+        await restore_archived_month(user_id, month_key)
+    await upgrade_stored_month(user_id, month_key)
     
-    result = await monthly_data_collection.update_one(
-        {"user_id": user_id, "month_key": month_key},
-        {"$set": data},
-        upsert=True
-    )
+    for attempt in range(2):
+        try:
+            result = await monthly_data_collection.find_one_and_update(
+                {"user_id": user_id, "month_key": month_key},
+                {"$set": data, "$setOnInsert": insert_only},
+                projection={"_id": 0, "id": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            await bump_change_counters(user_id, [f"months:{month_key}"])
+            break
+        except DuplicateKeyError:
+            # A concurrent save inserted the month first; retry as an update
+            if attempt:
+                raise
     
-    if result.upserted_id:
-        # Return the UUID id field, not the MongoDB _id
-        return data["id"]
-    else:
-        existing = await monthly_data_collection.find_one({
-            "user_id": user_id,
-            "month_key": month_key
-        })
-        return existing["id"] if existing else ""
+    # Keep the analytics store in step with clients that still save metrics here
+    metrics = {
+        name: value for name, value in (data.get("analytics") or {}).items()
+        if name and "." not in name and not name.startswith("$")
+    }
+    if metrics:
+        await set_analytics_metrics(user_id, month_key, metrics)
+    # Return the UUID id field, not the MongoDB _id
+    return result["id"]
+
+def merge_patch_update(patch: dict, prefix: str = "") -> tuple:
+    """Translate a JSON Merge Patch (RFC 7396) into $set and $unset paths.
+    
+    Nested objects are merged key by key, null removes a key and anything
+    else (arrays included) replaces the value. An empty object changes
+    nothing. Raises ValueError for keys MongoDB cannot address.
+    """
+    sets, unsets = {}, {}
+    for key, value in patch.items():
+        if not key or "." in key or key.startswith("$"):
+            raise ValueError(f"Invalid field name: {prefix}{key}")
+        path = f"{prefix}{key}"
+        if value is None:
+            unsets[path] = ""
+        elif isinstance(value, dict):
+            nested_sets, nested_unsets = merge_patch_update(value, f"{path}.")
+            sets.update(nested_sets)
+            unsets.update(nested_unsets)
+        else:
+            sets[path] = value
+    return sets, unsets
+
+@monitored
+async def patch_monthly_data(user_id: str, month_key: str, patch: dict) -> str:
+    """Apply a JSON Merge Patch to a month, writing only the paths it touches"""
+    sets, unsets = merge_patch_update(patch)
+    now = datetime.utcnow()
+    update = {
+        "$set": dict(sets, updated_at=now, schema_version=SCHEMA_VERSIONS["monthly_data"]),
+        "$setOnInsert": {"id": str(uuid.uuid4()), "created_at": now}
+    }
+    if unsets:
+        update["$unset"] = unsets
+    if is_cold_month(month_key):
+        await restore_archived_month(user_id, month_key)
+    await upgrade_stored_month(user_id, month_key)
+    
+    for attempt in range(2):
+        try:
+            result = await monthly_data_collection.find_one_and_update(
+                {"user_id": user_id, "month_key": month_key},
+                update,
+                projection={"_id": 0, "id": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            await bump_change_counters(user_id, [f"months:{month_key}"])
+            break
+        except DuplicateKeyError:
+            # A concurrent save inserted the month first; retry as an update
+            if attempt:
+                raise
+        except OperationFailure as e:
+            # e.g. a nested path under a field that currently holds a string
+            raise ValueError(f"Patch does not apply to the stored month: {(e.details or {}).get('errmsg', str(e))}")
+    
+    # Keep the analytics store in step with patched metrics
+    analytics = patch.get("analytics")
+    if isinstance(analytics, dict):
+        metrics = {name: value for name, value in analytics.items() if not isinstance(value, dict)}
+        if metrics:
+            await set_analytics_metrics(user_id, month_key, metrics)
+    return result["id"]
+
+@monitored
+async def set_analytics_metrics(user_id: str, month_key: str, metrics: dict) -> dict:
+    """Set individual analytics metrics of a month, clearing those given as None"""
+    now = datetime.utcnow()
+    update = {
+        "$set": {f"metrics.{name}": value for name, value in metrics.items() if value is not None},
+        "$setOnInsert": {"id": str(uuid.uuid4()), "created_at": now}
+    }
+    update["$set"]["updated_at"] = now
+    cleared = {f"metrics.{name}": "" for name, value in metrics.items() if value is None}
+    if cleared:
+        update["$unset"] = cleared
+    
+    for attempt in range(2):
+        try:
+            month = await analytics_collection.find_one_and_update(
+                {"user_id": user_id, "month_key": month_key},
+                update,
+                projection={"_id": 0},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            break
+        except DuplicateKeyError:
+            # A concurrent update inserted the month first; retry as an update
+            if attempt:
+                raise
+    await bump_change_counters(user_id, ["analytics"])
+    return month
+
+def month_keys(from_month: str, to_month: str) -> List[str]:
+    """Every YYYY-MM month key from from_month to to_month inclusive"""
+    year, month = int(from_month[:4]), int(from_month[5:7])
+    keys = []
+    while f"{year:04d}-{month:02d}" <= to_month:
+        keys.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return keys
+
+@monitored
+async def get_analytics_series(user_id: str, from_month: Optional[str] = None, to_month: Optional[str] = None) -> List[dict]:
+    """Analytics of a month range in month order, in one range query.
+    
+    When both ends are given, months without metrics are included with empty
+    metrics so each entry's predecessor is always the previous month.
+    """
+    query = {"user_id": user_id}
+    month_filter = month_range_filter(from_month, to_month)
+    if month_filter:
+        query["month_key"] = month_filter
+    cursor = analytics_collection.find(
+        query, {"_id": 0, "month_key": 1, "metrics": 1, "updated_at": 1}
+    ).sort("month_key", 1)
+    months = await cursor.to_list(length=None)
+    if not (from_month and to_month):
+        return months
+    
+    stored = {month["month_key"]: month for month in months}
+    return [
+        stored.get(month_key) or {"month_key": month_key, "metrics": {}, "updated_at": None}
+        for month_key in month_keys(from_month, to_month)
+    ]
+
+@monitored
+async def backfill_analytics(dry_run: bool = False) -> dict:
+    """Copy MonthlyData.analytics into the analytics store for months not there yet"""
+    report = {"months_checked": 0, "copied": 0}
+    cursor = monthly_data_collection.find(
+        {"analytics": {"$type": "object", "$ne": {}}},
+        {"_id": 0, "user_id": 1, "month_key": 1, "analytics": 1}
+    ).batch_size(STREAM_BATCH_SIZE)
+    async for month in cursor:
+        report["months_checked"] += 1
+        metrics = {
+            name: value for name, value in month["analytics"].items()
+            if name and "." not in name and not name.startswith("$") and value is not None
+        }
+        if not metrics or dry_run:
+            continue
+        # Never overwrite metrics already written through the analytics API
+        now = datetime.utcnow()
+        result = await analytics_collection.update_one(
+            {"user_id": month["user_id"], "month_key": month["month_key"]},
+            {"$setOnInsert": {
+                "id": str(uuid.uuid4()), "metrics": metrics, "created_at": now, "updated_at": now
+            }},
+            upsert=True
+        )
+        if result.upserted_id is not None:
+            report["copied"] += 1
+            await bump_change_counters(month["user_id"], ["analytics"])
+    return report
+
+def encode_page_cursor(doc: dict) -> str:
+    """Encode the stored (created_at, id) sort key of doc as an opaque cursor.
+    
+    Legacy documents may lack created_at; the sort puts them first as null,
+    so the cursor records null too.
+    """
+    created_at = doc.get("created_at")
+    key = json.dumps([created_at.isoformat() if isinstance(created_at, datetime) else None, doc.get("id")])
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
 
+def decode_page_cursor(cursor: str) -> tuple:
+    """Decode a cursor from encode_page_cursor, raising ValueError if malformed"""
+    try:
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return (datetime.fromisoformat(created_at) if created_at is not None else None), str(item_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def read_projection(collection_name: str) -> Optional[dict]:
+    """Leave _id out of reads once the lazy write-back no longer needs it"""
+    return {"_id": 0} if collection_name in migrated_collections else None
+
+async def _get_page(collection, query: dict, limit: int, after: Optional[tuple]) -> tuple:
+    """Get one (created_at, id) ordered page and the cursor of the next one"""
+    if after:
+        created_at, item_id = after
+        # Missing created_at sorts as null, before every date
+        later = {"created_at": {"$ne": None}} if created_at is None else {"created_at": {"$gt": created_at}}
+        query = dict(query, **{"$or": [
+            later,
+            {"created_at": created_at, "id": {"$gt": item_id}}
+        ]})
+    cursor = collection.find(query, read_projection(collection.name)).sort(PAGE_SORT).limit(limit + 1)
+    stored = await cursor.to_list(length=limit + 1)
+    docs = upgrade_documents(collection.name, stored)
+    if len(docs) > limit:
+        # The cursor follows the stored sort key, not fields an upgrade filled in
+        return docs[:limit], encode_page_cursor(stored[limit - 1])
+    return docs, None
+
+@monitored
 async def get_all_content_ideas(user_id: str):
     """Get all content ideas for a user"""
-    cursor = content_ideas_collection.find({"user_id": user_id})
-    return await cursor.to_list(length=1000)
+    cursor = content_ideas_collection.find(
+        {"user_id": user_id}, read_projection("content_ideas")
+    ).sort(PAGE_SORT)
+    return upgrade_documents("content_ideas", await cursor.to_list(length=None))
+
+@monitored
+def iter_content_ideas(user_id: str):
+    """Cursor over all content ideas for a user"""
+    return content_ideas_collection.find(
+        {"user_id": user_id}, read_projection("content_ideas")
+    ).sort(PAGE_SORT).batch_size(STREAM_BATCH_SIZE)
+
+@monitored
+async def get_content_ideas_page(user_id: str, limit: int, after: Optional[tuple] = None) -> tuple:
+    """Get a page of content ideas for a user"""
+    return await _get_page(content_ideas_collection, {"user_id": user_id}, limit, after)
 
+@monitored
 async def create_content_idea(idea_data: dict) -> str:
     """Create a new content idea"""
+    idea_data["schema_version"] = SCHEMA_VERSIONS["content_ideas"]
     result = await content_ideas_collection.insert_one(idea_data)
+    await bump_change_counters(idea_data["user_id"], ["ideas"])
     # Return the UUID id field, not the MongoDB _id
     return idea_data["id"]
 
+@monitored
 async def update_content_idea(idea_id: str, user_id: str, update_data: dict) -> bool:
     """Update a content idea"""
     update_data["updated_at"] = update_data.get("updated_at")
@@ -92,52 +602,756 @@ async def update_content_idea(idea_id: str, user_id: str, update_data: dict) ->
         {"id": idea_id, "user_id": user_id},
         {"$set": update_data}
     )
+    if result.matched_count:
+        await bump_change_counters(user_id, ["ideas"])
     return result.modified_count > 0
 
+@monitored
 async def delete_content_idea(idea_id: str, user_id: str) -> bool:
     """Delete a content idea"""
     result = await content_ideas_collection.delete_one({
         "id": idea_id,
         "user_id": user_id
     })
+    if result.deleted_count:
+        await bump_change_counters(user_id, ["ideas"])
     return result.deleted_count > 0
 
+@monitored
 async def get_posts_for_date(user_id: str, month_key: str, date_key: str):
     """Get posts for a specific date"""
+    if is_cold_month(month_key):
+        await restore_archived_month(user_id, month_key)
     cursor = posts_collection.find({
         "user_id": user_id,
         "month_key": month_key,
         "date_key": date_key
     })
-    return await cursor.to_list(length=100)
+    return upgrade_documents("posts", await cursor.to_list(length=100))
 
+@monitored
 async def get_posts_for_month(user_id: str, month_key: str):
-    """Get all posts for a month"""
-    cursor = posts_collection.find({
-        "user_id": user_id,
-        "month_key": month_key
-    })
-    return await cursor.to_list(length=1000)
+    """Get all posts for a month, restoring them from the archive if needed"""
+    query = {"user_id": user_id, "month_key": month_key}
+    projection = read_projection("posts")
+    # Months newer than the archive cutoff cannot have been archived
+    if is_cold_month(month_key):
+        await restore_archived_month(user_id, month_key)
+    posts = await posts_collection.find(query, projection).sort(PAGE_SORT).to_list(length=None)
+    return upgrade_documents("posts", posts)
+
+@monitored
+def iter_posts_for_month(user_id: str, month_key: str):
+    """Cursor over all posts for a month"""
+    return posts_collection.find(
+        {"user_id": user_id, "month_key": month_key}, read_projection("posts")
+    ).sort(PAGE_SORT).batch_size(STREAM_BATCH_SIZE)
+
+@monitored
+async def get_posts_page(user_id: str, month_key: str, limit: int, after: Optional[tuple] = None) -> tuple:
+    """Get a page of posts for a month"""
+    if after is None and is_cold_month(month_key):
+        await restore_archived_month(user_id, month_key)
+    return await _get_page(
+        posts_collection, {"user_id": user_id, "month_key": month_key}, limit, after
+    )
+
+def encode_search_cursor(hit: dict) -> str:
+    """Encode the (score, kind, id) rank of a search hit as an opaque cursor"""
+    key = json.dumps([hit["score"], hit["kind"], hit["id"]])
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+def decode_search_cursor(cursor: str) -> tuple:
+    """Decode a cursor from encode_search_cursor, raising ValueError if malformed"""
+    try:
+        score, kind, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(score), str(kind), str(item_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _after_search_rank(kind: str, after: tuple) -> dict:
+    """Match documents of one kind ranked after (score, kind, id)"""
+    score, after_kind, item_id = after
+    if kind > after_kind:
+        return {"score": {"$lte": score}}
+    if kind < after_kind:
+        return {"score": {"$lt": score}}
+    return {"$or": [{"score": {"$lt": score}}, {"score": score, "id": {"$gt": item_id}}]}
 
+@monitored
+async def search_content(
+    user_id: str,
+    text: str,
+    limit: int,
+    after: Optional[tuple] = None,
+    kind: Optional[str] = None,
+    pillar: Optional[str] = None,
+    category: Optional[str] = None
+) -> tuple:
+    """Full-text search over a user's ideas and posts, best matches first.
+    
+    Each collection returns its own top limit + 1 matches from its text index;
+    they are merged by (score desc, kind, id) and the cursor of the next page
+    is the rank of the last hit returned.
+    """
+    query = {"user_id": user_id, "$text": {"$search": text}}
+    if pillar:
+        query["pillar"] = pillar
+    if category:
+        query["category"] = category
+    
+    hits = []
+    for source_kind, collection in SEARCH_SOURCES:
+        if kind and kind != source_kind:
+            continue
+        pipeline = [
+            {"$match": query},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+        ]
+        if after:
+            pipeline.append({"$match": _after_search_rank(source_kind, after)})
+        pipeline += [
+            {"$sort": {"score": -1, "id": 1}},
+            {"$limit": limit + 1},
+        ]
+        projection = read_projection(collection.name)
+        if projection:
+            pipeline.append({"$project": projection})
+        async for doc in collection.aggregate(pipeline):
+            doc = upgrade_document(collection.name, doc)
+            doc["kind"] = source_kind
+            hits.append(doc)
+    
+    hits.sort(key=lambda hit: (-hit["score"], hit["kind"], hit["id"]))
+    if len(hits) > limit:
+        return hits[:limit], encode_search_cursor(hits[limit - 1])
+    return hits, None
+
+def _stat_key(value) -> str:
+    """Escape a label for use as a field name under a month_stats bucket"""
+    return str(value).replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+def _add_post_stats(changes: dict, user_id: str, post: dict, sign: int):
+    """Accumulate month_stats $inc paths for adding (sign > 0) or removing a post"""
+    delta = changes.setdefault((user_id, post.get("month_key")), {})
+    delta["total"] = delta.get("total", 0) + sign
+    for field, bucket in STAT_FIELDS:
+        value = post.get(field)
+        if value:
+            path = f"{bucket}.{_stat_key(value)}"
+            delta[path] = delta.get(path, 0) + sign
+
+async def _apply_month_stats(changes: dict):
+    """Write accumulated month_stats deltas, skipping paths that net to zero"""
+    now = datetime.utcnow()
+    requests = []
+    for (user_id, month_key), delta in changes.items():
+        increments = {path: count for path, count in delta.items() if count}
+        if increments:
+            requests.append(UpdateOne(
+                {"user_id": user_id, "month_key": month_key},
+                {"$inc": increments, "$set": {"updated_at": now}},
+                upsert=True
+            ))
+    if requests:
+        await month_stats_collection.bulk_write(requests, ordered=False)
+
+def _post_after_update(before: dict, update_data: dict) -> dict:
+    return {field: update_data.get(field, before.get(field)) for field in STATS_PROJECTION if field != "_id"}
+
+@monitored
 async def create_post(post_data: dict) -> str:
     """Create a new post"""
+    if is_cold_month(post_data["month_key"]):
+        await restore_archived_month(post_data["user_id"], post_data["month_key"])
+    post_data["schema_version"] = SCHEMA_VERSIONS["posts"]
     result = await posts_collection.insert_one(post_data)
+    changes = {}
+    _add_post_stats(changes, post_data["user_id"], post_data, 1)
+    await _apply_month_stats(changes)
+    await bump_change_counters(post_data["user_id"], [f"posts:{post_data['month_key']}"])
     # Return the UUID id field, not the MongoDB _id
     return post_data["id"]
 
+@monitored
 async def update_post(post_id: str, user_id: str, update_data: dict) -> bool:
     """Update a post"""
     update_data["updated_at"] = update_data.get("updated_at")
-    result = await posts_collection.update_one(
+    before = await posts_collection.find_one_and_update(
         {"id": post_id, "user_id": user_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection=STATS_PROJECTION
     )
-    return result.modified_count > 0
+    if not before:
+        return False
+    
+    after = _post_after_update(before, update_data)
+    # Only touch month_stats when a counted field or the month changed
+    if any(field in update_data for field in STATS_PROJECTION if field != "_id"):
+        changes = {}
+        _add_post_stats(changes, user_id, before, -1)
+        _add_post_stats(changes, user_id, after, 1)
+        await _apply_month_stats(changes)
+    await bump_change_counters(user_id, [f"posts:{before.get('month_key')}", f"posts:{after.get('month_key')}"])
+    return True
 
+@monitored
 async def delete_post(post_id: str, user_id: str) -> bool:
     """Delete a post"""
-    result = await posts_collection.delete_one({
-        "id": post_id,
-        "user_id": user_id
-    })
-    return result.deleted_count > 0
\ No newline at end of file
+    deleted = await posts_collection.find_one_and_delete(
+        {"id": post_id, "user_id": user_id},
+        projection=STATS_PROJECTION
+    )
+    if not deleted:
+        return False
+    
+    changes = {}
+    _add_post_stats(changes, user_id, deleted, -1)
+    await _apply_month_stats(changes)
+    await bump_change_counters(user_id, [f"posts:{deleted.get('month_key')}"])
+    return True
+
+@monitored
+async def bulk_write_posts(user_id: str, operations: List[dict], ordered: bool = True) -> List[dict]:
+    """Apply create/update/delete operations to a user's posts in one bulk_write.
+
+    Each operation is {"action", "id", "doc"}, where doc is the full post for
+    create and the fields to $set for update. Returns one result per operation;
+    with ordered=True nothing after the first failure is applied.
+    """
+    results = [
+        {"index": i, "action": op["action"], "id": op.get("id"), "success": False, "error": None}
+        for i, op in enumerate(operations)
+    ]
+    
+    # New posts must not land beside an archived copy of their month
+    for month_key in {op["doc"]["month_key"] for op in operations if op["action"] == "create"}:
+        if is_cold_month(month_key):
+            await restore_archived_month(user_id, month_key)
+    
+    # One read tells us which update/delete targets belong to this user
+    target_ids = [op["id"] for op in operations if op["action"] != "create"]
+    existing = {}
+    if target_ids:
+        cursor = posts_collection.find(
+            {"user_id": user_id, "id": {"$in": target_ids}},
+            dict(STATS_PROJECTION, id=1)
+        )
+        existing = {post["id"]: post async for post in cursor}
+    
+    requests = []
+    request_indexes = []  # bulk_write position -> operation index
+    stopped_at = None
+    # Posts as they will be when the batch reaches each operation
+    alive = set(existing)
+    for i, op in enumerate(operations):
+        if op["action"] == "create":
+            requests.append(InsertOne(dict(op["doc"], schema_version=SCHEMA_VERSIONS["posts"])))
+            alive.add(op["doc"].get("id"))
+        elif op["id"] not in alive:
+            # Missing, another user's, or deleted earlier in this batch
+            results[i]["error"] = "Post not found"
+            if ordered:
+                stopped_at = i
+                break
+            continue
+        elif op["action"] == "update":
+            requests.append(UpdateOne({"id": op["id"], "user_id": user_id}, {"$set": op["doc"]}))
+        else:
+            requests.append(DeleteOne({"id": op["id"], "user_id": user_id}))
+            alive.discard(op["id"])
+        request_indexes.append(i)
+    
+    failed = set()
+    stats_drifted = False
+    if requests:
+        try:
+            written = await posts_collection.bulk_write(requests, ordered=ordered)
+            matched, deleted = written.matched_count, written.deleted_count
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                index = request_indexes[error["index"]]
+                results[index]["error"] = error.get("errmsg", "Write failed")
+                failed.add(index)
+            if ordered and failed:
+                stopped_at = min(failed)
+            matched, deleted = e.details.get("nMatched", 0), e.details.get("nRemoved", 0)
+        
+        applied = [i for i in request_indexes if i not in failed and (stopped_at is None or i < stopped_at)]
+        expected_updates = [i for i in applied if operations[i]["action"] == "update"]
+        expected_deletes = [i for i in applied if operations[i]["action"] == "delete"]
+        if matched < len(expected_updates):
+            # A concurrent delete removed some targets after the read above
+            cursor = posts_collection.find(
+                {"user_id": user_id, "id": {"$in": [operations[i]["id"] for i in expected_updates]}},
+                {"_id": 0, "id": 1}
+            )
+            present = {post["id"] async for post in cursor}
+            for i in expected_updates:
+                if operations[i]["id"] not in present:
+                    results[i]["error"] = "Post not found"
+                    failed.add(i)
+        if deleted < len(expected_deletes):
+            # bulk_write only reports a total, so which delete lost the race is unknown;
+            # the deletes still hold, but the counters must come from the posts themselves
+            logger.warning(f"{len(expected_deletes) - deleted} bulk deletes for {user_id} found no post")
+            stats_drifted = True
+    
+    stats_changes = {}
+    for i in request_indexes:
+        if i in failed:
+            continue
+        if stopped_at is not None and i > stopped_at:
+            break
+        results[i]["success"] = True
+        
+        op = operations[i]
+        if op["action"] == "create":
+            _add_post_stats(stats_changes, user_id, op["doc"], 1)
+            # Later operations in the batch may update or delete the new post
+            existing[op["doc"].get("id")] = _post_after_update({}, op["doc"])
+        elif op["id"] in existing:
+            before = existing.pop(op["id"])
+            _add_post_stats(stats_changes, user_id, before, -1)
+            if op["action"] == "update":
+                existing[op["id"]] = _post_after_update(before, op["doc"])
+                _add_post_stats(stats_changes, user_id, existing[op["id"]], 1)
+    await _apply_month_stats(stats_changes)
+    if stats_drifted:
+        await rebuild_month_stats(user_id)
+    await bump_change_counters(user_id, [f"posts:{month_key}" for _, month_key in stats_changes])
+    
+    if stopped_at is not None:
+        for result in results[stopped_at + 1:]:
+            result["error"] = "Skipped after an earlier operation failed"
+    
+    return results
+
+def month_range_filter(from_month: Optional[str], to_month: Optional[str]) -> dict:
+    """month_key filter for an inclusive YYYY-MM range; either end may be open"""
+    month_filter = {}
+    if from_month:
+        month_filter["$gte"] = from_month
+    if to_month:
+        month_filter["$lte"] = to_month
+    return month_filter
+
+@monitored
+async def get_content_stats(user_id: str, from_month: Optional[str] = None, to_month: Optional[str] = None) -> dict:
+    """Sum the maintained month_stats counters over a month range.
+
+    Posts written before the counters existed are only counted in once the
+    one-time backfill_month_stats() has run, so until this worker has seen it
+    complete the stats are aggregated from the posts themselves.
+    """
+    query = {"user_id": user_id}
+    month_filter = month_range_filter(from_month, to_month)
+    if month_filter:
+        query["month_key"] = month_filter
+    
+    if month_stats_status["backfilled"]:
+        months = [_flatten_month_stats(doc) async for doc in month_stats_collection.find(query, {"_id": 0})]
+    else:
+        months = list((await _count_month_stats(query)).values())
+    
+    totals = {bucket: {} for _, bucket in STAT_FIELDS}
+    for paths in months:
+        for path, count in paths.items():
+            if "." in path and count:
+                bucket, key = path.split(".", 1)
+                label = unquote(key)
+                totals[bucket][label] = totals[bucket].get(label, 0) + count
+    return {
+        "content_types": totals["content_types"],
+        "categories": totals["categories"],
+        "pillars": totals["pillars"]
+    }
+
+def _flatten_month_stats(doc: dict) -> dict:
+    paths = {"total": doc.get("total", 0)} if doc.get("total") else {}
+    for _, bucket in STAT_FIELDS:
+        for key, count in doc.get(bucket, {}).items():
+            if count:
+                paths[f"{bucket}.{key}"] = count
+    return paths
+
+def _expand_month_stats(paths: dict) -> dict:
+    doc = {"total": paths.get("total", 0)}
+    for _, bucket in STAT_FIELDS:
+        doc[bucket] = {}
+    for path, count in paths.items():
+        if "." in path:
+            bucket, key = path.split(".", 1)
+            doc[bucket][key] = count
+    return doc
+
+async def _count_month_stats(match: dict) -> dict:
+    """month_stats paths per (user_id, month_key), counted from posts and archived months"""
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "month_key": "$month_key",
+                "content_type": "$content_type",
+                "category": "$category",
+                "pillar": "$pillar"
+            },
+            "count": {"$sum": 1}
+        }}
+    ]
+    expected = {}
+    async for row in posts_collection.aggregate(pipeline, allowDiskUse=True):
+        _add_post_stats(expected, row["_id"]["user_id"], row["_id"], row["count"])
+    # Archived months keep their counters, so count their embedded posts too
+    archived_pipeline = [
+        {"$match": dict(match, state="archived")},
+        {"$unwind": "$posts"},
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "month_key": "$month_key",
+                "content_type": "$posts.content_type",
+                "category": "$posts.category",
+                "pillar": "$posts.pillar"
+            },
+            "count": {"$sum": 1}
+        }}
+    ]
+    async for row in month_archive_collection.aggregate(archived_pipeline, allowDiskUse=True):
+        _add_post_stats(expected, row["_id"]["user_id"], row["_id"], row["count"])
+    return expected
+
+async def _read_month_stats(match: dict) -> tuple:
+    """Stored month_stats paths and updated_at per (user_id, month_key)"""
+    actual, versions = {}, {}
+    async for doc in month_stats_collection.find(match, {"_id": 0}):
+        key = (doc["user_id"], doc["month_key"])
+        actual[key] = _flatten_month_stats(doc)
+        versions[key] = doc.get("updated_at")
+    return actual, versions
+
+async def _expected_month_stats(match: dict) -> dict:
+    expected = await _count_month_stats(match)
+    return {key: {path: n for path, n in paths.items() if n} for key, paths in expected.items()}
+
+def _month_keys_match(keys) -> dict:
+    return {"$or": [{"user_id": user_id, "month_key": month_key} for user_id, month_key in keys]}
+
+async def _write_month_stats(keys: list, expected: dict, versions: dict) -> list:
+    """Overwrite the counters of keys with expected, fenced on the updated_at read before counting.
+
+    Returns the keys whose counters changed after they were read, which
+    have to be counted again.
+    """
+    now = datetime.utcnow()
+    # Mongo keeps milliseconds; stamping with them lets us recognise our own writes below
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    requests = []
+    for key in keys:
+        fence = {"user_id": key[0], "month_key": key[1]}
+        if key in versions:
+            fence["updated_at"] = versions[key]
+        if not expected.get(key):
+            requests.append(DeleteOne(fence))
+            continue
+        doc = _expand_month_stats(expected[key])
+        doc.update({"user_id": key[0], "month_key": key[1], "updated_at": now})
+        if key in versions:
+            requests.append(ReplaceOne(fence, doc))
+        else:
+            requests.append(UpdateOne(fence, {"$setOnInsert": doc}, upsert=True))
+    await month_stats_collection.bulk_write(requests, ordered=False)
+    
+    stored = {}
+    async for doc in month_stats_collection.find(_month_keys_match(keys), {"_id": 0, "user_id": 1, "month_key": 1, "updated_at": 1}):
+        stored[(doc["user_id"], doc["month_key"])] = doc.get("updated_at")
+    changed = []
+    for key in keys:
+        if expected.get(key):
+            # Replaced by us unless the fence missed or a write landed since
+            if stored.get(key) != now:
+                changed.append(key)
+        elif key in stored:
+            changed.append(key)
+    return changed
+
+@monitored
+async def rebuild_month_stats(user_id: Optional[str] = None, dry_run: bool = False) -> dict:
+    """Recompute month_stats from the posts collection and report any drift.
+    
+    Counters are read before the posts are counted and each rewrite is
+    fenced on the updated_at that was read, so a post written meanwhile
+    makes its month be counted again instead of being overwritten.
+    """
+    match = {"user_id": user_id} if user_id else {}
+    actual, versions = await _read_month_stats(match)
+    expected = await _expected_month_stats(match)
+    
+    drift = [
+        {
+            "user_id": key[0],
+            "month_key": key[1],
+            "expected": expected.get(key, {}),
+            "actual": actual.get(key, {})
+        }
+        for key in sorted(set(expected) | set(actual))
+        if expected.get(key, {}) != actual.get(key, {})
+    ]
+    
+    if not dry_run:
+        keys = [(row["user_id"], row["month_key"]) for row in drift]
+        rewrite, versions_read = expected, versions
+        for _ in range(MONTH_STATS_REBUILD_ATTEMPTS):
+            if not keys:
+                break
+            changed = await _write_month_stats(keys, rewrite, versions_read)
+            if not changed:
+                keys = []
+                break
+            stored, versions_read = await _read_month_stats(_month_keys_match(changed))
+            rewrite = await _expected_month_stats(_month_keys_match(changed))
+            keys = [key for key in changed if rewrite.get(key, {}) != stored.get(key, {})]
+        if keys:
+            logger.warning(f"month_stats of {len(keys)} user-months kept changing during the rebuild")
+    
+    return {
+        "months_checked": len(set(expected) | set(actual)),
+        "drifted": drift,
+        "repaired": 0 if dry_run else len(drift)
+    }
+
+@monitored
+async def backfill_month_stats() -> bool:
+    """Rebuild every month_stats counter once, for posts written before they existed.
+    
+    Completion is recorded in schema_migrations, so only one worker of the
+    first deploy does the work; the others return False until it is done,
+    and True from then on.
+    """
+    marker = {"collection": "month_stats_backfill", "version": MONTH_STATS_BACKFILL_VERSION}
+    now = datetime.utcnow()
+    await schema_migrations_collection.update_one(
+        marker, {"$setOnInsert": {"lease_until": None, "completed_at": None}}, upsert=True
+    )
+    claimed = await schema_migrations_collection.find_one_and_update(
+        dict(marker, completed_at=None, **{"$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]}),
+        {"$set": {
+            "lease_until": now + timedelta(seconds=MONTH_STATS_BACKFILL_LEASE_SECONDS),
+            "updated_at": now
+        }},
+        return_document=ReturnDocument.AFTER
+    )
+    if claimed is None:
+        # Finished already, or another worker is running it
+        done = await schema_migrations_collection.find_one(
+            dict(marker, completed_at={"$ne": None}), {"_id": 1}
+        ) is not None
+        month_stats_status["backfilled"] = done
+        return done
+    
+    report = await rebuild_month_stats()
+    now = datetime.utcnow()
+    await schema_migrations_collection.update_one(
+        {"_id": claimed["_id"]},
+        {"$set": {"lease_until": None, "updated_at": now, "completed_at": now, "repaired": report["repaired"]}}
+    )
+    logger.info(f"month_stats backfill completed ({report['repaired']} of {report['months_checked']} user-months rewritten)")
+    month_stats_status["backfilled"] = True
+    return True
+
+def archive_cutoff(now: Optional[datetime] = None) -> Optional[str]:
+    """Month key before which months count as cold, or None when archiving is off"""
+    if ARCHIVE_AFTER_MONTHS <= 0:
+        return None
+    now = now or datetime.utcnow()
+    months = now.year * 12 + now.month - 1 - ARCHIVE_AFTER_MONTHS
+    return f"{months // 12:04d}-{months % 12 + 1:02d}"
+
+def is_cold_month(month_key: str) -> bool:
+    """Whether month_key is old enough that it may have been archived"""
+    cutoff = archive_cutoff()
+    return cutoff is not None and month_key < cutoff
+
+def _compress_text(doc: dict, fields: tuple) -> dict:
+    packed = {key: value for key, value in doc.items() if key != "_id"}
+    for field in fields:
+        value = packed.get(field)
+        if isinstance(value, str) and len(value) >= ARCHIVE_COMPRESS_MIN_LENGTH:
+            packed[field] = zlib.compress(value.encode('utf-8'))
+    return packed
+
+def _decompress_text(doc: dict, fields: tuple) -> dict:
+    for field in fields:
+        if isinstance(doc.get(field), bytes):
+            doc[field] = zlib.decompress(doc[field]).decode('utf-8')
+    return doc
+
+@monitored
+async def restore_archived_month(user_id: str, month_key: str) -> bool:
+    """Move an archived month back into monthly_data and posts.
+    
+    Returns True if the month was archived and has been restored. Restoring
+    only inserts documents that are missing, so a restore interrupted part
+    way is simply finished by the next one. Concurrent callers wait for the
+    request that claimed the restore instead of restoring twice.
+    """
+    query = {"user_id": user_id, "month_key": month_key}
+    deadline = time.monotonic() + ARCHIVE_RESTORE_WAIT_SECONDS
+    while True:
+        archive = await month_archive_collection.find_one(query, {"_id": 0, "state": 1, "lease_until": 1})
+        if archive is None or archive["state"] == "restored":
+            return False
+        
+        now = datetime.utcnow()
+        if archive["state"] == "archived" or archive["lease_until"] < now:
+            # An archive job that died part way left "archiving" behind; restore what it took
+            archive = await month_archive_collection.find_one_and_update(
+                dict(query, **{"$or": [
+                    {"state": "archived"},
+                    {"state": {"$in": ["restoring", "archiving"]}, "lease_until": {"$lt": now}}
+                ]}),
+                {"$set": {
+                    "state": "restoring",
+                    "lease_until": now + timedelta(seconds=ARCHIVE_RESTORE_LEASE_SECONDS)
+                }},
+                return_document=ReturnDocument.AFTER
+            )
+            if archive is not None:
+                break
+        
+        if time.monotonic() >= deadline:
+            logger.warning(f"Gave up waiting for the restore of {user_id} {month_key}")
+            return False
+        await asyncio.sleep(0.05)
+    
+    if archive.get("monthly_data"):
+        # Archives may predate the current schema; restore documents already upgraded
+        month = upgrade("monthly_data", _decompress_text(archive["monthly_data"], ARCHIVE_MONTH_TEXT_FIELDS))
+        await monthly_data_collection.update_one(query, {"$setOnInsert": month}, upsert=True)
+    posts = [upgrade("posts", _decompress_text(post, ARCHIVE_POST_TEXT_FIELDS)) for post in archive.get("posts", [])]
+    requests = [
+        UpdateOne({"user_id": user_id, "id": post["id"]}, {"$setOnInsert": post}, upsert=True)
+        for post in posts
+    ]
+    if requests:
+        await posts_collection.bulk_write(requests, ordered=False)
+    
+    # Keep a stub so the archive job leaves recently used months alone for a while
+    await month_archive_collection.update_one(
+        {"_id": archive["_id"]},
+        {
+            "$set": {"state": "restored", "restored_at": datetime.utcnow()},
+            "$unset": {"monthly_data": "", "posts": "", "lease_until": ""}
+        }
+    )
+    logger.info(f"Restored archived month {user_id} {month_key} ({len(requests)} posts)")
+    return True
+
+async def _cold_user_months(cutoff: str, user_id: Optional[str] = None) -> List[tuple]:
+    match = {"month_key": {"$lt": cutoff}}
+    if user_id:
+        match["user_id"] = user_id
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": {"user_id": "$user_id", "month_key": "$month_key"}}}
+    ]
+    keys = set()
+    for collection in (monthly_data_collection, posts_collection):
+        async for row in collection.aggregate(pipeline, allowDiskUse=True):
+            keys.add((row["_id"]["user_id"], row["_id"]["month_key"]))
+    return sorted(keys)
+
+@monitored
+async def archive_month(user_id: str, month_key: str, dry_run: bool = False) -> Optional[dict]:
+    """Move one user-month into the archive, returning its sizes, or None if skipped"""
+    query = {"user_id": user_id, "month_key": month_key}
+    existing = await month_archive_collection.find_one(query, {"_id": 0, "state": 1, "restored_at": 1})
+    if existing is not None:
+        if existing["state"] != "restored":
+            return None
+        if existing["restored_at"] > datetime.utcnow() - timedelta(days=ARCHIVE_RESTORE_GRACE_DAYS):
+            return None
+    
+    month = await monthly_data_collection.find_one(query)
+    posts = await posts_collection.find(query).sort(PAGE_SORT).to_list(length=None)
+    if month is None and not posts:
+        return None
+    
+    archive = {
+        "user_id": user_id,
+        "month_key": month_key,
+        "state": "archived",
+        "monthly_data": _compress_text(month, ARCHIVE_MONTH_TEXT_FIELDS) if month else None,
+        "posts": [_compress_text(post, ARCHIVE_POST_TEXT_FIELDS) for post in posts],
+        "archived_at": datetime.utcnow()
+    }
+    sizes = {
+        "posts": len(posts),
+        "live_bytes": sum(len(bson.encode(doc)) for doc in ([month] if month else []) + posts),
+        "archived_bytes": len(bson.encode(archive))
+    }
+    if dry_run:
+        return sizes
+    
+    # Until the live documents are gone the archive is not counted or restored from
+    lease_until = datetime.utcnow() + timedelta(seconds=ARCHIVE_RESTORE_LEASE_SECONDS)
+    await month_archive_collection.replace_one(
+        query, dict(archive, state="archiving", lease_until=lease_until), upsert=True
+    )
+    # Anything edited or deleted since it was read is left alone, so only what
+    # was actually removed here may stay in the archive
+    month_removed = month is not None and await monthly_data_collection.find_one_and_delete(
+        {"_id": month["_id"], "updated_at": month.get("updated_at")}, {"_id": 1}
+    ) is not None
+    deletes = asyncio.Semaphore(ARCHIVE_DELETE_CONCURRENCY)
+    
+    async def delete_post_if_unchanged(post: dict) -> Optional[dict]:
+        async with deletes:
+            return await posts_collection.find_one_and_delete(
+                {"_id": post["_id"], "updated_at": post.get("updated_at")}, {"_id": 1}
+            )
+    
+    removed = await asyncio.gather(*[delete_post_if_unchanged(post) for post in posts])
+    archived_posts = [packed for packed, result in zip(archive["posts"], removed) if result is not None]
+    
+    if not month_removed and not archived_posts:
+        await month_archive_collection.delete_one(dict(query, state="archiving"))
+        return None
+    
+    archive_update = {"state": "archived"}
+    if not month_removed or len(archived_posts) < len(posts):
+        logger.info(f"Month {user_id} {month_key} changed while archiving; archiving what was removed")
+        archive_update.update({
+            "monthly_data": archive["monthly_data"] if month_removed else None,
+            "posts": archived_posts
+        })
+    await month_archive_collection.update_one(
+        dict(query, state="archiving"), {"$set": archive_update, "$unset": {"lease_until": ""}}
+    )
+    sizes["posts"] = len(archived_posts)
+    return sizes
+
+@monitored
+async def archive_cold_months(user_id: Optional[str] = None, dry_run: bool = False) -> dict:
+    """Archive every user-month older than the ARCHIVE_AFTER_MONTHS horizon"""
+    report = {"cutoff": archive_cutoff(), "months_checked": 0, "archived": 0, "skipped": 0,
+              "failed": 0, "posts": 0, "live_bytes": 0, "archived_bytes": 0}
+    if report["cutoff"] is None:
+        return report
+    
+    for month_user_id, month_key in await _cold_user_months(report["cutoff"], user_id):
+        report["months_checked"] += 1
+        try:
+            sizes = await archive_month(month_user_id, month_key, dry_run=dry_run)
+        except DocumentTooLarge:
+            logger.warning(f"Month {month_user_id} {month_key} is too large to archive as one document")
+            report["failed"] += 1
+            continue
+        if sizes is None:
+            report["skipped"] += 1
+            continue
+        report["archived"] += 1
+        for key in ("posts", "live_bytes", "archived_bytes"):
+            report[key] += sizes[key]
+    return report
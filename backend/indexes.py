@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Index bootstrap for the Content Strategy Planner collections.
+
+ensure_indexes() runs at app startup and is safe to run repeatedly: creating an
+index that already exists with the same spec is a no-op in MongoDB.
+
+Run directly to build the indexes and verify that no hot query falls back to a
+collection scan:
+
+    python indexes.py --check
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List, Tuple
+
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.errors import PyMongoError
+
+from database import (
+    users_collection, monthly_data_collection, content_ideas_collection, posts_collection,
+    month_stats_collection, change_counters_collection, purge_jobs_collection, analytics_collection,
+    month_archive_collection, schema_migrations_collection
+)
+
+logger = logging.getLogger(__name__)
+
+# Completed purge jobs stay in the admin list this long
+PURGE_JOB_RETENTION_DAYS = float(os.environ.get('PURGE_JOB_RETENTION_DAYS', 30))
+
+# (collection, indexes it must have)
+INDEXES: List[Tuple[object, List[IndexModel]]] = [
+    (users_collection, [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # One small partial index per branch of get_revoked_users' $or
+        IndexModel([("is_active", ASCENDING)], name="inactive", partialFilterExpression={"is_active": False}),
+        IndexModel(
+            [("approval_status", ASCENDING)], name="denied",
+            partialFilterExpression={"approval_status": "denied"}
+        ),
+        IndexModel(
+            [("token_version", ASCENDING)], name="token_version_bumped",
+            partialFilterExpression={"token_version": {"$gt": 0}}
+        ),
+    ]),
+    (monthly_data_collection, [
+        IndexModel([("user_id", ASCENDING), ("month_key", ASCENDING)], name="user_month_unique", unique=True),
+    ]),
+    (posts_collection, [
+        IndexModel([("user_id", ASCENDING), ("month_key", ASCENDING), ("date_key", ASCENDING)], name="user_month_date"),
+        IndexModel([("user_id", ASCENDING), ("id", ASCENDING)], name="user_id_lookup"),
+        IndexModel(
+            [("user_id", ASCENDING), ("month_key", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+            name="user_month_page"
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("topic", TEXT), ("caption", TEXT), ("notes", TEXT)],
+            name="user_text_search", weights={"topic": 3, "caption": 2, "notes": 1}
+        ),
+    ]),
+    (content_ideas_collection, [
+        IndexModel([("user_id", ASCENDING), ("id", ASCENDING)], name="user_id_lookup"),
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="user_page"),
+        IndexModel([("user_id", ASCENDING), ("text", TEXT)], name="user_text_search"),
+    ]),
+    (analytics_collection, [
+        IndexModel([("user_id", ASCENDING), ("month_key", ASCENDING)], name="user_month_unique", unique=True),
+    ]),
+    (month_archive_collection, [
+        IndexModel([("user_id", ASCENDING), ("month_key", ASCENDING)], name="user_month_unique", unique=True),
+    ]),
+    (schema_migrations_collection, [
+        IndexModel([("collection", ASCENDING), ("version", ASCENDING)], name="collection_version_unique", unique=True),
+    ]),
+    (month_stats_collection, [
+        IndexModel([("user_id", ASCENDING), ("month_key", ASCENDING)], name="user_month_unique", unique=True),
+    ]),
+    (change_counters_collection, [
+        IndexModel([("user_id", ASCENDING), ("scope", ASCENDING)], name="user_scope_unique", unique=True),
+    ]),
+    (purge_jobs_collection, [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created"),
+        IndexModel([("created_at", ASCENDING)], name="created"),
+        # Jobs still running have completed_at None, which a TTL index never expires
+        IndexModel(
+            [("completed_at", ASCENDING)], name="completed_ttl",
+            expireAfterSeconds=int(PURGE_JOB_RETENTION_DAYS * 86400)
+        ),
+    ]),
+]
+
+# Filters issued by the database.py helpers on every request
+HOT_QUERIES = [
+    ("find_user_by_email", users_collection, {"email": "plan-check@example.com"}),
+    ("find_user_by_id", users_collection, {"id": "plan-check"}),
+    ("get_revoked_users", users_collection, {"$or": [
+        {"is_active": False}, {"approval_status": "denied"}, {"token_version": {"$gt": 0}}
+    ]}),
+    ("get_revoked_users", purge_jobs_collection, {"status": {"$ne": "cancelled"}, "created_at": {"$gte": datetime(2025, 1, 1)}}),
+    ("get_monthly_data", monthly_data_collection, {"user_id": "plan-check", "month_key": "2025-01"}),
+    ("get_monthly_data_range", monthly_data_collection, {"user_id": "plan-check", "month_key": {"$gte": "2025-01", "$lte": "2025-12"}}),
+    ("get_posts_for_date", posts_collection, {"user_id": "plan-check", "month_key": "2025-01", "date_key": "2025-01-15"}),
+    ("get_posts_for_month", posts_collection, {"user_id": "plan-check", "month_key": "2025-01"}),
+    ("restore_archived_month", month_archive_collection, {"user_id": "plan-check", "month_key": "2025-01"}),
+    ("get_change_counter", change_counters_collection, {"user_id": "plan-check", "scope": "posts:2025-01"}),
+    ("get_content_stats", month_stats_collection, {"user_id": "plan-check", "month_key": {"$gte": "2025-01", "$lte": "2025-12"}}),
+    ("get_analytics_series", analytics_collection, {"user_id": "plan-check", "month_key": {"$gte": "2025-01", "$lte": "2025-12"}}),
+    ("update_post", posts_collection, {"id": "plan-check", "user_id": "plan-check"}),
+    ("get_all_content_ideas", content_ideas_collection, {"user_id": "plan-check"}),
+    ("update_content_idea", content_ideas_collection, {"id": "plan-check", "user_id": "plan-check"}),
+    ("search_content", content_ideas_collection, {"user_id": "plan-check", "$text": {"$search": "plan"}}),
+    ("search_content", posts_collection, {"user_id": "plan-check", "$text": {"$search": "plan"}}),
+]
+
+# Progress of the last ensure_indexes() run, exposed on the metrics endpoint
+index_status = {"state": "pending", "built": 0, "total": 0, "ready": [], "failed": []}
+
+async def ensure_indexes() -> dict:
+    """Create every declared index, logging progress as each one finishes"""
+    total = sum(len(models) for _, models in INDEXES)
+    index_status.update({"state": "building", "built": 0, "total": total, "ready": [], "failed": []})
+
+    for collection, models in INDEXES:
+        for model in models:
+            name = model.document["name"]
+            started = time.monotonic()
+            try:
+                await collection.create_indexes([model])
+            except PyMongoError as e:
+                # Usually duplicate keys blocking a unique index; keep building the rest
+                logger.error(f"Index {collection.name}.{name} failed: {str(e)}")
+                index_status["failed"].append(f"{collection.name}.{name}")
+                continue
+            index_status["built"] += 1
+            index_status["ready"].append(f"{collection.name}.{name}")
+            logger.info(
+                f"Index {collection.name}.{name} ready "
+                f"({index_status['built']}/{total}, {time.monotonic() - started:.2f}s)"
+            )
+
+    index_status["state"] = "failed" if index_status["failed"] else "ready"
+    return dict(index_status)
+
+def _plan_stages(plan) -> List[str]:
+    """Collect every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+async def check_query_plans() -> List[str]:
+    """Return the hot queries whose winning plan is a collection scan"""
+    collscans = []
+    for helper, collection, query in HOT_QUERIES:
+        explain = await collection.find(query).explain()
+        if "COLLSCAN" in _plan_stages(explain["queryPlanner"]["winningPlan"]):
+            collscans.append(f"{helper}: {collection.name} {sorted(query)}")
+    return collscans
+
+async def main(check: bool) -> int:
+    status = await ensure_indexes()
+    print(f"Indexes: {status['built']}/{status['total']} ready")
+    for name in status["failed"]:
+        print(f"❌ Failed to build {name}")
+
+    if not check:
+        return 1 if status["failed"] else 0
+
+    collscans = await check_query_plans()
+    for collscan in collscans:
+        print(f"❌ COLLSCAN in {collscan}")
+    if not collscans:
+        print("✅ Every hot query uses an index")
+    return 1 if status["failed"] or collscans else 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(main(check="--check" in sys.argv)))
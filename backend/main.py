@@ -1,24 +1,50 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status, UploadFile, File, Body
+from pydantic import ValidationError
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import os
+import re
 import logging
 from pathlib import Path
-from typing import List, Dict
-from datetime import datetime
+from typing import Any, List, Dict, Optional, Union
+from datetime import datetime, timedelta
+import asyncio
 
 from models import (
     User, UserCreate, UserLogin, UserResponse, UserUpdate,
     MonthlyData, MonthlyDataCreate,
-    ContentIdea, ContentIdeaCreate, ContentIdeaUpdate,
-    Post, PostCreate, PostUpdate, MediaUpload
+    ContentIdea, ContentIdeaCreate, ContentIdeaUpdate, ContentIdeaPage,
+    Post, PostCreate, PostUpdate, PostPage, MediaUpload,
+    BulkPostRequest, BulkPostResult, SearchResult, SearchPage,
+    AnalyticsMonth, AnalyticsSeries, AnalyticsUpdate
 )
-from auth import hash_password, verify_password, create_access_token, get_current_user
+from auth import (
+    hash_password_async, verify_password_async, create_access_token, get_current_user,
+    password_pool, token_cache, revocation_list, REVOCATION_REFRESH_SECONDS, JWT_EXPIRATION_TIME_HOURS
+)
+from principals import require_admin
+from activity_tracker import activity_tracker
+from autosave import autosave_buffer
+from rate_limiter import check_login_rate_limit, get_client_ip, login_rate_limit_stats, release_login_attempt
+from indexes import ensure_indexes, index_status
+from streaming import wants_ndjson, ndjson_response
+from conditional import check_etag, etag_headers, not_modified_response
+from serializers import json_response, post_serializer, content_idea_serializer, user_response_serializer
+from user_purge import enqueue_user_purge, cancel_user_purge, get_purge_job, get_recent_purge_jobs, purge_worker
+from schema import upgrade_document, snake_case
+from schema_migrator import schema_migrator
+from query_monitor import query_monitor
 from database import (
-    find_user_by_email, create_user, find_user_by_id, get_all_users, update_user_status,
-    get_monthly_data, upsert_monthly_data,
+    client, find_user_by_email, create_user, find_user_by_id, get_all_users, update_user_status,
+    delete_user as delete_user_record, principal_cache, revoke_user_tokens, get_revoked_users,
+    get_monthly_data,
     get_all_content_ideas, create_content_idea, update_content_idea, delete_content_idea,
-    get_posts_for_date, get_posts_for_month, create_post, update_post, delete_post
+    get_posts_for_date, get_posts_for_month, create_post, update_post, delete_post,
+    get_content_ideas_page, get_posts_page, decode_page_cursor,
+    iter_all_users, iter_content_ideas, iter_posts_for_month, bulk_write_posts,
+    get_content_stats, search_content, decode_search_cursor,
+    get_analytics_series, set_analytics_metrics, is_cold_month, restore_archived_month,
+    get_monthly_data_range, month_keys, backfill_month_stats, MONTH_STATS_BACKFILL_RETRY_SECONDS
 )
 from media_service import MediaService
 from email_service import EmailService
@@ -26,6 +52,32 @@ from email_service import EmailService
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Pagination configuration
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 500))
+
+# YYYY-MM month keys accepted by range queries
+MONTH_KEY_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])$"
+
+# Category buckets the Content Tracker always shows
+CONTENT_CATEGORIES = ["Credibility", "Connection", "Community", "Conversion"]
+
+# Bulk post mutation configuration
+BULK_POSTS_MAX_OPERATIONS = int(os.environ.get('BULK_POSTS_MAX_OPERATIONS', 500))
+
+# Longest month range the range endpoints will return
+MAX_MONTH_RANGE = int(os.environ.get('MAX_MONTH_RANGE', 120))
+
+# MonthlyData fields a range read may select; month_key is always included
+MONTH_FIELDS = set(MonthlyData.model_fields) - {"month_key"}
+
+# Top-level MonthlyData fields a merge patch may change
+MONTH_PATCH_FIELDS = set(MonthlyDataCreate.model_fields)
+
+# Search configuration
+SEARCH_MAX_QUERY_LENGTH = int(os.environ.get('SEARCH_MAX_QUERY_LENGTH', 200))
+SEARCH_DEFAULT_PAGE_SIZE = int(os.environ.get('SEARCH_DEFAULT_PAGE_SIZE', 20))
+
 # Create the main app without a prefix
 app = FastAPI(title="Content Strategy Planner API")
 
@@ -53,7 +105,7 @@ async def register(user_data: UserCreate):
             email=user_data.email,
             name=user_data.name,
             social_handle=user_data.socialHandle,
-            password_hash=hash_password(user_data.password),
+            password_hash=await hash_password_async(user_data.password),
             approval_status="pending",
             is_active=False  # Not active until approved
         )
@@ -80,14 +132,18 @@ async def register(user_data: UserCreate):
         )
 
 @api_router.post("/auth/login", response_model=dict)
-async def login(login_data: UserLogin):
+async def login(login_data: UserLogin, request: Request):
+    # Throttle before spending any bcrypt time on the attempt
+    check_login_rate_limit(login_data.email, get_client_ip(request))
+    
     # Find user by email
     user = await find_user_by_email(login_data.email)
-    if not user or not verify_password(login_data.password, user["password_hash"]):
+    if not user or not await verify_password_async(login_data.password, user["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
+    release_login_attempt(login_data.email)
     
     # Check approval status
     if user["approval_status"] == "pending":
@@ -110,13 +166,17 @@ async def login(login_data: UserLogin):
         )
     
     # Create access token
-    token = create_access_token(user["id"], user["email"])
+    token = create_access_token(
+        user["id"],
+        user["email"],
+        role="admin" if user.get("is_admin", False) else "user",
+        approval_status=user["approval_status"],
+        token_version=user.get("token_version", 0)
+    )
     
-    # Update last active timestamp
-    await update_user_status(user["id"], {
-        "last_active": datetime.utcnow(),
-        "login_count": user.get("login_count", 0) + 1
-    })
+    # Record activity; the tracker writes it back in batches
+    user = activity_tracker.overlay(user)
+    activity_tracker.record_login(user["id"])
     
     return {
         "message": "Login successful",
@@ -143,6 +203,7 @@ async def verify_token(current_user: dict = Depends(get_current_user)):
             detail="User not found"
         )
     
+    user = activity_tracker.overlay(user)
     return {
         "message": "Token valid",
         "user": UserResponse(
@@ -159,38 +220,15 @@ async def verify_token(current_user: dict = Depends(get_current_user)):
     }
 # Admin Routes
 @api_router.get("/admin/users", response_model=List[UserResponse])
-async def get_all_users_admin(current_user: dict = Depends(get_current_user)):
-    # Check if user is admin
-    admin_user = await find_user_by_id(current_user["user_id"])
-    if not admin_user or not admin_user.get("is_admin", False):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
-        )
-    
-    users = await get_all_users()
-    return [UserResponse(
-        id=user["id"],
-        email=user["email"],
-        name=user["name"],
-        social_handle=user.get("social_handle"),
-        is_active=user["is_active"],
-        is_admin=user.get("is_admin", False),
-        approval_status=user["approval_status"],
-        last_active=user.get("last_active"),
-        created_at=user["created_at"]
-    ) for user in users]
+async def get_all_users_admin(request: Request, admin: dict = Depends(require_admin)):
+    if wants_ndjson(request):
+        return ndjson_response(iter_all_users(), UserResponse, activity_tracker.overlay)
+    
+    users = [activity_tracker.overlay(user) for user in await get_all_users()]
+    return json_response(user_response_serializer.shape_all(users))
 
 @api_router.patch("/admin/users/{user_id}/approve", response_model=dict)
-async def approve_user(user_id: str, current_user: dict = Depends(get_current_user)):
-    # Check if user is admin
-    admin_user = await find_user_by_id(current_user["user_id"])
-    if not admin_user or not admin_user.get("is_admin", False):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
-        )
-    
+async def approve_user(user_id: str, admin: dict = Depends(require_admin)):
     # Get user to approve
     user = await find_user_by_id(user_id)
     if not user:
@@ -207,6 +245,7 @@ async def approve_user(user_id: str, current_user: dict = Depends(get_current_us
     })
     
     if success:
+        revocation_list.restore_user(user_id)
         # Send approval email
         email_result = EmailService.send_approval_notification(user["email"], user["name"])
         return {
@@ -220,15 +259,7 @@ async def approve_user(user_id: str, current_user: dict = Depends(get_current_us
         )
 
 @api_router.patch("/admin/users/{user_id}/deny", response_model=dict)
-async def deny_user(user_id: str, current_user: dict = Depends(get_current_user)):
-    # Check if user is admin
-    admin_user = await find_user_by_id(current_user["user_id"])
-    if not admin_user or not admin_user.get("is_admin", False):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
-        )
-    
+async def deny_user(user_id: str, admin: dict = Depends(require_admin)):
     # Get user to deny
     user = await find_user_by_id(user_id)
     if not user:
@@ -238,13 +269,14 @@ async def deny_user(user_id: str, current_user: dict = Depends(get_current_user)
         )
     
     # Update user status
-    success = await update_user_status(user_id, {
+    token_version = await revoke_user_tokens(user_id, {
         "approval_status": "denied",
         "is_active": False,
         "updated_at": datetime.utcnow()
     })
     
-    if success:
+    if token_version is not None:
+        revocation_list.revoke_user(user_id, token_version)
         # Send denial email
         email_result = EmailService.send_denial_notification(user["email"], user["name"])
         return {
@@ -258,14 +290,7 @@ async def deny_user(user_id: str, current_user: dict = Depends(get_current_user)
         )
 
 @api_router.delete("/admin/users/{user_id}", response_model=dict)
-async def delete_user(user_id: str, current_user: dict = Depends(get_current_user)):
-    # Check admin permissions
-    if not current_user.get("is_admin", False):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
-        )
-    
+async def delete_user(user_id: str, admin: dict = Depends(require_admin)):
     # Get user to delete
     user = await find_user_by_id(user_id)
     if not user:
@@ -275,51 +300,60 @@ async def delete_user(user_id: str, current_user: dict = Depends(get_current_use
         )
     
     # Prevent admin from deleting themselves
-    if user_id == current_user["user_id"]:
+    if user_id == admin["user_id"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot delete your own admin account"
         )
     
+    # Queue the purge first, so a deleted user always leaves a job behind to clean up after them
+    try:
+        purge_job_id = await enqueue_user_purge(user_id, user["email"])
+    except Exception as e:
+        logger.error(f"Error queueing purge of user {user_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to delete user"
+        )
+    
     # Delete user from database
     try:
-        from database import db
-        result = await db.users.delete_one({"id": user_id})
-        
-        if result.deleted_count > 0:
-            return {
-                "message": "User deleted successfully",
-                "deleted_user": user["email"]
-            }
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to delete user"
-            )
+        deleted = await delete_user_record(user_id)
     except Exception as e:
         logger.error(f"Error deleting user: {str(e)}")
+        deleted = False
+    
+    if not deleted:
+        try:
+            await cancel_user_purge(purge_job_id)
+        except Exception as e:
+            # The worker cancels it too once it sees the user is still there
+            logger.error(f"Error cancelling purge job {purge_job_id}: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete user"
         )
+    
+    revocation_list.mark_deleted(user_id)
+    await autosave_buffer.discard_user(user_id)
+    # Posts, ideas, months and media are removed in the background
+    purge_worker.wake()
+    return {
+        "message": "User deleted successfully",
+        "deleted_user": user["email"],
+        "purge_job_id": purge_job_id
+    }
 
 @api_router.patch("/admin/users/{user_id}/suspend", response_model=dict)
-async def suspend_user(user_id: str, current_user: dict = Depends(get_current_user)):
-    # Check if user is admin
-    admin_user = await find_user_by_id(current_user["user_id"])
-    if not admin_user or not admin_user.get("is_admin", False):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
-        )
-    
+async def suspend_user(user_id: str, admin: dict = Depends(require_admin)):
     # Update user status
-    success = await update_user_status(user_id, {
+    token_version = await revoke_user_tokens(user_id, {
         "is_active": False,
         "updated_at": datetime.utcnow()
     })
     
-    if success:
+    if token_version is not None:
+        revocation_list.revoke_user(user_id, token_version)
         return {"message": "User suspended successfully"}
     else:
         raise HTTPException(
@@ -327,17 +361,24 @@ async def suspend_user(user_id: str, current_user: dict = Depends(get_current_us
             detail="Failed to suspend user"
         )
 
-# Health Check Route
-@api_router.get("/admin/health", response_model=dict)
-async def get_health_status(current_user: dict = Depends(get_current_user)):
-    # Check if user is admin
-    admin_user = await find_user_by_id(current_user["user_id"])
-    if not admin_user or not admin_user.get("is_admin", False):
+@api_router.get("/admin/purge-jobs", response_model=List[dict])
+async def list_purge_jobs(admin: dict = Depends(require_admin)):
+    return await get_recent_purge_jobs()
+
+@api_router.get("/admin/purge-jobs/{job_id}", response_model=dict)
+async def get_purge_job_status(job_id: str, admin: dict = Depends(require_admin)):
+    job = await get_purge_job(job_id)
+    if not job:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin access required"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Purge job not found"
         )
     
+    return job
+
+# Health Check Route
+@api_router.get("/admin/health", response_model=dict)
+async def get_health_status(admin: dict = Depends(require_admin)):
     health_status = {
         "mongo": False,
         "jwt": False,
@@ -385,6 +426,31 @@ async def get_health_status(current_user: dict = Depends(get_current_user)):
         pass
     
     return health_status
+
+@api_router.get("/admin/metrics", response_model=dict)
+async def get_metrics(admin: dict = Depends(require_admin)):
+    return {
+        "password_pool": password_pool.stats(),
+        "jwt_cache": token_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "revocation_list": revocation_list.stats(),
+        "activity_tracker": activity_tracker.stats(),
+        "autosave": autosave_buffer.stats(),
+        "login_rate_limit": login_rate_limit_stats(),
+        "indexes": index_status,
+        "schema": schema_migrator.stats()
+    }
+
+@api_router.get("/admin/metrics/queries", response_model=dict)
+async def get_query_metrics(admin: dict = Depends(require_admin)):
+    return query_monitor.stats()
+
+@api_router.get("/admin/slow-queries", response_model=List[dict])
+async def get_slow_queries(admin: dict = Depends(require_admin)):
+    # Plans are fetched here rather than in the listener, which must not run commands
+    await query_monitor.explain_slow_queries(client)
+    return query_monitor.slow_queries()
+
 # Media Upload Routes
 @api_router.post("/media/upload", response_model=dict)
 async def upload_media(
@@ -447,12 +513,63 @@ async def delete_media(
         )
 
 # Monthly Data Routes
+def check_month_range(from_month: str, to_month: str):
+    span = (int(to_month[:4]) - int(from_month[:4])) * 12 + int(to_month[5:]) - int(from_month[5:]) + 1
+    if span < 1 or span > MAX_MONTH_RANGE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"from must not be after to, and the range may span at most {MAX_MONTH_RANGE} months"
+        )
+
+@api_router.get("/months", response_model=dict)
+async def get_monthly_data_range_endpoint(
+    from_month: str = Query(..., alias="from", pattern=MONTH_KEY_PATTERN),
+    to_month: str = Query(..., alias="to", pattern=MONTH_KEY_PATTERN),
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    check_month_range(from_month, to_month)
+    selected = None
+    if fields:
+        selected = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = selected - MONTH_FIELDS
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+    
+    months = await get_monthly_data_range(
+        current_user["user_id"], from_month, to_month, sorted(selected) if selected else None
+    )
+    items = []
+    for month_key in month_keys(from_month, to_month):
+        stored = autosave_buffer.overlay(current_user["user_id"], month_key, months.get(month_key))
+        # Months never saved get the same defaults as GET /months/{month_key}
+        month = MonthlyData(**dict(stored or {}, user_id=current_user["user_id"], month_key=month_key))
+        if selected:
+            items.append(month.model_dump(mode="json", include=selected | {"month_key"}))
+        else:
+            items.append(month.model_dump(mode="json"))
+    return {"from": from_month, "to": to_month, "items": items}
+
 @api_router.get("/months/{month_key}", response_model=MonthlyData)
 async def get_monthly_data_endpoint(
     month_key: str,
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user)
 ):
-    data = await get_monthly_data(current_user["user_id"], month_key)
+    # The change counter only covers buffered autosaves once they are flushed, so skip the ETag
+    if not autosave_buffer.has_pending(current_user["user_id"], month_key):
+        etag, fresh = await check_etag(request, current_user["user_id"], f"months:{month_key}")
+        if fresh:
+            return not_modified_response(etag)
+        response.headers.update(etag_headers(etag))
+    
+    data = autosave_buffer.overlay(
+        current_user["user_id"], month_key, await get_monthly_data(current_user["user_id"], month_key)
+    )
     if not data:
         # Return default monthly data structure
         default_data = MonthlyData(
@@ -474,7 +591,8 @@ async def create_or_update_monthly_data(
     
     monthly_data = MonthlyData(**data_dict)
     
-    data_id = await upsert_monthly_data(
+    # Coalesced with the other autosaves of this month before it reaches Mongo
+    data_id = await autosave_buffer.save(
         current_user["user_id"],
         month_key,
         monthly_data.dict()
@@ -482,11 +600,90 @@ async def create_or_update_monthly_data(
     
     return {"message": "Monthly data saved successfully", "id": data_id}
 
+@api_router.patch("/months/{month_key}", response_model=dict)
+async def patch_monthly_data_endpoint(
+    month_key: str,
+    patch: Dict[str, Any] = Body(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Apply a JSON Merge Patch (RFC 7396); only the changed paths are written"""
+    if not re.match(MONTH_KEY_PATTERN, month_key):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="month_key must be YYYY-MM"
+        )
+    
+    # The planner sends camelCase top-level keys such as postingPlan
+    fields = {snake_case(key): value for key, value in patch.items()}
+    unknown = set(fields) - MONTH_PATCH_FIELDS
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    try:
+        # Replacement values must have the field's type; null removes the field
+        MonthlyDataCreate(**{key: value for key, value in fields.items() if value is not None})
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False, include_context=False)
+        )
+    
+    try:
+        data_id = await autosave_buffer.patch(current_user["user_id"], month_key, fields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return {"message": "Monthly data updated successfully", "id": data_id}
+
+def parse_page_cursor(cursor: Optional[str]) -> Optional[tuple]:
+    if cursor is None:
+        return None
+    try:
+        return decode_page_cursor(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
 # Content Ideas Routes
-@api_router.get("/content-ideas", response_model=List[ContentIdea])
-async def get_content_ideas(current_user: dict = Depends(get_current_user)):
-    ideas = await get_all_content_ideas(current_user["user_id"])
-    return [ContentIdea(**idea) for idea in ideas]
+@api_router.get("/content-ideas", response_model=Union[ContentIdeaPage, List[ContentIdea]])
+async def get_content_ideas(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    etag, fresh = await check_etag(request, current_user["user_id"], "ideas")
+    if fresh:
+        return not_modified_response(etag)
+    response.headers.update(etag_headers(etag))
+    
+    if wants_ndjson(request):
+        return ndjson_response(
+            iter_content_ideas(current_user["user_id"]), ContentIdea,
+            lambda idea: upgrade_document("content_ideas", idea), headers=etag_headers(etag)
+        )
+    
+    # Without limit or cursor, keep returning the full list for existing clients
+    # Stored documents are shaped and encoded directly rather than validated twice
+    if limit is None and cursor is None:
+        ideas = await get_all_content_ideas(current_user["user_id"])
+        return json_response(content_idea_serializer.shape_all(ideas), headers=etag_headers(etag))
+    
+    ideas, next_cursor = await get_content_ideas_page(
+        current_user["user_id"], limit or DEFAULT_PAGE_SIZE, parse_page_cursor(cursor)
+    )
+    return json_response(
+        {"items": content_idea_serializer.shape_all(ideas), "next_cursor": next_cursor},
+        headers=etag_headers(etag)
+    )
 
 @api_router.post("/content-ideas", response_model=dict)
 async def create_idea(
@@ -544,13 +741,41 @@ async def get_posts_by_date(
     posts = await get_posts_for_date(current_user["user_id"], month_key, date_key)
     return [Post(**post) for post in posts]
 
-@api_router.get("/posts/{month_key}", response_model=List[Post])
+@api_router.get("/posts/{month_key}", response_model=Union[PostPage, List[Post]])
 async def get_posts_by_month(
     month_key: str,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    posts = await get_posts_for_month(current_user["user_id"], month_key)
-    return [Post(**post) for post in posts]
+    etag, fresh = await check_etag(request, current_user["user_id"], f"posts:{month_key}")
+    if fresh:
+        return not_modified_response(etag)
+    response.headers.update(etag_headers(etag))
+    
+    if wants_ndjson(request):
+        if is_cold_month(month_key):
+            await restore_archived_month(current_user["user_id"], month_key)
+        return ndjson_response(
+            iter_posts_for_month(current_user["user_id"], month_key), Post,
+            lambda post: upgrade_document("posts", post), headers=etag_headers(etag)
+        )
+    
+    # Without limit or cursor, keep returning the full list for existing clients
+    # Stored documents are shaped and encoded directly rather than validated twice
+    if limit is None and cursor is None:
+        posts = await get_posts_for_month(current_user["user_id"], month_key)
+        return json_response(post_serializer.shape_all(posts), headers=etag_headers(etag))
+    
+    posts, next_cursor = await get_posts_page(
+        current_user["user_id"], month_key, limit or DEFAULT_PAGE_SIZE, parse_page_cursor(cursor)
+    )
+    return json_response(
+        {"items": post_serializer.shape_all(posts), "next_cursor": next_cursor},
+        headers=etag_headers(etag)
+    )
 
 @api_router.post("/posts", response_model=dict)
 async def create_new_post(
@@ -565,6 +790,46 @@ async def create_new_post(
     post_id = await create_post(post.dict())
     return {"message": "Post created successfully", "id": post_id}
 
+@api_router.post("/posts/bulk", response_model=dict)
+async def bulk_update_posts(
+    bulk_request: BulkPostRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    if not bulk_request.operations:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No operations provided"
+        )
+    
+    if len(bulk_request.operations) > BULK_POSTS_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A bulk request may contain at most {BULK_POSTS_MAX_OPERATIONS} operations"
+        )
+    
+    now = datetime.utcnow()
+    operations = []
+    for operation in bulk_request.operations:
+        if operation.action == "create":
+            post = Post(user_id=current_user["user_id"], **operation.post.dict())
+            operations.append({"action": "create", "id": post.id, "doc": post.dict()})
+        elif operation.action == "update":
+            # Filter out None values
+            changes = {k: v for k, v in operation.changes.dict().items() if v is not None}
+            changes["updated_at"] = now
+            operations.append({"action": "update", "id": operation.id, "doc": changes})
+        else:
+            operations.append({"action": "delete", "id": operation.id})
+    
+    results = await bulk_write_posts(current_user["user_id"], operations, bulk_request.ordered)
+    
+    return {
+        "message": "Bulk operations processed",
+        "succeeded": sum(1 for result in results if result["success"]),
+        "failed": sum(1 for result in results if not result["success"]),
+        "results": [BulkPostResult(**result) for result in results]
+    }
+
 @api_router.put("/posts/{post_id}", response_model=dict)
 async def update_existing_post(
     post_id: str,
@@ -598,6 +863,113 @@ async def delete_existing_post(
     
     return {"message": "Post deleted successfully"}
 
+# Stats Routes
+@api_router.get("/stats/content", response_model=dict)
+async def get_content_stats_endpoint(
+    from_month: Optional[str] = Query(None, alias="from", pattern=MONTH_KEY_PATTERN),
+    to_month: Optional[str] = Query(None, alias="to", pattern=MONTH_KEY_PATTERN),
+    current_user: dict = Depends(get_current_user)
+):
+    stats = await get_content_stats(current_user["user_id"], from_month, to_month)
+    
+    # Count content types case-insensitively, as the planner has used both spellings
+    type_counts = {}
+    for content_type, count in stats["content_types"].items():
+        key = str(content_type).lower()
+        type_counts[key] = type_counts.get(key, 0) + count
+    
+    category_breakdown = {category: 0 for category in CONTENT_CATEGORIES}
+    category_breakdown.update(stats["categories"])
+    
+    total_posts = type_counts.get("post", 0)
+    total_stories = type_counts.get("story", 0)
+    total_reels = type_counts.get("reel", 0)
+    return {
+        "from": from_month,
+        "to": to_month,
+        "total_posts": total_posts,
+        "total_stories": total_stories,
+        "total_reels": total_reels,
+        "total_content": total_posts + total_stories + total_reels,
+        "content_types": stats["content_types"],
+        "category_breakdown": category_breakdown,
+        "pillar_usage": stats["pillars"]
+    }
+
+# Analytics Routes
+@api_router.get("/analytics", response_model=AnalyticsSeries)
+async def get_analytics(
+    request: Request,
+    response: Response,
+    from_month: Optional[str] = Query(None, alias="from", pattern=MONTH_KEY_PATTERN),
+    to_month: Optional[str] = Query(None, alias="to", pattern=MONTH_KEY_PATTERN),
+    current_user: dict = Depends(get_current_user)
+):
+    if from_month and to_month:
+        check_month_range(from_month, to_month)
+    
+    etag, fresh = await check_etag(request, current_user["user_id"], "analytics")
+    if fresh:
+        return not_modified_response(etag)
+    response.headers.update(etag_headers(etag))
+    
+    months = await get_analytics_series(current_user["user_id"], from_month, to_month)
+    return AnalyticsSeries(items=[AnalyticsMonth(**month) for month in months])
+
+@api_router.patch("/analytics/{month_key}", response_model=AnalyticsMonth)
+async def update_analytics(
+    month_key: str,
+    update: AnalyticsUpdate,
+    current_user: dict = Depends(get_current_user)
+):
+    if not re.match(MONTH_KEY_PATTERN, month_key):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="month_key must be YYYY-MM"
+        )
+    
+    month = await set_analytics_metrics(current_user["user_id"], month_key, update.metrics)
+    return AnalyticsMonth(**month)
+
+# Search Routes
+@api_router.get("/search", response_model=SearchPage)
+async def search(
+    q: str = Query(..., min_length=1, max_length=SEARCH_MAX_QUERY_LENGTH),
+    kind: Optional[str] = Query(None, pattern="^(idea|post)$"),
+    pillar: Optional[str] = None,
+    category: Optional[str] = None,
+    limit: int = Query(SEARCH_DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    if not q.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Search query cannot be empty"
+        )
+    
+    after = None
+    if cursor is not None:
+        try:
+            after = decode_search_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    
+    hits, next_cursor = await search_content(
+        current_user["user_id"], q, limit, after, kind=kind, pillar=pillar, category=category
+    )
+    items = []
+    for hit in hits:
+        hit_kind, score = hit.pop("kind"), hit.pop("score")
+        if hit_kind == "idea":
+            items.append(SearchResult(kind=hit_kind, score=score, idea=ContentIdea(**hit)))
+        else:
+            items.append(SearchResult(kind=hit_kind, score=score, post=Post(**hit)))
+    return SearchPage(items=items, next_cursor=next_cursor)
+
 # Health check
 @api_router.get("/")
 async def root():
@@ -619,4 +991,83 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
-logger = logging.getLogger(__name__)
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+async def refresh_revocation_list():
+    """Rebuild the revocation list from Mongo so suspensions reach every worker"""
+    while True:
+        try:
+            blocked, versions = await get_revoked_users(
+                deleted_since=datetime.utcnow() - timedelta(hours=JWT_EXPIRATION_TIME_HOURS)
+            )
+            revocation_list.replace(blocked, versions)
+        except Exception as e:
+            logger.error(f"Revocation list refresh failed: {str(e)}")
+        await asyncio.sleep(REVOCATION_REFRESH_SECONDS)
+
+async def run_month_stats_backfill():
+    """Backfill month_stats once, retrying until some worker has finished it"""
+    while True:
+        try:
+            if await backfill_month_stats():
+                return
+        except Exception as e:
+            logger.error(f"month_stats backfill failed: {str(e)}")
+        await asyncio.sleep(MONTH_STATS_BACKFILL_RETRY_SECONDS)
+
+@app.on_event("startup")
+async def build_indexes():
+    # Builds run in the background so a large collection doesn't hold up startup
+    app.state.index_task = asyncio.create_task(ensure_indexes())
+
+@app.on_event("startup")
+async def start_revocation_refresh():
+    app.state.revocation_task = asyncio.create_task(refresh_revocation_list())
+
+@app.on_event("startup")
+async def start_activity_tracker():
+    activity_tracker.start()
+
+@app.on_event("startup")
+async def start_autosave_buffer():
+    autosave_buffer.start()
+
+@app.on_event("startup")
+async def start_purge_worker():
+    purge_worker.start()
+
+@app.on_event("startup")
+async def start_schema_migrator():
+    schema_migrator.start()
+
+@app.on_event("startup")
+async def start_month_stats_backfill():
+    app.state.month_stats_task = asyncio.create_task(run_month_stats_backfill())
+
+@app.on_event("shutdown")
+async def shutdown_password_pool():
+    password_pool.shutdown()
+
+@app.on_event("shutdown")
+async def stop_revocation_refresh():
+    app.state.revocation_task.cancel()
+
+@app.on_event("shutdown")
+async def flush_activity_tracker():
+    await activity_tracker.stop()
+
+@app.on_event("shutdown")
+async def flush_autosave_buffer():
+    await autosave_buffer.stop()
+
+@app.on_event("shutdown")
+async def stop_purge_worker():
+    await purge_worker.stop()
+
+@app.on_event("shutdown")
+async def stop_schema_migrator():
+    await schema_migrator.stop()
+
+@app.on_event("shutdown")
+async def stop_month_stats_backfill():
+    app.state.month_stats_task.cancel()
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, validator, field_validator, model_validator
+from typing import List, Optional, Dict, Any, Literal, Union
 from datetime import datetime, date, time
+import re
 import uuid
 
 # Status Check Models
@@ -22,6 +23,7 @@ class User(BaseModel):
     is_active: bool = True
     is_admin: bool = False
     approval_status: str = "pending"  # pending, approved, denied
+    token_version: int = 0
     last_active: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -64,6 +66,7 @@ class MonthlyData(BaseModel):
     brainstorm_ideas: List[str] = Field(default_factory=list)
     posts: Dict[str, List[Dict]] = Field(default_factory=dict)
     analytics: Dict[str, Any] = Field(default_factory=dict)
+    posting_plan: Dict[str, Any] = Field(default_factory=dict)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -73,6 +76,33 @@ class MonthlyDataCreate(BaseModel):
     content_pillars: Optional[List[str]] = Field(default_factory=list)
     brainstorm_ideas: Optional[List[str]] = Field(default_factory=list)
     analytics: Optional[Dict[str, Any]] = Field(default_factory=dict)
+    posting_plan: Optional[Dict[str, Any]] = Field(default_factory=dict)
+
+# Analytics Models
+# Metric names become field paths in the analytics collection
+ANALYTICS_METRIC_NAME_PATTERN = r"^[A-Za-z][A-Za-z0-9_]{0,63}$"
+
+class AnalyticsMonth(BaseModel):
+    month_key: str
+    metrics: Dict[str, Any] = Field(default_factory=dict)
+    updated_at: Optional[datetime] = None
+
+class AnalyticsSeries(BaseModel):
+    items: List[AnalyticsMonth]
+
+class AnalyticsUpdate(BaseModel):
+    # A metric set to null is cleared
+    metrics: Dict[str, Union[int, float, str, None]]
+
+    @field_validator("metrics")
+    @classmethod
+    def check_metric_names(cls, metrics):
+        if not metrics:
+            raise ValueError("At least one metric is required")
+        for name in metrics:
+            if not re.match(ANALYTICS_METRIC_NAME_PATTERN, name):
+                raise ValueError(f"Invalid metric name: {name}")
+        return metrics
 
 # Content Idea Models
 class ContentIdea(BaseModel):
@@ -91,6 +121,10 @@ class ContentIdeaCreate(BaseModel):
     pillar: Optional[str] = ""
     category: Optional[str] = ""
 
+class ContentIdeaPage(BaseModel):
+    items: List[ContentIdea]
+    next_cursor: Optional[str] = None
+
 class ContentIdeaUpdate(BaseModel):
     text: Optional[str] = None
     pillar: Optional[str] = None
@@ -123,6 +157,20 @@ class Post(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class PostPage(BaseModel):
+    items: List[Post]
+    next_cursor: Optional[str] = None
+
+class SearchResult(BaseModel):
+    kind: Literal["idea", "post"]
+    score: float
+    idea: Optional[ContentIdea] = None
+    post: Optional[Post] = None
+
+class SearchPage(BaseModel):
+    items: List[SearchResult]
+    next_cursor: Optional[str] = None
+
 class PostCreate(BaseModel):
     month_key: str
     date_key: str
@@ -153,4 +201,31 @@ class PostUpdate(BaseModel):
     scheduled_time: Optional[str] = None
     instagram_preview_position: Optional[int] = None
     date_key: Optional[str] = None
-    month_key: Optional[str] = None
\ No newline at end of file
+    month_key: Optional[str] = None
+
+class BulkPostOperation(BaseModel):
+    action: Literal["create", "update", "delete"]
+    id: Optional[str] = None  # required for update and delete
+    post: Optional[PostCreate] = None  # required for create
+    changes: Optional[PostUpdate] = None  # required for update
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        if self.action == "create" and self.post is None:
+            raise ValueError("create operations require post")
+        if self.action in ("update", "delete") and not self.id:
+            raise ValueError(f"{self.action} operations require id")
+        if self.action == "update" and self.changes is None:
+            raise ValueError("update operations require changes")
+        return self
+
+class BulkPostRequest(BaseModel):
+    operations: List[BulkPostOperation]
+    ordered: bool = True
+
+class BulkPostResult(BaseModel):
+    index: int
+    action: str
+    id: Optional[str] = None
+    success: bool
+    error: Optional[str] = None
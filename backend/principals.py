@@ -0,0 +1,37 @@
+from fastapi import HTTPException, Depends, status
+
+from auth import get_current_user, revocation_list
+from database import get_user_principal
+
+async def get_current_principal(current_user: dict = Depends(get_current_user)) -> dict:
+    """Dependency to resolve the current user's role and active state"""
+    if current_user.get("role") and revocation_list.loaded:
+        # Tokens carry their own claims; revoked users never get this far
+        return {
+            "user_id": current_user["user_id"],
+            "email": current_user["email"],
+            "is_admin": current_user["role"] == "admin",
+            "is_active": True,
+            "approval_status": current_user.get("approval_status", "approved")
+        }
+    
+    # Tokens issued before claims were embedded, and any token checked before the
+    # revocation list has loaded, fall back to the database
+    principal = await get_user_principal(current_user["user_id"])
+    if not principal:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    
+    return principal
+
+async def require_admin(principal: dict = Depends(get_current_principal)) -> dict:
+    """Dependency that only lets active admins through"""
+    if not principal["is_admin"] or not principal["is_active"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    return principal
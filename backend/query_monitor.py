@@ -0,0 +1,362 @@
+"""
+MongoDB command monitoring for the Motor client in database.py.
+
+QueryMonitor is a pymongo CommandListener. Every command is attributed to the
+database.py helper that issued it: @monitored sets the helper name in a
+context variable, which Motor carries into the executor thread that runs the
+command. Cursors returned to callers are tagged with a comment instead, and a
+getMore inherits the tag of the command that opened its cursor.
+
+For each (helper, command) the monitor keeps a latency histogram and the
+documents returned, and with QUERY_MEASURE_BYTES the bytes returned (which
+costs re-encoding every reply; bytes_returned is None when they are not
+measured). Commands slower than QUERY_SLOW_MS land in a
+bounded slow-query log with the shape of their filter; explain_slow_queries()
+attaches the query plan from the event loop, since listeners must not run
+commands themselves. Literals are redacted from both, so the log never holds
+emails, ids or search terms.
+"""
+import bson
+import contextlib
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from typing import List, Optional
+
+from pymongo import monitoring
+
+# Query monitoring configuration
+QUERY_SLOW_MS = float(os.environ.get('QUERY_SLOW_MS', 100))
+QUERY_SLOW_LOG_SIZE = int(os.environ.get('QUERY_SLOW_LOG_SIZE', 200))
+QUERY_MEASURE_BYTES = os.environ.get('QUERY_MEASURE_BYTES', 'false').lower() == 'true'
+
+# Upper bounds (ms) of the latency histogram buckets; slower commands go in "inf"
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Driver housekeeping that says nothing about our queries
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "buildinfo", "buildInfo", "saslStart",
+    "saslContinue", "endSessions", "killCursors", "getnonce", "authenticate"
+}
+
+# Commands whose plan explain() can describe, and the key holding their filter
+FILTER_KEYS = {
+    "find": "filter", "count": "query", "distinct": "query", "findAndModify": "query",
+    "aggregate": "pipeline", "update": "updates", "delete": "deletes"
+}
+
+# Plan keys describing the plan itself rather than the values it was run with
+PLAN_STRUCTURE_KEYS = {
+    "stage", "indexName", "keyPattern", "isMultiKey", "multiKeyPaths", "isUnique", "isSparse",
+    "isPartial", "indexVersion", "direction", "sortPattern", "limitAmount", "skipAmount",
+    "memLimit", "type", "planNodeId", "transformBy"
+}
+PLAN_CHILD_KEYS = {"inputStage", "inputStages", "queryPlan", "outerStage", "innerStage"}
+
+# An index bound whose endpoints are both open, e.g. [MinKey, MaxKey]
+_OPEN_BOUND = re.compile(r"^[\[(](MinKey|MaxKey|-?inf(\.0)?), (MinKey|MaxKey|-?inf(\.0)?)[\])]$")
+
+# Live cursors remembered for getMore attribution
+MAX_TRACKED_CURSORS = 10000
+
+logger = logging.getLogger(__name__)
+
+_current_helper = contextvars.ContextVar("query_helper", default=None)
+
+def monitored(fn):
+    """Attribute the MongoDB commands a database helper runs to its name"""
+    name = fn.__name__
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            token = _current_helper.set(name)
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _current_helper.reset(token)
+        return wrapper
+
+    # Cursors run after the helper has returned, so they carry the name as a comment
+    @functools.wraps(fn)
+    def cursor_wrapper(*args, **kwargs):
+        return fn(*args, **kwargs).comment(name)
+    return cursor_wrapper
+
+@contextlib.contextmanager
+def query_tag(name: str):
+    """Attribute the MongoDB commands run inside the block to name"""
+    token = _current_helper.set(name)
+    try:
+        yield
+    finally:
+        _current_helper.reset(token)
+
+def filter_shape(value):
+    """value with every literal replaced by its type name, keeping operators and field names"""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [filter_shape(value[0])] if value else []
+    return type(value).__name__
+
+def _redact_bound(bound):
+    if isinstance(bound, str) and _OPEN_BOUND.match(bound):
+        return bound
+    if isinstance(bound, str) and len(bound) >= 2:
+        # Keep whether each end is inclusive, which is what shows a range scan
+        return f"{bound[0]}?, ?{bound[-1]}"
+    return "?"
+
+def redact_plan(plan):
+    """An explain() plan tree with the literals it was run with (bounds, filters) redacted"""
+    if isinstance(plan, list):
+        return [redact_plan(item) for item in plan]
+    if not isinstance(plan, dict):
+        return plan
+    redacted = {}
+    for key, value in plan.items():
+        if key in PLAN_STRUCTURE_KEYS:
+            redacted[key] = value
+        elif key in PLAN_CHILD_KEYS:
+            redacted[key] = redact_plan(value)
+        elif key == "indexBounds" and isinstance(value, dict):
+            redacted[key] = {
+                field: [_redact_bound(bound) for bound in bounds] if isinstance(bounds, list) else "?"
+                for field, bounds in value.items()
+            }
+        else:
+            redacted[key] = filter_shape(value)
+    return redacted
+
+def _command_filter(command_name: str, command: dict):
+    key = FILTER_KEYS.get(command_name)
+    if key is None:
+        return None
+    value = command.get(key)
+    if command_name in ("update", "delete") and value:
+        return value[0].get("q")
+    if command_name == "aggregate" and value:
+        # The leading $match is what an index can serve
+        first = value[0]
+        return first.get("$match", first)
+    return value
+
+def _returned_documents(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if "value" in reply:
+        return 1 if reply["value"] is not None else 0
+    if "values" in reply:
+        return len(reply["values"])
+    return int(reply.get("n", 0) or 0)
+
+def _percentile(buckets: List[int], count: int, p: float, max_ms: float) -> Optional[float]:
+    """Upper bound of the histogram bucket holding the p-th percentile"""
+    if not count:
+        return None
+    target = p * count
+    seen = 0
+    for bound, hits in zip(LATENCY_BUCKETS_MS, buckets):
+        seen += hits
+        if seen >= target:
+            return bound
+    # Beyond the last bucket the slowest command is the only honest bound
+    return round(max_ms, 3)
+
+def _plan_stages(plan) -> List[str]:
+    stages = []
+    while isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return stages
+
+class QueryStats:
+    __slots__ = ("count", "failures", "total_ms", "max_ms", "buckets", "documents", "bytes")
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.documents = 0
+        self.bytes = None  # stays None unless replies are measured
+
+    def record(self, ms: float, documents: int = 0, size: Optional[int] = None, failed: bool = False):
+        self.count += 1
+        self.failures += failed
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+        self.documents += documents
+        if size is not None:
+            self.bytes = (self.bytes or 0) + size
+
+    def as_dict(self) -> dict:
+        labels = [f"le_{bound}ms" for bound in LATENCY_BUCKETS_MS] + ["inf"]
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": _percentile(self.buckets, self.count, 0.50, self.max_ms),
+            "p95_ms": _percentile(self.buckets, self.count, 0.95, self.max_ms),
+            "p99_ms": _percentile(self.buckets, self.count, 0.99, self.max_ms),
+            "histogram": dict(zip(labels, self.buckets)),
+            "documents_returned": self.documents,
+            "bytes_returned": self.bytes
+        }
+
+class QueryMonitor(monitoring.CommandListener):
+    """Per-helper latency, volume and slow-query log for every MongoDB command"""
+
+    def __init__(self, slow_ms: float = 100, slow_log_size: int = 200, measure_bytes: bool = False):
+        self.slow_ms = slow_ms
+        self.measure_bytes = measure_bytes
+        self._lock = threading.Lock()
+        self._stats = {}  # (helper, command) -> QueryStats
+        self._inflight = {}  # (request_id, connection) -> (helper, command name, database, command)
+        self._cursor_helpers = {}  # cursor id -> helper that opened it
+        self._slow = deque(maxlen=slow_log_size)
+
+    def _helper_for(self, event) -> str:
+        if event.command_name == "getMore":
+            helper = self._cursor_helpers.get(event.command.get("getMore"))
+            if helper:
+                return helper
+        comment = event.command.get("comment")
+        if isinstance(comment, str):
+            return comment
+        return _current_helper.get() or "untagged"
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        helper = self._helper_for(event)
+        with self._lock:
+            self._inflight[(event.request_id, event.connection_id)] = (
+                helper, event.command_name, event.database_name, event.command
+            )
+
+    def succeeded(self, event):
+        with self._lock:
+            inflight = self._inflight.pop((event.request_id, event.connection_id), None)
+        if inflight is None:
+            return
+        helper, command_name, database_name, command = inflight
+        ms = event.duration_micros / 1000
+        reply = event.reply
+        size = len(bson.encode(reply)) if self.measure_bytes else None
+
+        cursor = reply.get("cursor")
+        with self._lock:
+            self._stats.setdefault((helper, command_name), QueryStats()).record(
+                ms, _returned_documents(reply), size
+            )
+            if isinstance(cursor, dict):
+                if cursor.get("id"):
+                    if len(self._cursor_helpers) >= MAX_TRACKED_CURSORS:
+                        self._cursor_helpers.pop(next(iter(self._cursor_helpers)))
+                    self._cursor_helpers[cursor["id"]] = helper
+                elif command_name == "getMore":
+                    self._cursor_helpers.pop(command.get("getMore"), None)
+
+        if ms >= self.slow_ms and command_name != "explain":
+            self._log_slow(helper, command_name, database_name, command, ms)
+
+    def failed(self, event):
+        with self._lock:
+            inflight = self._inflight.pop((event.request_id, event.connection_id), None)
+            if inflight is None:
+                return
+            helper, command_name = inflight[0], inflight[1]
+            self._stats.setdefault((helper, command_name), QueryStats()).record(
+                event.duration_micros / 1000, failed=True
+            )
+
+    def _log_slow(self, helper: str, command_name: str, database_name: str, command: dict, ms: float):
+        collection = command.get(command_name)
+        shape = filter_shape(_command_filter(command_name, command))
+        logger.warning(f"Slow query {helper} {command_name} {collection} {ms:.1f}ms filter={shape}")
+        entry = {
+            "at": datetime.utcnow(),
+            "helper": helper,
+            "command": command_name,
+            "collection": collection if isinstance(collection, str) else None,
+            "duration_ms": round(ms, 3),
+            "filter_shape": shape,
+            "plan": None,
+            # Kept only to run explain(); never returned
+            "_explain": (database_name, command) if command_name in FILTER_KEYS else None
+        }
+        with self._lock:
+            self._slow.append(entry)
+
+    async def explain_slow_queries(self, client) -> int:
+        """Attach queryPlanner output to slow-log entries that do not have it yet"""
+        with self._lock:
+            pending = [entry for entry in self._slow if entry["_explain"] is not None]
+        for entry in pending:
+            database_name, command = entry["_explain"]
+            entry["_explain"] = None
+            explained = {
+                key: value for key, value in command.items()
+                if not key.startswith("$") and key not in ("lsid", "txnNumber", "comment")
+            }
+            try:
+                result = await client[database_name].command(
+                    {"explain": explained, "verbosity": "queryPlanner"}
+                )
+            except Exception as e:
+                entry["plan"] = {"error": str(e)}
+                continue
+            planner = result.get("queryPlanner")
+            if planner is None and result.get("stages"):
+                # Aggregations report the plan of their leading $cursor stage
+                planner = result["stages"][0].get("$cursor", {}).get("queryPlanner")
+            winning = (planner or {}).get("winningPlan", {})
+            entry["plan"] = {
+                "stages": _plan_stages(winning.get("queryPlan", winning)),
+                "winning_plan": redact_plan(winning)
+            }
+        return len(pending)
+
+    def stats(self) -> dict:
+        with self._lock:
+            items = [(key, stats.as_dict()) for key, stats in self._stats.items()]
+        helpers = {}
+        for (helper, command_name), stats in sorted(items):
+            helpers.setdefault(helper, {})[command_name] = stats
+        return {"slow_ms": self.slow_ms, "measure_bytes": self.measure_bytes, "helpers": helpers}
+
+    def slow_queries(self) -> List[dict]:
+        """Slow-log entries, newest first"""
+        with self._lock:
+            entries = list(self._slow)
+        return [
+            {key: value for key, value in entry.items() if not key.startswith("_")}
+            for entry in reversed(entries)
+        ]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+
+query_monitor = QueryMonitor(
+    slow_ms=QUERY_SLOW_MS, slow_log_size=QUERY_SLOW_LOG_SIZE, measure_bytes=QUERY_MEASURE_BYTES
+)
@@ -0,0 +1,143 @@
+from fastapi import HTTPException, Request, status
+from collections import OrderedDict
+import math
+import os
+import time
+
+# Login throttling configuration
+LOGIN_RATE_LIMIT_PER_EMAIL = int(os.environ.get('LOGIN_RATE_LIMIT_PER_EMAIL', 10))
+LOGIN_RATE_WINDOW_PER_EMAIL_SECONDS = float(os.environ.get('LOGIN_RATE_WINDOW_PER_EMAIL_SECONDS', 300))
+LOGIN_RATE_LIMIT_PER_IP = int(os.environ.get('LOGIN_RATE_LIMIT_PER_IP', 30))
+LOGIN_RATE_WINDOW_PER_IP_SECONDS = float(os.environ.get('LOGIN_RATE_WINDOW_PER_IP_SECONDS', 60))
+LOGIN_RATE_MAX_KEYS = int(os.environ.get('LOGIN_RATE_MAX_KEYS', 50000))
+TRUST_PROXY_HEADERS = os.environ.get('TRUST_PROXY_HEADERS', 'false').lower() == 'true'
+# Reverse proxies in front of the app that each append to X-Forwarded-For
+TRUSTED_PROXY_COUNT = max(1, int(os.environ.get('TRUSTED_PROXY_COUNT', 1)))
+
+class SlidingWindowLimiter:
+    """Approximate sliding-window counter per key with LRU-bounded memory.
+
+    Each key keeps the count for the current fixed window and the one before
+    it; the previous count is weighted by how much of it still overlaps the
+    sliding window. Idle keys are evicted least-recently-used first once
+    max_keys is reached.
+    """
+
+    def __init__(self, limit: int, window: float, max_keys: int = 50000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._keys = OrderedDict()  # key -> [window_start, current, previous]
+        self._allowed = 0
+        self._rejected = 0
+        self._evicted = 0
+
+    def _current(self, key: str, now: float, create: bool):
+        """The [window_start, current, previous] entry of key rolled forward to now"""
+        window_start = now - (now % self.window)
+        entry = self._keys.get(key)
+        if entry is None:
+            if not create:
+                return None
+            entry = [window_start, 0, 0]
+        elif entry[0] != window_start:
+            previous = entry[1] if window_start - entry[0] == self.window else 0
+            entry = [window_start, 0, previous]
+
+        self._keys[key] = entry
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.max_keys:
+            self._keys.popitem(last=False)
+            self._evicted += 1
+        return entry
+
+    def _retry_after(self, entry, now: float) -> float:
+        elapsed = now - entry[0]
+        estimated = entry[2] * (1 - elapsed / self.window) + entry[1]
+        if estimated >= self.limit:
+            self._rejected += 1
+            return max(1.0, self.window - elapsed)
+        return 0
+
+    def hit(self, key: str, now: float = None) -> float:
+        """Count an attempt for key; return 0 if allowed, else seconds to wait"""
+        now = time.monotonic() if now is None else now
+        entry = self._current(key, now, create=True)
+        retry_after = self._retry_after(entry, now)
+        if retry_after:
+            return retry_after
+
+        entry[1] += 1
+        self._allowed += 1
+        return 0
+
+    def release(self, key: str, now: float = None):
+        """Give back an attempt counted by hit() that turned out not to count.
+
+        The attempt sits in the current window, or in the previous one if the
+        window rolled over since it was counted.
+        """
+        now = time.monotonic() if now is None else now
+        entry = self._current(key, now, create=False)
+        if entry is None:
+            return
+        if entry[1]:
+            entry[1] -= 1
+        elif entry[2]:
+            entry[2] -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "window_seconds": self.window,
+            "tracked_keys": len(self._keys),
+            "allowed": self._allowed,
+            "rejected": self._rejected,
+            "evicted": self._evicted
+        }
+
+email_login_limiter = SlidingWindowLimiter(
+    LOGIN_RATE_LIMIT_PER_EMAIL, LOGIN_RATE_WINDOW_PER_EMAIL_SECONDS, LOGIN_RATE_MAX_KEYS
+)
+ip_login_limiter = SlidingWindowLimiter(
+    LOGIN_RATE_LIMIT_PER_IP, LOGIN_RATE_WINDOW_PER_IP_SECONDS, LOGIN_RATE_MAX_KEYS
+)
+
+def get_client_ip(request: Request) -> str:
+    """Best-effort client address, honouring X-Forwarded-For only behind trusted proxies.
+
+    Entries left of those our own proxies appended are whatever the client
+    sent, so the address is taken TRUSTED_PROXY_COUNT hops from the right.
+    """
+    if TRUST_PROXY_HEADERS:
+        hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if hops:
+            return hops[max(0, len(hops) - TRUSTED_PROXY_COUNT)]
+    return request.client.host if request.client else "unknown"
+
+def check_login_rate_limit(email: str, client_ip: str):
+    """Reject a login attempt with 429 before any password work is done.
+
+    Every attempt counts against the client IP and the email. The email slot
+    is taken up front so parallel guesses at one account cannot all get past
+    the limit before any of them has failed, and a successful login gives it
+    back with release_login_attempt(), so nobody can lock a user out by
+    logging in as them from elsewhere while their own logins keep succeeding.
+    """
+    retry_after = ip_login_limiter.hit(client_ip) or email_login_limiter.hit(email.strip().lower())
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+def release_login_attempt(email: str):
+    """Stop counting a login attempt whose password was correct against its email"""
+    email_login_limiter.release(email.strip().lower())
+
+def login_rate_limit_stats() -> dict:
+    return {
+        "email": email_login_limiter.stats(),
+        "ip": ip_login_limiter.stats()
+    }
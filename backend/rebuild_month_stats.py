@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Recompute the month_stats counters from the posts collection.
+
+Reports every user-month whose maintained counters drifted from the posts
+actually stored, then rewrites them. Use --dry-run to only report.
+
+    python rebuild_month_stats.py [--user USER_ID] [--dry-run]
+"""
+import argparse
+import asyncio
+import sys
+
+from database import rebuild_month_stats, client
+
+async def main(user_id, dry_run: bool) -> int:
+    report = await rebuild_month_stats(user_id=user_id, dry_run=dry_run)
+    
+    for drift in report["drifted"]:
+        print(f"⚠️  Drift in {drift['user_id']} {drift['month_key']}")
+        print(f"    expected: {drift['expected']}")
+        print(f"    actual:   {drift['actual']}")
+    
+    print(f"Checked {report['months_checked']} user-months, {len(report['drifted'])} drifted")
+    if dry_run:
+        print("Dry run: no counters were changed")
+    else:
+        print(f"✅ Repaired {report['repaired']} user-months")
+    
+    client.close()
+    return 1 if dry_run and report["drifted"] else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", help="only rebuild counters for this user id")
+    parser.add_argument("--dry-run", action="store_true", help="report drift without rewriting counters")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.user, args.dry_run)))
@@ -57,7 +57,9 @@ async def reset_admin_password():
                     "is_admin": True,
                     "approval_status": "approved",
                     "updated_at": datetime.utcnow()
-                }
+                },
+                # Tokens issued before the reset stop being accepted
+                "$inc": {"token_version": 1}
             }
         )
         
@@ -0,0 +1,130 @@
+"""
+Versioned document shapes for posts, monthly_data and content_ideas.
+
+Documents written by this code carry schema_version = SCHEMA_VERSIONS[collection].
+Older documents (no schema_version, camelCase fields as in contracts.md) are
+upgraded in memory by upgrade_document() when they are read, and the upgrade
+is queued for a lazy write-back. schema_migrator.py flushes those write-backs
+and upgrades everything else with a throttled batch migration; once that has
+finished, upgrade_document() returns documents without looking at them.
+"""
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+# Current schema version of each collection
+SCHEMA_VERSIONS = {
+    "posts": 1,
+    "monthly_data": 1,
+    "content_ideas": 1,
+}
+
+# Legacy field names that do not follow the plain camelCase -> snake_case rule
+FIELD_RENAMES = {
+    "posts": {"type": "content_type", "userId": "user_id", "imageUrl": "image", "reelCoverUrl": "reel_cover"},
+    "monthly_data": {"userId": "user_id"},
+    "content_ideas": {"userId": "user_id"},
+}
+
+# Fields that used to hold a bare URL and now hold a MediaUpload
+MEDIA_URL_FIELDS = ("image", "reel_cover")
+
+# Most pending write-backs kept in memory between flushes
+MAX_PENDING_WRITE_BACKS = 5000
+
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])([A-Z])")
+
+# Collections the batch migrator has finished; their reads skip every check
+migrated_collections = set()
+
+# (collection, _id) -> (filter, update) waiting for the next write-back flush
+pending_write_backs: Dict[Tuple[str, object], Tuple[dict, dict]] = {}
+
+@lru_cache(maxsize=1024)
+def snake_case(name: str) -> str:
+    return _CAMEL_BOUNDARY.sub(r"_\1", name).lower()
+
+def _upgrade_to_v1(collection: str, doc: dict) -> dict:
+    """camelCase legacy documents -> snake_case fields used by models.py"""
+    renames = FIELD_RENAMES[collection]
+    upgraded = {}
+    for key, value in doc.items():
+        new_key = key if key == "_id" else renames.get(key) or snake_case(key)
+        # A field already written under the new name wins over its legacy spelling
+        if new_key != key and new_key in doc:
+            continue
+        upgraded[new_key] = value
+
+    if "user_id" in upgraded and not isinstance(upgraded["user_id"], str):
+        upgraded["user_id"] = str(upgraded["user_id"])
+    if "id" not in upgraded and "_id" in upgraded:
+        upgraded["id"] = str(upgraded["_id"])
+    for field in MEDIA_URL_FIELDS:
+        if isinstance(upgraded.get(field), str):
+            upgraded[field] = {"url": upgraded[field], "public_id": ""} if upgraded[field] else None
+    return upgraded
+
+# MIGRATIONS[collection][v] upgrades a document from version v to v + 1
+MIGRATIONS: Dict[str, Dict[int, Callable[[str, dict], dict]]] = {
+    "posts": {0: _upgrade_to_v1},
+    "monthly_data": {0: _upgrade_to_v1},
+    "content_ideas": {0: _upgrade_to_v1},
+}
+
+@lru_cache(maxsize=None)
+def _migration_chain(collection: str, from_version: int) -> Tuple[Callable[[str, dict], dict], ...]:
+    """Every transform from from_version up to the current version, in order"""
+    return tuple(MIGRATIONS[collection][v] for v in range(from_version, SCHEMA_VERSIONS[collection]))
+
+def needs_upgrade(collection: str, doc: dict) -> bool:
+    return doc.get("schema_version", 0) < SCHEMA_VERSIONS[collection]
+
+def upgrade(collection: str, doc: dict) -> dict:
+    """Return doc upgraded to the current schema version (doc itself if already current)"""
+    version = doc.get("schema_version", 0)
+    if version >= SCHEMA_VERSIONS[collection]:
+        return doc
+    for transform in _migration_chain(collection, version):
+        doc = transform(collection, doc)
+    doc["schema_version"] = SCHEMA_VERSIONS[collection]
+    return doc
+
+def write_back(collection: str, original: dict, upgraded: dict) -> Optional[Tuple[dict, dict]]:
+    """Build the (filter, update) that stores upgraded in place of original.
+
+    The filter only matches while the stored document is still the version
+    that was read, so a concurrent writer or a second upgrade wins.
+    """
+    if "_id" not in original:
+        return None
+    query = {"_id": original["_id"]}
+    if "schema_version" in original:
+        query["schema_version"] = original["schema_version"]
+    else:
+        query["schema_version"] = {"$exists": False}
+    for field in ("updated_at", "updatedAt"):
+        if field in original:
+            query[field] = original[field]
+
+    update = {"$set": {key: value for key, value in upgraded.items()
+                       if key != "_id" and (key not in original or original[key] != value)}}
+    removed = {key: "" for key in original if key not in upgraded}
+    if removed:
+        update["$unset"] = removed
+    return query, update
+
+def upgrade_document(collection: str, doc: Optional[dict]) -> Optional[dict]:
+    """Upgrade a document read from collection and queue its lazy write-back"""
+    if doc is None or collection in migrated_collections or not needs_upgrade(collection, doc):
+        return doc
+    upgraded = upgrade(collection, dict(doc))
+    if len(pending_write_backs) < MAX_PENDING_WRITE_BACKS:
+        change = write_back(collection, doc, upgraded)
+        if change is not None:
+            pending_write_backs[(collection, doc["_id"])] = change
+    return upgraded
+
+def upgrade_documents(collection: str, docs: list) -> list:
+    if collection in migrated_collections:
+        return docs
+    return [upgrade_document(collection, doc) for doc in docs]
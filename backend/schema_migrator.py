@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Background side of the schema layer in schema.py.
+
+SchemaMigrator flushes the write-backs queued by upgrade_document() and runs a
+throttled batch migration over every collection that still has documents below
+its current schema_version. Progress is kept in the schema_migrations
+collection so a restarted worker resumes where it stopped; once a collection is
+done its reads stop checking document versions altogether.
+
+Run directly to migrate everything in the foreground:
+
+    python schema_migrator.py
+"""
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+import schema
+from database import db, schema_migrations_collection
+from query_monitor import query_tag
+
+# Schema migration configuration
+SCHEMA_WRITE_BACK_INTERVAL_SECONDS = float(os.environ.get('SCHEMA_WRITE_BACK_INTERVAL_SECONDS', 5))
+SCHEMA_MIGRATION_BATCH_SIZE = int(os.environ.get('SCHEMA_MIGRATION_BATCH_SIZE', 500))
+SCHEMA_MIGRATION_PAUSE_SECONDS = float(os.environ.get('SCHEMA_MIGRATION_PAUSE_SECONDS', 0.5))
+SCHEMA_MIGRATION_LEASE_SECONDS = float(os.environ.get('SCHEMA_MIGRATION_LEASE_SECONDS', 120))
+SCHEMA_MIGRATION_RETRY_SECONDS = float(os.environ.get('SCHEMA_MIGRATION_RETRY_SECONDS', 600))
+
+logger = logging.getLogger(__name__)
+
+class SchemaMigrator:
+    """Flushes lazy write-backs and migrates old documents a batch at a time"""
+
+    def __init__(self, flush_interval: float = 5, batch_size: int = 500, pause: float = 0.5,
+                 lease: float = 120, retry_interval: float = 600):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self.lease = lease
+        self.retry_interval = retry_interval
+        self._flush_task = None
+        self._migrate_task = None
+        self._written_back = 0
+        self._migrated = 0
+
+    async def flush_write_backs(self) -> int:
+        """Store every upgrade queued by reads, returning the documents written"""
+        if not schema.pending_write_backs:
+            return 0
+        pending, schema.pending_write_backs = schema.pending_write_backs, {}
+
+        by_collection = {}
+        for (collection, _), (query, update) in pending.items():
+            by_collection.setdefault(collection, []).append(UpdateOne(query, update))
+
+        written = 0
+        for collection, requests in by_collection.items():
+            try:
+                with query_tag("schema_write_back"):
+                    result = await db[collection].bulk_write(requests, ordered=False)
+                written += result.modified_count
+            except Exception as e:
+                # The batch migration will pick these documents up instead
+                logger.error(f"Schema write-back to {collection} failed: {str(e)}")
+        self._written_back += written
+        return written
+
+    async def refresh(self):
+        """Skip version checks for collections whose migration has completed"""
+        async for status in schema_migrations_collection.find({"completed_at": {"$ne": None}}):
+            if status["version"] == schema.SCHEMA_VERSIONS.get(status["collection"]):
+                schema.migrated_collections.add(status["collection"])
+
+    async def _claim(self, collection: str) -> Optional[dict]:
+        now = datetime.utcnow()
+        version = schema.SCHEMA_VERSIONS[collection]
+        await schema_migrations_collection.update_one(
+            {"collection": collection, "version": version},
+            {"$setOnInsert": {"last_id": None, "migrated": 0, "lease_until": None, "completed_at": None}},
+            upsert=True
+        )
+        return await schema_migrations_collection.find_one_and_update(
+            {
+                "collection": collection,
+                "version": version,
+                "completed_at": None,
+                "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]
+            },
+            {"$set": {"lease_until": now + timedelta(seconds=self.lease), "updated_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def migrate_collection(self, collection: str) -> bool:
+        """Upgrade every old document in collection; True once none are left"""
+        status = await self._claim(collection)
+        if status is None:
+            # Finished already, or another worker holds the lease
+            return collection in schema.migrated_collections
+
+        version = schema.SCHEMA_VERSIONS[collection]
+        outdated = {"schema_version": {"$not": {"$gte": version}}}
+        last_id = status["last_id"]
+        logger.info(f"Migrating {collection} to schema version {version}")
+        while True:
+            query = dict(outdated)
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            batch = await db[collection].find(query).sort("_id", 1).limit(self.batch_size).to_list(length=self.batch_size)
+            if not batch:
+                break
+
+            requests = []
+            for doc in batch:
+                match, update = schema.write_back(collection, doc, schema.upgrade(collection, dict(doc)))
+                requests.append(UpdateOne(match, update))
+            result = await db[collection].bulk_write(requests, ordered=False)
+            self._migrated += result.modified_count
+            last_id = batch[-1]["_id"]
+
+            now = datetime.utcnow()
+            await schema_migrations_collection.update_one(
+                {"_id": status["_id"]},
+                {
+                    "$set": {"last_id": last_id, "lease_until": now + timedelta(seconds=self.lease), "updated_at": now},
+                    "$inc": {"migrated": result.modified_count}
+                }
+            )
+            # Leave room for foreground requests between batches
+            await asyncio.sleep(self.pause)
+
+        # Documents changed under us are retried from the start on the next pass
+        remaining = await db[collection].count_documents(outdated)
+        now = datetime.utcnow()
+        await schema_migrations_collection.update_one(
+            {"_id": status["_id"]},
+            {"$set": {
+                "last_id": None,
+                "lease_until": None,
+                "updated_at": now,
+                "completed_at": None if remaining else now
+            }}
+        )
+        if remaining:
+            logger.warning(f"{remaining} {collection} documents still below schema version {version}")
+            return False
+        schema.migrated_collections.add(collection)
+        logger.info(f"Schema migration of {collection} to version {version} completed")
+        return True
+
+    async def migrate_all(self) -> bool:
+        done = True
+        for collection in schema.SCHEMA_VERSIONS:
+            if collection not in schema.migrated_collections:
+                with query_tag("schema_migration"):
+                    done = await self.migrate_collection(collection) and done
+        return done
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush_write_backs()
+            except Exception as e:
+                logger.error(f"Schema write-back failed: {str(e)}")
+
+    async def _migrate_loop(self):
+        while True:
+            try:
+                await self.refresh()
+                if await self.migrate_all():
+                    return
+            except Exception as e:
+                logger.error(f"Schema migration failed: {str(e)}")
+            await asyncio.sleep(self.retry_interval)
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._flush_task is None:
+            self._flush_task = loop.create_task(self._flush_loop())
+        if self._migrate_task is None:
+            self._migrate_task = loop.create_task(self._migrate_loop())
+
+    async def stop(self):
+        """Stop both loops and flush the write-backs still queued"""
+        for task in (self._flush_task, self._migrate_task):
+            if task is not None:
+                task.cancel()
+        self._flush_task = self._migrate_task = None
+        await self.flush_write_backs()
+
+    def stats(self) -> dict:
+        return {
+            "versions": dict(schema.SCHEMA_VERSIONS),
+            "migrated_collections": sorted(schema.migrated_collections),
+            "pending_write_backs": len(schema.pending_write_backs),
+            "written_back": self._written_back,
+            "batch_migrated": self._migrated
+        }
+
+schema_migrator = SchemaMigrator(
+    flush_interval=SCHEMA_WRITE_BACK_INTERVAL_SECONDS,
+    batch_size=SCHEMA_MIGRATION_BATCH_SIZE,
+    pause=SCHEMA_MIGRATION_PAUSE_SECONDS,
+    lease=SCHEMA_MIGRATION_LEASE_SECONDS,
+    retry_interval=SCHEMA_MIGRATION_RETRY_SECONDS
+)
+
+async def main() -> int:
+    await schema_migrator.refresh()
+    done = await schema_migrator.migrate_all()
+    stats = schema_migrator.stats()
+    print(f"Migrated {stats['batch_migrated']} documents")
+    for collection, version in stats["versions"].items():
+        mark = "✅" if collection in stats["migrated_collections"] else "❌"
+        print(f"{mark} {collection}: schema version {version}")
+    return 0 if done else 1
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(main()))
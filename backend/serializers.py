@@ -0,0 +1,60 @@
+from fastapi.responses import ORJSONResponse
+from typing import Callable, List, Optional, Type, Union, get_args
+from pydantic import BaseModel
+
+from models import ContentIdea, Post, UserResponse
+
+def _nested_model(annotation) -> Optional[Type[BaseModel]]:
+    """The model inside Optional[Model], if any"""
+    for candidate in (annotation, *get_args(annotation)):
+        if isinstance(candidate, type) and issubclass(candidate, BaseModel):
+            return candidate
+    return None
+
+def _constant(value) -> Callable[[], object]:
+    return lambda: value
+
+class DocumentSerializer:
+    """Shape trusted Mongo documents like model(**doc).model_dump() without building models.
+
+    The field plan (name, default, nested model) is compiled once per model.
+    Documents missing a required field were not written by this code, so they
+    go through full model validation instead and fail the same way as before.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self._fields = []
+        for name, field in model.model_fields.items():
+            nested = _nested_model(field.annotation)
+            self._fields.append((
+                name,
+                field.is_required(),
+                field.default_factory or _constant(field.default),
+                DocumentSerializer(nested) if nested else None
+            ))
+
+    def shape(self, doc: dict) -> dict:
+        shaped = {}
+        for name, required, default, nested in self._fields:
+            if name in doc:
+                value = doc[name]
+                if nested is not None and isinstance(value, dict):
+                    value = nested.shape(value)
+            elif required:
+                return self.model.model_validate(doc).model_dump()
+            else:
+                value = default()
+            shaped[name] = value
+        return shaped
+
+    def shape_all(self, docs: List[dict]) -> List[dict]:
+        return [self.shape(doc) for doc in docs]
+
+post_serializer = DocumentSerializer(Post)
+content_idea_serializer = DocumentSerializer(ContentIdea)
+user_response_serializer = DocumentSerializer(UserResponse)
+
+def json_response(content: Union[dict, list], headers: Optional[dict] = None) -> ORJSONResponse:
+    """Encode already-shaped content with orjson, bypassing response_model validation"""
+    return ORJSONResponse(content, headers=headers)
@@ -0,0 +1,25 @@
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from typing import Callable, Optional, Type
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def wants_ndjson(request: Request) -> bool:
+    """True when the client asked for newline-delimited JSON"""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def ndjson_response(
+    cursor,
+    model: Type[BaseModel],
+    transform: Optional[Callable[[dict], dict]] = None,
+    headers: Optional[dict] = None
+) -> StreamingResponse:
+    """Stream a Motor cursor as NDJSON, validating and encoding one document at a time"""
+    async def lines():
+        async for doc in cursor:
+            if transform:
+                doc = transform(doc)
+            yield model(**doc).model_dump_json() + "\n"
+    
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
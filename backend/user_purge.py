@@ -0,0 +1,331 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+from database import (
+    users_collection, purge_jobs_collection, posts_collection, content_ideas_collection,
+    monthly_data_collection, month_stats_collection, change_counters_collection, analytics_collection,
+    month_archive_collection
+)
+from media_service import MediaService
+from query_monitor import query_tag
+
+# Purge worker configuration
+PURGE_BATCH_SIZE = int(os.environ.get('PURGE_BATCH_SIZE', 200))
+PURGE_BATCH_PAUSE_SECONDS = float(os.environ.get('PURGE_BATCH_PAUSE_SECONDS', 0.2))
+PURGE_POLL_SECONDS = float(os.environ.get('PURGE_POLL_SECONDS', 30))
+PURGE_LEASE_SECONDS = float(os.environ.get('PURGE_LEASE_SECONDS', 120))
+PURGE_MEDIA_RETRY_SECONDS = float(os.environ.get('PURGE_MEDIA_RETRY_SECONDS', 3600))
+PURGE_MEDIA_MAX_ATTEMPTS = int(os.environ.get('PURGE_MEDIA_MAX_ATTEMPTS', 24))
+
+logger = logging.getLogger(__name__)
+
+# Collections holding a deleted user's data, purged in this order
+PURGE_COLLECTIONS = [
+    posts_collection,
+    month_archive_collection,
+    content_ideas_collection,
+    monthly_data_collection,
+    analytics_collection,
+    month_stats_collection,
+    change_counters_collection,
+]
+
+# Post fields that may reference uploaded media, in current and legacy spellings
+MEDIA_FIELDS = ("image", "reel_cover", "reelCover")
+# Post fields holding a list of uploaded media
+MEDIA_LIST_FIELDS = ("carouselImages", "carousel_images")
+
+def _media_public_ids(post: dict) -> list:
+    media = [post.get(field) for field in MEDIA_FIELDS]
+    for field in MEDIA_LIST_FIELDS:
+        media.extend(post.get(field) or [])
+    return [item["public_id"] for item in media if isinstance(item, dict) and item.get("public_id")]
+
+def _embedded_posts(month: Optional[dict]) -> list:
+    """Posts kept inside a monthly_data document, keyed by date"""
+    days = (month or {}).get("posts") or {}
+    return [post for day in days.values() if isinstance(day, list) for post in day if isinstance(post, dict)]
+
+def _document_media(collection, doc: dict) -> list:
+    """public_ids of the media referenced by one document of a purged collection"""
+    if collection is posts_collection:
+        posts = [doc]
+    elif collection is monthly_data_collection:
+        posts = _embedded_posts(doc)
+    elif collection is month_archive_collection:
+        posts = (doc.get("posts") or []) + _embedded_posts(doc.get("monthly_data"))
+    else:
+        return []
+    return [public_id for post in posts for public_id in _media_public_ids(post)]
+
+def _media_projection(collection) -> dict:
+    post_fields = MEDIA_FIELDS + MEDIA_LIST_FIELDS
+    if collection is posts_collection:
+        return {field: 1 for field in post_fields}
+    if collection is monthly_data_collection:
+        return {"posts": 1}
+    if collection is month_archive_collection:
+        projection = {f"posts.{field}": 1 for field in post_fields}
+        projection["monthly_data.posts"] = 1
+        return projection
+    return {}
+
+async def enqueue_user_purge(user_id: str, email: str) -> str:
+    """Queue a background purge of everything a user owned, before the user is deleted.
+
+    The worker leaves the job alone while the user still exists, so call
+    purge_worker.wake() once the user is gone, or cancel_user_purge() if
+    deleting them failed.
+    """
+    now = datetime.utcnow()
+    job = {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "email": email,
+        "status": "pending",
+        "progress": {collection.name: 0 for collection in PURGE_COLLECTIONS},
+        "media": {"deleted": 0, "failed": 0},
+        "media_attempts": 0,
+        "lease_until": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "completed_at": None
+    }
+    await purge_jobs_collection.insert_one(job)
+    return job["id"]
+
+async def cancel_user_purge(job_id: str) -> bool:
+    """Cancel a purge queued for a user whose deletion failed"""
+    now = datetime.utcnow()
+    result = await purge_jobs_collection.update_one(
+        {"id": job_id, "status": {"$in": ["pending", "running"]}},
+        {"$set": {
+            "status": "cancelled", "lease_until": None, "error": "User was not deleted",
+            "updated_at": now, "completed_at": now
+        }}
+    )
+    return result.modified_count > 0
+
+async def get_purge_job(job_id: str) -> Optional[dict]:
+    """Get a purge job and its progress"""
+    return await purge_jobs_collection.find_one({"id": job_id}, {"_id": 0, "lease_until": 0})
+
+async def get_recent_purge_jobs(limit: int = 50) -> list:
+    """Get the most recent purge jobs, newest first"""
+    cursor = purge_jobs_collection.find({}, {"_id": 0, "lease_until": 0}).sort("created_at", -1).limit(limit)
+    return await cursor.to_list(length=limit)
+
+class PurgeWorker:
+    """Runs queued user purges in the background, one bounded batch at a time.
+
+    Jobs are claimed with a lease that is renewed after every batch. A job
+    whose worker died (for example on restart) is picked up again once its
+    lease expires. Deletes are idempotent, so the job simply continues with
+    whatever is left.
+
+    A document is only deleted once all of its media is gone. Documents whose
+    media could not be deleted are kept, and the job is retried after
+    media_retry seconds, up to media_attempts times before it is marked failed.
+
+    Jobs are queued before their user is deleted. A job whose user still
+    exists is put back for later, and cancelled once it is older than the
+    lease, since the deletion it was queued for evidently failed.
+    """
+
+    def __init__(
+        self, batch_size: int = 200, pause: float = 0.2, poll_interval: float = 30, lease: float = 120,
+        media_retry: float = 3600, media_attempts: int = 24
+    ):
+        self.batch_size = batch_size
+        self.pause = pause
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.media_retry = media_retry
+        self.media_attempts = media_attempts
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def wake(self):
+        self._wake.set()
+
+    async def _claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await purge_jobs_collection.find_one_and_update(
+            {
+                "status": {"$in": ["pending", "running"]},
+                "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]
+            },
+            {"$set": {
+                "status": "running",
+                "lease_until": now + timedelta(seconds=self.lease),
+                "updated_at": now
+            }},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _delete_media(self, public_ids: list) -> tuple:
+        deleted = failed = 0
+        for public_id in public_ids:
+            result = await asyncio.to_thread(MediaService.delete_image, public_id)
+            if result.get("success") or result.get("result") == "not found":
+                deleted += 1
+            else:
+                failed += 1
+                logger.warning(f"Could not delete media {public_id}: {result}")
+        return deleted, failed
+
+    async def _purge_collection(self, job: dict, collection) -> int:
+        """Delete a user's documents from one collection, returning how many were kept"""
+        projection = dict(_media_projection(collection), _id=1)
+        kept = []
+
+        while True:
+            query = {"user_id": job["user_id"]}
+            if kept:
+                query["_id"] = {"$nin": kept}
+            batch = await collection.find(query, projection).limit(self.batch_size).to_list(length=self.batch_size)
+            if not batch:
+                return len(kept)
+
+            # Remove media before the documents that reference it
+            removable = []
+            media_deleted = media_failed = 0
+            for doc in batch:
+                deleted, failed = await self._delete_media(_document_media(collection, doc))
+                media_deleted += deleted
+                media_failed += failed
+                if failed:
+                    kept.append(doc["_id"])
+                else:
+                    removable.append(doc["_id"])
+
+            increments = {}
+            if media_deleted or media_failed:
+                increments.update({"media.deleted": media_deleted, "media.failed": media_failed})
+            deleted_count = 0
+            if removable:
+                result = await collection.delete_many({"_id": {"$in": removable}})
+                deleted_count = result.deleted_count
+            increments[f"progress.{collection.name}"] = deleted_count
+
+            now = datetime.utcnow()
+            await purge_jobs_collection.update_one(
+                {"id": job["id"]},
+                {
+                    "$inc": increments,
+                    "$set": {"lease_until": now + timedelta(seconds=self.lease), "updated_at": now}
+                }
+            )
+
+            # Give foreground requests room between batches
+            await asyncio.sleep(self.pause)
+
+    async def _user_still_exists(self, job: dict) -> bool:
+        """Put back or cancel a job whose user has not been deleted (yet)"""
+        if await users_collection.find_one({"id": job["user_id"]}, {"_id": 1}) is None:
+            return False
+
+        now = datetime.utcnow()
+        if job["created_at"] < now - timedelta(seconds=self.lease):
+            logger.warning(f"Cancelling purge job {job['id']}: user {job['user_id']} was never deleted")
+            await cancel_user_purge(job["id"])
+        else:
+            await purge_jobs_collection.update_one(
+                {"id": job["id"]},
+                {"$set": {
+                    "status": "pending",
+                    "lease_until": now + timedelta(seconds=self.poll_interval),
+                    "updated_at": now
+                }}
+            )
+        return True
+
+    async def run_job(self, job: dict):
+        if await self._user_still_exists(job):
+            return
+
+        logger.info(f"Purging data for deleted user {job['user_id']} (job {job['id']})")
+        kept = 0
+        try:
+            for collection in PURGE_COLLECTIONS:
+                kept += await self._purge_collection(job, collection)
+        except Exception as e:
+            logger.error(f"Purge job {job['id']} failed, will retry: {str(e)}")
+            await purge_jobs_collection.update_one(
+                {"id": job["id"]},
+                {"$set": {"status": "pending", "lease_until": None, "error": str(e), "updated_at": datetime.utcnow()}}
+            )
+            raise
+
+        now = datetime.utcnow()
+        if kept:
+            error = f"Kept {kept} documents whose media could not be deleted"
+            attempts = job.get("media_attempts", 0) + 1
+            if attempts >= self.media_attempts:
+                # e.g. media storage is not configured; retrying forever cannot help
+                logger.error(f"Purge job {job['id']} failed after {attempts} attempts: {error}")
+                update = {"status": "failed", "lease_until": None, "completed_at": now}
+            else:
+                logger.warning(f"Purge job {job['id']}: {error}, retrying in {self.media_retry:.0f}s")
+                update = {"status": "pending", "lease_until": now + timedelta(seconds=self.media_retry)}
+            await purge_jobs_collection.update_one(
+                {"id": job["id"]},
+                {"$set": dict(update, media_attempts=attempts, error=error, updated_at=now)}
+            )
+            return
+
+        # The deleted user's email is not needed once their data is gone
+        await purge_jobs_collection.update_one(
+            {"id": job["id"]},
+            {
+                "$set": {"status": "completed", "lease_until": None, "error": None, "updated_at": now, "completed_at": now},
+                "$unset": {"email": ""}
+            }
+        )
+        logger.info(f"Purge job {job['id']} completed")
+
+    async def _run(self):
+        while True:
+            try:
+                with query_tag("purge_worker"):
+                    job = await self._claim()
+                    if job:
+                        await self.run_job(job)
+                        continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Purge worker error: {str(e)}")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker; an interrupted job resumes when its lease expires"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+purge_worker = PurgeWorker(
+    batch_size=PURGE_BATCH_SIZE,
+    pause=PURGE_BATCH_PAUSE_SECONDS,
+    poll_interval=PURGE_POLL_SECONDS,
+    lease=PURGE_LEASE_SECONDS,
+    media_retry=PURGE_MEDIA_RETRY_SECONDS,
+    media_attempts=PURGE_MEDIA_MAX_ATTEMPTS
+)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Search latency benchmark for The Melanin Bank Content Planner
+Seeds one user with SEARCH_BENCH_DOCS ideas and posts (split evenly) into a scratch
+database, then reports p50/p95/p99 latency of GET /api/search for common queries,
+filters and deep pages, next to the unindexed regex scan it replaces.
+
+Latency is report-only by default. With SEARCH_BENCH_MAX_P95_MS set, exits non-zero
+if any search case has a p95 above it.
+
+Requires a reachable MongoDB (MONGO_URL). Uses BENCH_DB_NAME, which is dropped afterwards.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "content_planner_bench")
+
+import httpx
+
+import auth
+from database import client, db, content_ideas_collection, posts_collection
+from indexes import ensure_indexes
+from main import app
+from models import ContentIdea, Post
+
+auth.revocation_list.load_empty()
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+DOCS = int(os.environ.get("SEARCH_BENCH_DOCS", 50000))
+RUNS = int(os.environ.get("SEARCH_BENCH_RUNS", 50))
+# Unset means latency is only reported
+MAX_P95_MS = float(os.environ["SEARCH_BENCH_MAX_P95_MS"]) if os.environ.get("SEARCH_BENCH_MAX_P95_MS") else None
+USER_ID = "bench-user"
+INSERT_BATCH = 5000
+
+PILLARS = ["Money Mindset", "Budgeting", "Investing", "Credit"]
+CATEGORIES = ["Credibility", "Connection", "Community", "Conversion"]
+WORDS = (
+    "budget savings invest credit score debt income side hustle wealth retirement "
+    "emergency fund taxes mortgage rent stocks index etf dividends crypto goals "
+    "story reel carousel launch giveaway tips mistakes myths routine morning"
+).split()
+
+CASES = [
+    ("single term", {"q": "dividends"}),
+    ("two terms", {"q": "emergency fund"}),
+    ("phrase", {"q": '"side hustle"'}),
+    ("pillar filter", {"q": "budget", "pillar": "Budgeting"}),
+    ("category filter", {"q": "credit", "category": "Conversion"}),
+    ("posts only", {"q": "reel", "kind": "post"}),
+]
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def sentence(rng, length):
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+async def seed(rng):
+    ideas = DOCS // 2
+    for offset in range(0, ideas, INSERT_BATCH):
+        await content_ideas_collection.insert_many([
+            ContentIdea(
+                user_id=USER_ID,
+                month_key="2025-01",
+                text=sentence(rng, 12),
+                pillar=rng.choice(PILLARS),
+                category=rng.choice(CATEGORIES),
+            ).model_dump()
+            for _ in range(offset, min(offset + INSERT_BATCH, ideas))
+        ])
+
+    posts = DOCS - ideas
+    for offset in range(0, posts, INSERT_BATCH):
+        await posts_collection.insert_many([
+            Post(
+                user_id=USER_ID,
+                month_key=f"2025-{(i % 12) + 1:02d}",
+                date_key=f"2025-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}",
+                content_type=("post", "story", "reel")[i % 3],
+                category=rng.choice(CATEGORIES),
+                pillar=rng.choice(PILLARS),
+                topic=sentence(rng, 4),
+                caption=sentence(rng, 40),
+                notes=sentence(rng, 8),
+            ).model_dump()
+            for i in range(offset, min(offset + INSERT_BATCH, posts))
+        ])
+
+
+async def timed(operation):
+    samples = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        await operation()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def report(name, samples, hits):
+    print(
+        f"   {name:<24} {percentile(samples, 0.50) * 1000:>9.2f} {percentile(samples, 0.95) * 1000:>9.2f} "
+        f"{percentile(samples, 0.99) * 1000:>9.2f} {hits:>6}"
+    )
+
+
+async def run():
+    await db.drop_collection(content_ideas_collection.name)
+    await db.drop_collection(posts_collection.name)
+    await ensure_indexes()
+
+    print(f"Seeding {DOCS} documents for one user...")
+    await seed(random.Random(42))
+
+    token = auth.create_access_token(USER_ID, "bench@melaninbank.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    slow = []
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            print(f"\n📊 GET /api/search ({RUNS} runs each)")
+            print(f"   {'case':<24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'hits':>6}")
+            for name, params in CASES:
+                last = {}
+
+                async def search():
+                    response = await http.get("/api/search", params=params, headers=headers)
+                    assert response.status_code == 200, response.text
+                    last["page"] = response.json()
+
+                samples = await timed(search)
+                report(name, samples, len(last["page"]["items"]))
+                if MAX_P95_MS is not None and percentile(samples, 0.95) * 1000 > MAX_P95_MS:
+                    slow.append(name)
+
+            # Follow cursors to the fifth page of a broad query
+            pages = {}
+
+            async def deep_page():
+                params = {"q": "budget"}
+                for _ in range(5):
+                    response = await http.get("/api/search", params=params, headers=headers)
+                    assert response.status_code == 200, response.text
+                    pages["last"] = response.json()
+                    params["cursor"] = pages["last"]["next_cursor"]
+
+            samples = await timed(deep_page)
+            report("5 pages via cursor", samples, len(pages["last"]["items"]))
+            if MAX_P95_MS is not None and percentile(samples, 0.95) * 1000 > MAX_P95_MS:
+                slow.append("5 pages via cursor")
+
+        # What a server-side version of the client's includes() filter would cost
+        print(f"\n📊 Unindexed regex scan ({RUNS} runs each)")
+        print(f"   {'case':<24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'hits':>6}")
+        pattern = re.compile("dividends", re.IGNORECASE)
+        found = {}
+
+        async def regex_scan():
+            ideas = await content_ideas_collection.count_documents({"user_id": USER_ID, "text": pattern})
+            posts = await posts_collection.count_documents({"user_id": USER_ID, "$or": [
+                {"caption": pattern}, {"topic": pattern}, {"notes": pattern}
+            ]})
+            found["hits"] = ideas + posts
+
+        samples = await timed(regex_scan)
+        report("single term", samples, found["hits"])
+    finally:
+        await client.drop_database(db.name)
+        auth.password_pool.shutdown()
+
+    for name in slow:
+        print(f"❌ {name}: p95 above {MAX_P95_MS:.0f} ms")
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
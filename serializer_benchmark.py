@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Read path serialization benchmark for The Melanin Bank Content Planner
+Seeds SERIALIZER_BENCH_POSTS posts into one month of a scratch database, then compares
+the old response path for GET /api/posts/{month_key} (Post(**doc), response_model
+validation, stdlib JSON) with the shaped orjson path, and reports end-to-end throughput.
+
+Requires a reachable MongoDB (MONGO_URL). Uses BENCH_DB_NAME, which is dropped afterwards.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "content_planner_bench")
+
+import httpx
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+import auth
+import schema
+from database import client, db, posts_collection, get_posts_for_month
+from indexes import ensure_indexes
+from main import app
+from models import MediaUpload, Post
+from serializers import json_response, post_serializer
+
+auth.revocation_list.load_empty()
+
+POSTS = int(os.environ.get("SERIALIZER_BENCH_POSTS", 1000))
+RUNS = int(os.environ.get("SERIALIZER_BENCH_RUNS", 200))
+USER_ID = "bench-user"
+MONTH_KEY = "2025-01"
+
+# What FastAPI builds from response_model=List[Post]
+POSTS_FIELD = create_response_field(name="Response", type_=List[Post])
+
+
+async def seed_posts():
+    await posts_collection.insert_many([
+        Post(
+            user_id=USER_ID,
+            month_key=MONTH_KEY,
+            date_key=f"{MONTH_KEY}-{(i % 28) + 1:02d}",
+            content_type=("post", "story", "reel")[i % 3],
+            category="Educational",
+            pillar="Money Mindset",
+            topic=f"Topic {i}",
+            caption=f"Caption for post {i} " * 8,
+            notes="Benchmark note",
+            image=MediaUpload(url=f"https://cdn.example.com/{i}.jpg", public_id=f"bench/{i}", width=1080, height=1350),
+        ).model_dump() | {"schema_version": schema.SCHEMA_VERSIONS["posts"]}
+        for i in range(POSTS)
+    ])
+
+
+async def old_path(docs):
+    content = await serialize_response(field=POSTS_FIELD, response_content=[Post(**doc) for doc in docs])
+    return JSONResponse(content).body
+
+
+async def new_path(docs):
+    return json_response(post_serializer.shape_all(docs)).body
+
+
+async def throughput(operation):
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        await operation()
+    return RUNS / (time.perf_counter() - started)
+
+
+async def run():
+    await db.drop_collection(posts_collection.name)
+    await ensure_indexes()
+    print(f"Seeding {POSTS} posts into {MONTH_KEY}...")
+    await seed_posts()
+    # A migrated collection is what lets reads project _id away
+    schema.migrated_collections.add("posts")
+
+    try:
+        docs = await get_posts_for_month(USER_ID, MONTH_KEY)
+        old_body, new_body = await old_path(docs), await new_path(docs)
+        assert old_body == new_body, "serializers disagree"
+
+        print(f"\n📊 Serializing {len(docs)} posts ({len(new_body) / 1024:.0f} KB body, {RUNS} runs each)")
+        print(f"   {'path':<34} {'per s':>9} {'ms each':>9}")
+        old_rate = await throughput(lambda: old_path(docs))
+        new_rate = await throughput(lambda: new_path(docs))
+        print(f"   {'Post(**doc) + response_model':<34} {old_rate:>9.1f} {1000 / old_rate:>9.2f}")
+        print(f"   {'shaped + orjson':<34} {new_rate:>9.1f} {1000 / new_rate:>9.2f}")
+        print(f"   speedup {new_rate / old_rate:.1f}x")
+
+        token = auth.create_access_token(USER_ID, "bench@melaninbank.com")
+        headers = {"Authorization": f"Bearer {token}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            async def fetch():
+                response = await http.get(f"/api/posts/{MONTH_KEY}", headers=headers)
+                assert response.status_code == 200, response.text
+
+            rate = await throughput(fetch)
+        print(f"\n📊 GET /api/posts/{MONTH_KEY} end to end: {rate:.1f} requests/s")
+    finally:
+        await client.drop_database(db.name)
+        auth.password_pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
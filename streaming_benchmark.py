@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+List endpoint memory benchmark for The Melanin Bank Content Planner
+Seeds posts for one month into a scratch database, then compares peak Python memory
+of GET /api/posts/{month_key} as a buffered JSON array and as an NDJSON stream.
+
+Streaming is meant to keep peak memory flat as the result grows, so the run exits
+non-zero if the NDJSON peak at the largest size exceeds STREAM_BENCH_MAX_GROWTH
+times the peak at the smallest.
+
+Requires a reachable MongoDB (MONGO_URL). Uses BENCH_DB_NAME, which is dropped afterwards.
+"""
+
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "content_planner_bench")
+
+import auth
+from database import client, db, posts_collection
+from indexes import ensure_indexes
+from main import app
+from models import Post
+
+auth.revocation_list.load_empty()
+
+SIZES = [int(n) for n in os.environ.get("STREAM_BENCH_SIZES", "10000,50000,100000").split(",")]
+MAX_GROWTH = float(os.environ.get("STREAM_BENCH_MAX_GROWTH", 1.5))
+USER_ID = "bench-user"
+MONTH_KEY = "2025-01"
+INSERT_BATCH = 5000
+
+
+async def seed_posts(start, stop):
+    for offset in range(start, stop, INSERT_BATCH):
+        batch = [
+            Post(
+                user_id=USER_ID,
+                month_key=MONTH_KEY,
+                date_key=f"{MONTH_KEY}-{(i % 28) + 1:02d}",
+                content_type=("post", "story", "reel")[i % 3],
+                category="Educational",
+                pillar="Money Mindset",
+                topic=f"Topic {i}",
+                caption=f"Caption for post {i} " * 8,
+                notes="Benchmark note",
+            ).model_dump()
+            for i in range(offset, min(offset + INSERT_BATCH, stop))
+        ]
+        await posts_collection.insert_many(batch)
+
+
+async def fetch(token, accept):
+    """Drive the ASGI app directly so response bytes are counted, not kept"""
+    path = f"/api/posts/{MONTH_KEY}"
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"bench"),
+            (b"accept", accept.encode()),
+            (b"authorization", f"Bearer {token}".encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    received = {"status": None, "bytes": 0}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            received["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            received["bytes"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    assert received["status"] == 200, received
+    return received["bytes"]
+
+
+async def measure(token, accept):
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    size = await fetch(token, accept)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    return peak / (1024 * 1024), elapsed, size / (1024 * 1024)
+
+
+async def run():
+    token = auth.create_access_token(USER_ID, "bench@melaninbank.com")
+    await db.drop_collection(posts_collection.name)
+    await ensure_indexes()
+
+    print(f"{'docs':>8} {'mode':>7} {'peak MB':>9} {'seconds':>8} {'body MB':>8}")
+    seeded = 0
+    streamed = []
+    tracemalloc.start()
+    try:
+        for size in SIZES:
+            await seed_posts(seeded, size)
+            seeded = size
+            for mode, accept in (("json", "application/json"), ("ndjson", "application/x-ndjson")):
+                peak, elapsed, body = await measure(token, accept)
+                print(f"{size:>8} {mode:>7} {peak:>9.1f} {elapsed:>8.2f} {body:>8.1f}")
+                if mode == "ndjson":
+                    streamed.append(peak)
+    finally:
+        tracemalloc.stop()
+        await client.drop_database(db.name)
+        auth.password_pool.shutdown()
+
+    growth = streamed[-1] / streamed[0] if streamed[0] else 1.0
+    print(f"\nNDJSON peak at {SIZES[-1]} docs is {growth:.2f}x the peak at {SIZES[0]} (limit {MAX_GROWTH:.2f}x)")
+    return 0 if growth <= MAX_GROWTH else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
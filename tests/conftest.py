@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+# Backend modules import each other by module name, as when run from backend/
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+# Motor connects lazily, so importing database needs a URL but no server
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from activity_tracker import ActivityTracker
+
+
+def test_logins_are_merged_per_user():
+    tracker = ActivityTracker(collection=None, max_buffer=100)
+    earlier = datetime(2025, 1, 1, 9)
+    later = earlier + timedelta(hours=1)
+    tracker.record_login("u1", at=later)
+    tracker.record_login("u1", at=earlier)
+
+    assert tracker.stats()["pending_users"] == 1
+    user = tracker.overlay({"id": "u1", "login_count": 3, "last_active": earlier - timedelta(days=1)})
+    assert user["login_count"] == 5
+    assert user["last_active"] == later
+
+
+def test_overlay_keeps_a_newer_stored_last_active():
+    tracker = ActivityTracker(collection=None, max_buffer=100)
+    stored = datetime(2025, 1, 2)
+    tracker.record_login("u1", at=datetime(2025, 1, 1))
+
+    user = tracker.overlay({"id": "u1", "last_active": stored})
+    assert user["last_active"] == stored
+    assert user["login_count"] == 1
+
+
+def test_overlay_leaves_other_users_alone():
+    tracker = ActivityTracker(collection=None, max_buffer=100)
+    tracker.record_login("u1")
+    user = {"id": "u2", "login_count": 1}
+
+    assert tracker.overlay(user) is user
+
+
+class BlockingCollection:
+    """Holds bulk_write open until released"""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def bulk_write(self, operations, ordered=True):
+        self.started.set()
+        await self.release.wait()
+
+
+def test_overlay_includes_a_batch_that_is_being_written():
+    async def run():
+        collection = BlockingCollection()
+        tracker = ActivityTracker(collection, max_buffer=100)
+        at = datetime(2025, 1, 1, 9)
+        tracker.record_login("u1", at=at)
+
+        flush = asyncio.create_task(tracker.flush())
+        await collection.started.wait()
+        tracker.record_login("u1", at=at + timedelta(minutes=5))
+
+        user = tracker.overlay({"id": "u1", "login_count": 3, "last_active": at - timedelta(days=1)})
+        assert user["login_count"] == 5
+        assert user["last_active"] == at + timedelta(minutes=5)
+        assert tracker.stats()["flushing_users"] == 1
+
+        collection.release.set()
+        assert await flush == 1
+        assert tracker.stats()["flushing_users"] == 0
+        assert tracker.overlay({"id": "u1", "login_count": 4})["login_count"] == 5
+
+    asyncio.run(run())
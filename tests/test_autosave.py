@@ -0,0 +1,226 @@
+import asyncio
+import copy
+from datetime import datetime
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import autosave
+from autosave import AutosaveBuffer, MONTH_UNIQUE_INDEX
+from autosave_entries import apply_set, apply_unset, new_entry
+
+# Never older than the archive cutoff, so saves skip the archive
+MONTH = "2999-01"
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for key, value in query.items():
+        if key == "$or":
+            if not any(_matches(doc, clause) for clause in value):
+                return False
+        elif isinstance(value, dict) and "$lt" in value:
+            if doc.get(key) is None or not doc[key] < value["$lt"]:
+                return False
+        elif doc.get(key) != value:
+            return False
+    return True
+
+
+def _set_path(doc: dict, path: str, value):
+    keys = path.split(".")
+    for key in keys[:-1]:
+        doc = doc.setdefault(key, {})
+    doc[keys[-1]] = copy.deepcopy(value)
+
+
+def _unset_path(doc: dict, path: str):
+    keys = path.split(".")
+    for key in keys[:-1]:
+        doc = doc.get(key)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(keys[-1], None)
+
+
+def _apply(doc: dict, update: dict):
+    for path, value in update.get("$set", {}).items():
+        _set_path(doc, path, value)
+    for path in update.get("$unset", {}):
+        _unset_path(doc, path)
+
+
+class _Months:
+    """An in-memory monthly_data with its unique (user_id, month_key) index.
+
+    Every operation yields to the event loop first, so flushes running in
+    different buffers interleave the way two workers' flushes do.
+    """
+
+    def __init__(self, docs=()):
+        self.docs = [copy.deepcopy(doc) for doc in docs]
+
+    def _find(self, query):
+        return next((doc for doc in self.docs if _matches(doc, query)), None)
+
+    async def find_one(self, query, projection=None):
+        await asyncio.sleep(0)
+        doc = self._find(query)
+        return copy.deepcopy(doc) if doc else None
+
+    async def update_one(self, query, update):
+        await asyncio.sleep(0)
+        doc = self._find(query)
+        if doc is not None:
+            _apply(doc, update)
+
+        class Result:
+            matched_count = int(doc is not None)
+        return Result()
+
+    async def bulk_write(self, operations, ordered=True):
+        errors = []
+        for index, operation in enumerate(operations):
+            await asyncio.sleep(0)
+            query, update = operation._filter, operation._doc
+            doc = self._find(query)
+            if doc is not None:
+                _apply(doc, update)
+                continue
+            key = {"user_id": query["user_id"], "month_key": query["month_key"]}
+            if self._find(key) is not None:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key"})
+                continue
+            doc = dict(key, _id=len(self.docs) + 1)
+            _apply(doc, {"$set": update["$setOnInsert"]})
+            _apply(doc, update)
+            self.docs.append(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": 0, "nUpserted": 0})
+
+
+@pytest.fixture
+def bumps(monkeypatch):
+    """Buffers as they run once the unique index is built, recording counter bumps"""
+    recorded = []
+
+    async def bump_change_counters(user_id, scopes):
+        recorded.append((user_id, list(scopes)))
+
+    async def upgrade_stored_month(user_id, month_key):
+        pass
+
+    monkeypatch.setattr(autosave, "bump_change_counters", bump_change_counters)
+    monkeypatch.setattr(autosave, "upgrade_stored_month", upgrade_stored_month)
+    monkeypatch.setitem(autosave.index_status, "ready", [MONTH_UNIQUE_INDEX])
+    return recorded
+
+
+def test_overlay_applies_buffered_saves_without_touching_the_stored_month():
+    buffer = AutosaveBuffer(collection=None)
+    entry = new_entry("m1", None)
+    apply_set(entry, "goals.followers", 10)
+    apply_unset(entry, "themes")
+    buffer._pending[("u1", "2025-01")] = entry
+    stored = {"id": "m1", "themes": "Money", "goals": {"reach": 5}}
+
+    data = buffer.overlay("u1", "2025-01", stored)
+
+    assert data["goals"] == {"reach": 5, "followers": 10}
+    assert "themes" not in data
+    assert stored == {"id": "m1", "themes": "Money", "goals": {"reach": 5}}
+
+
+def test_saves_are_not_buffered_until_the_unique_index_is_ready(monkeypatch):
+    buffer = AutosaveBuffer(collection=None)
+    monkeypatch.setitem(autosave.index_status, "ready", [])
+    assert not buffer.coalescing()
+
+    monkeypatch.setitem(autosave.index_status, "ready", [MONTH_UNIQUE_INDEX])
+    assert buffer.coalescing()
+
+
+def test_month_stays_pending_until_its_counter_is_bumped(monkeypatch):
+    bumps = []
+    fail = {"bump": True}
+
+    async def bump_change_counters(user_id, scopes):
+        if fail["bump"]:
+            raise RuntimeError("mongo is down")
+        bumps.append((user_id, list(scopes)))
+
+    monkeypatch.setattr(autosave, "bump_change_counters", bump_change_counters)
+    buffer = AutosaveBuffer(collection=_Months())
+    entry = new_entry("m1", None)
+    apply_set(entry, "themes", "Money")
+    buffer._pending[("u1", MONTH)] = entry
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await buffer.flush(force=True)
+        assert buffer.has_pending("u1", MONTH)
+        assert buffer.stats()["months_written"] == 1
+
+        fail["bump"] = False
+        await buffer.flush()
+        assert not buffer.has_pending("u1", MONTH)
+
+    asyncio.run(run())
+    assert bumps == [("u1", [f"months:{MONTH}"])]
+
+
+def test_counter_moves_when_a_burst_of_saves_starts(bumps):
+    buffer = AutosaveBuffer(collection=_Months())
+
+    async def run():
+        await buffer.patch("u1", MONTH, {"themes": "Money"})
+        assert len(bumps) == 1
+        await buffer.patch("u1", MONTH, {"themes": "Money moves"})
+        assert len(bumps) == 1
+        await buffer.flush(force=True)
+
+    asyncio.run(run())
+    assert bumps == [("u1", [f"months:{MONTH}"])] * 2
+
+
+STORED = {
+    "_id": 1, "id": "m1", "user_id": "u1", "month_key": MONTH,
+    "updated_at": datetime(2025, 1, 1), "themes": "Old", "notes": "Old notes"
+}
+
+
+def test_stale_flush_keeps_what_a_newer_save_changed(bumps):
+    months = _Months([STORED])
+    older, newer = AutosaveBuffer(collection=months), AutosaveBuffer(collection=months)
+
+    async def run():
+        await older.patch("u1", MONTH, {"themes": "Older", "notes": "Older notes"})
+        await newer.patch("u1", MONTH, {"themes": "Newer"})
+        await newer.flush(force=True)
+        await older.flush(force=True)
+
+    asyncio.run(run())
+    [month] = months.docs
+    assert month["themes"] == "Newer"
+    assert month["notes"] == "Older notes"
+    assert older.stats()["superseded"] == 1
+    assert older.stats()["conflicting_paths"] == 1
+
+
+@pytest.mark.parametrize("newer_first", [False, True], ids=["older writes first", "newer writes first"])
+@pytest.mark.parametrize("stored", [[STORED], []], ids=["existing month", "new month"])
+def test_concurrent_flushes_keep_both_workers_saves(bumps, stored, newer_first):
+    months = _Months(stored)
+    first, second = AutosaveBuffer(collection=months), AutosaveBuffer(collection=months)
+
+    async def run():
+        await first.patch("u1", MONTH, {"themes": "First", "notes": "First notes"})
+        await second.patch("u1", MONTH, {"themes": "Second", "goals": {"reach": 5}})
+        flushes = [first.flush(force=True), second.flush(force=True)]
+        await asyncio.gather(*(reversed(flushes) if newer_first else flushes))
+
+    asyncio.run(run())
+    [month] = months.docs
+    assert month["themes"] == "Second"
+    assert month["notes"] == "First notes"
+    assert month["goals"] == {"reach": 5}
+    assert not first.has_pending("u1", MONTH) and not second.has_pending("u1", MONTH)
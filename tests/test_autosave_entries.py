@@ -0,0 +1,84 @@
+from autosave_entries import apply_set, apply_unset, fold, new_entry, unchanged_paths, view
+
+
+def test_later_set_replaces_paths_below_it():
+    entry = new_entry("m1", None)
+    apply_set(entry, "goals.followers", 10)
+    apply_unset(entry, "goals.posts")
+    apply_set(entry, "goals", {"reach": 5})
+
+    assert entry["sets"] == {"goals": {"reach": 5}}
+    assert entry["unsets"] == set()
+
+
+def test_set_below_a_set_object_merges_into_it():
+    entry = new_entry("m1", None)
+    apply_set(entry, "goals", {"reach": 5})
+    apply_set(entry, "goals.followers", 10)
+    apply_unset(entry, "goals.reach")
+
+    assert entry["sets"] == {"goals": {"followers": 10}}
+    assert entry["unsets"] == set()
+
+
+def test_set_below_an_unset_recreates_the_object():
+    entry = new_entry("m1", None)
+    apply_unset(entry, "goals")
+    apply_set(entry, "goals.followers", 10)
+
+    assert entry["sets"] == {"goals": {"followers": 10}}
+    assert entry["unsets"] == set()
+
+
+def test_unset_replaces_a_pending_set():
+    entry = new_entry("m1", None)
+    apply_set(entry, "themes", "Money")
+    apply_set(entry, "goals.followers", 10)
+    apply_unset(entry, "themes")
+    apply_unset(entry, "goals")
+
+    assert entry["sets"] == {}
+    assert entry["unsets"] == {"themes", "goals"}
+
+
+def test_unchanged_paths_leave_what_a_newer_save_changed():
+    entry = new_entry("m1", {"themes": "Old", "goals": {"followers": 1, "reach": 2}, "notes": "n"})
+    apply_set(entry, "themes", "Mine")
+    apply_set(entry, "goals.followers", 10)
+    apply_unset(entry, "notes")
+    stored = {"themes": "Theirs", "goals": {"followers": 1, "reach": 3}, "notes": "n"}
+
+    sets, unsets = unchanged_paths(entry, stored)
+
+    assert sets == {"goals.followers": 10}
+    assert unsets == {"notes"}
+
+
+def test_fold_applies_newer_saves_over_an_entry():
+    entry = new_entry("m1", None)
+    apply_set(entry, "goals", {"reach": 5})
+    apply_set(entry, "themes", "Money")
+    newer = new_entry("m1", None)
+    apply_set(newer, "goals.followers", 10)
+    apply_unset(newer, "themes")
+    newer["saves"] = 2
+
+    fold(entry, newer)
+
+    assert entry["sets"] == {"goals": {"reach": 5, "followers": 10}}
+    assert entry["unsets"] == {"themes"}
+    assert entry["saves"] == 2
+    assert entry["updated_at"] == newer["updated_at"]
+
+
+def test_view_applies_an_entry_to_its_base():
+    base = {"id": "m1", "themes": "Money", "goals": {"reach": 5}}
+    entry = new_entry("m1", base)
+    apply_set(entry, "goals.followers", 10)
+    apply_unset(entry, "themes")
+
+    month = view(entry)
+
+    assert month["goals"] == {"reach": 5, "followers": 10}
+    assert "themes" not in month
+    assert base == {"id": "m1", "themes": "Money", "goals": {"reach": 5}}
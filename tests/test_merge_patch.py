@@ -0,0 +1,31 @@
+import pytest
+
+from database import merge_patch_update
+
+
+def test_nested_objects_merge_key_by_key():
+    sets, unsets = merge_patch_update({"goals": {"followers": 500, "posts": None}, "themes": "Money"})
+
+    assert sets == {"goals.followers": 500, "themes": "Money"}
+    assert unsets == {"goals.posts": ""}
+
+
+def test_arrays_and_scalars_replace_the_value():
+    sets, unsets = merge_patch_update({"posts": {"2025-01-02": [{"id": "p1"}]}, "count": 0, "flag": False})
+
+    assert sets == {"posts.2025-01-02": [{"id": "p1"}], "count": 0, "flag": False}
+    assert unsets == {}
+
+
+def test_empty_object_changes_nothing():
+    assert merge_patch_update({"goals": {}}) == ({}, {})
+
+
+def test_null_removes_a_whole_object():
+    assert merge_patch_update({"analytics": None}) == ({}, {"analytics": ""})
+
+
+@pytest.mark.parametrize("patch", [{"": 1}, {"a.b": 1}, {"$set": {"a": 1}}, {"goals": {"$inc": 1}}])
+def test_keys_mongo_cannot_address_are_rejected(patch):
+    with pytest.raises(ValueError):
+        merge_patch_update(patch)
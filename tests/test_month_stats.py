@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime
+
+import database
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for key, value in query.items():
+        if key == "$or":
+            if not any(_matches(doc, clause) for clause in value):
+                return False
+        elif isinstance(value, dict):
+            if "$gte" in value and not doc.get(key, "") >= value["$gte"]:
+                return False
+            if "$lte" in value and not doc.get(key, "") <= value["$lte"]:
+                return False
+        elif doc.get(key) != value:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield dict(doc)
+
+
+class _MonthStats:
+    """Just enough of a month_stats collection for the fenced rebuild"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.before_write = None
+
+    def find(self, query, projection=None):
+        return _Cursor([doc for doc in self.docs if _matches(doc, query)])
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.before_write is not None:
+            hook, self.before_write = self.before_write, None
+            hook()
+        for request in requests:
+            found = [doc for doc in self.docs if _matches(doc, request._filter)]
+            kind = type(request).__name__
+            if kind == "DeleteOne":
+                self.docs[:] = [doc for doc in self.docs if doc not in found[:1]]
+            elif kind == "ReplaceOne":
+                if found:
+                    self.docs[self.docs.index(found[0])] = dict(request._doc)
+            elif not found:
+                self.docs.append(dict(request._doc["$setOnInsert"]))
+
+
+def _post(content_type):
+    return {"month_key": "2025-01", "content_type": content_type, "category": None, "pillar": None}
+
+
+def _use(monkeypatch, collection, posts):
+    async def count_month_stats(match):
+        expected = {}
+        for post in posts:
+            if _matches({"user_id": "u1", "month_key": post["month_key"]}, match):
+                database._add_post_stats(expected, "u1", post, 1)
+        return expected
+
+    monkeypatch.setattr(database, "month_stats_collection", collection)
+    monkeypatch.setattr(database, "_count_month_stats", count_month_stats)
+
+
+def test_rebuild_recounts_a_month_written_while_it_was_counted(monkeypatch):
+    stored = {
+        "user_id": "u1", "month_key": "2025-01", "updated_at": datetime(2025, 1, 1),
+        "total": 1, "content_types": {"post": 1}, "categories": {}, "pillars": {}
+    }
+    collection = _MonthStats([stored])
+    posts = [_post("post"), _post("reel")]
+    _use(monkeypatch, collection, posts)
+
+    def create_post():
+        # create_post lands between the count and the rewrite
+        posts.append(_post("story"))
+        stored.update({"total": 2, "updated_at": datetime(2025, 1, 2)})
+        stored["content_types"]["story"] = 1
+
+    collection.before_write = create_post
+    report = asyncio.run(database.rebuild_month_stats())
+
+    assert report["repaired"] == 1
+    [month] = collection.docs
+    assert month["total"] == 3
+    assert month["content_types"] == {"post": 1, "reel": 1, "story": 1}
+
+
+def test_rebuild_removes_counters_of_emptied_months(monkeypatch):
+    collection = _MonthStats([{
+        "user_id": "u1", "month_key": "2025-01", "updated_at": datetime(2025, 1, 1),
+        "total": 1, "content_types": {"post": 1}
+    }])
+    _use(monkeypatch, collection, [])
+
+    report = asyncio.run(database.rebuild_month_stats())
+
+    assert report["repaired"] == 1
+    assert collection.docs == []
+
+
+def test_content_stats_are_counted_from_posts_until_the_backfill_is_done(monkeypatch):
+    collection = _MonthStats([{"user_id": "u1", "month_key": "2025-01", "total": 1, "content_types": {"post": 1}}])
+    _use(monkeypatch, collection, [_post("post"), _post("reel")])
+    monkeypatch.setitem(database.month_stats_status, "backfilled", False)
+
+    stats = asyncio.run(database.get_content_stats("u1"))
+    assert stats["content_types"] == {"post": 1, "reel": 1}
+
+    monkeypatch.setitem(database.month_stats_status, "backfilled", True)
+    stats = asyncio.run(database.get_content_stats("u1"))
+    assert stats["content_types"] == {"post": 1}
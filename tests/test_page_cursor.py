@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import pytest
+
+from database import decode_page_cursor, encode_page_cursor
+
+
+def test_cursor_round_trips_the_sort_key():
+    created_at = datetime(2025, 1, 15, 9, 30, 12, 345000)
+    cursor = encode_page_cursor({"created_at": created_at, "id": "abc"})
+
+    assert decode_page_cursor(cursor) == (created_at, "abc")
+
+
+def test_missing_created_at_round_trips_as_none():
+    cursor = encode_page_cursor({"id": "legacy"})
+
+    assert decode_page_cursor(cursor) == (None, "legacy")
+
+
+def test_string_created_at_is_encoded_as_none():
+    # The stored sort key is what matters; strings are not dates to Mongo's sort
+    cursor = encode_page_cursor({"created_at": "2025-01-15", "id": "abc"})
+
+    assert decode_page_cursor(cursor) == (None, "abc")
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "W10=", "WyJ4IiwgImEiXQ=="])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_page_cursor(cursor)
@@ -0,0 +1,73 @@
+from query_monitor import QueryStats, filter_shape, redact_plan
+
+
+def test_filter_shape_keeps_operators_and_drops_literals():
+    shape = filter_shape({"user_id": "u1", "month_key": {"$gte": "2025-01", "$lte": "2025-12"}, "tags": ["a", "b"]})
+
+    assert shape == {"user_id": "str", "month_key": {"$gte": "str", "$lte": "str"}, "tags": ["str"]}
+
+
+def test_redact_plan_removes_bounds_and_filter_literals():
+    plan = {
+        "stage": "FETCH",
+        "filter": {"approval_status": {"$eq": "denied"}},
+        "inputStage": {
+            "stage": "IXSCAN",
+            "keyPattern": {"email": 1},
+            "indexName": "email_unique",
+            "direction": "forward",
+            "indexBounds": {"email": ['["victim@example.com", "victim@example.com"]']},
+        },
+    }
+
+    redacted = redact_plan(plan)
+
+    assert "victim@example.com" not in repr(redacted)
+    assert "denied" not in repr(redacted)
+    assert redacted["filter"] == {"approval_status": {"$eq": "str"}}
+    scan = redacted["inputStage"]
+    assert scan["indexBounds"] == {"email": ["[?, ?]"]}
+    assert scan["keyPattern"] == {"email": 1}
+    assert scan["indexName"] == "email_unique"
+
+
+def test_redact_plan_keeps_open_bounds_and_text_stages_redacted():
+    plan = {
+        "stage": "TEXT_MATCH",
+        "indexPrefix": {"user_id": "u1"},
+        "parsedTextQuery": {"terms": ["dividends"]},
+        "inputStages": [{
+            "stage": "IXSCAN",
+            "indexBounds": {"user_id": ['["u1", "u1"]'], "created_at": ["[MinKey, MaxKey]", "(-inf, inf)"]},
+        }],
+    }
+
+    redacted = redact_plan(plan)
+
+    assert "u1" not in repr(redacted)
+    assert "dividends" not in repr(redacted)
+    assert redacted["inputStages"][0]["indexBounds"]["created_at"] == ["[MinKey, MaxKey]", "(-inf, inf)"]
+
+
+def test_latency_histogram_percentiles():
+    stats = QueryStats()
+    for ms in (0.5, 0.8, 3, 40, 7000):
+        stats.record(ms)
+
+    summary = stats.as_dict()
+    assert summary["count"] == 5
+    assert summary["p50_ms"] == 5
+    assert summary["p99_ms"] == 7000
+    assert summary["histogram"]["le_1ms"] == 2
+    assert summary["histogram"]["inf"] == 1
+
+
+def test_bytes_are_none_unless_measured():
+    unmeasured = QueryStats()
+    unmeasured.record(1, documents=3)
+    assert unmeasured.as_dict()["bytes_returned"] is None
+
+    measured = QueryStats()
+    measured.record(1, documents=0, size=0)
+    measured.record(1, documents=1, size=120)
+    assert measured.as_dict()["bytes_returned"] == 120
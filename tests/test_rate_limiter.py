@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import rate_limiter
+from rate_limiter import SlidingWindowLimiter
+
+
+def test_hits_over_the_limit_are_rejected_until_the_window_slides():
+    limiter = SlidingWindowLimiter(limit=2, window=60)
+
+    assert limiter.hit("k", now=0) == 0
+    assert limiter.hit("k", now=1) == 0
+    assert limiter.hit("k", now=2) == 58
+    # Halfway through the next window half of the previous count still applies
+    assert limiter.hit("k", now=90) == 0
+    assert limiter.hit("k", now=91) == 0
+    assert limiter.hit("k", now=92) == 28
+
+
+def test_previous_window_is_forgotten_after_a_gap():
+    limiter = SlidingWindowLimiter(limit=1, window=60)
+    limiter.hit("k", now=0)
+
+    assert limiter.hit("k", now=130) == 0
+
+
+def test_release_gives_back_a_counted_attempt():
+    limiter = SlidingWindowLimiter(limit=1, window=60)
+
+    assert limiter.hit("k", now=0) == 0
+    limiter.release("k", now=1)
+    assert limiter.hit("k", now=2) == 0
+    assert limiter.hit("k", now=3) == 57
+
+
+def test_release_after_the_window_rolled_over_uses_the_previous_window():
+    limiter = SlidingWindowLimiter(limit=1, window=60)
+    limiter.hit("k", now=59)
+    limiter.release("k", now=61)
+
+    assert limiter.hit("k", now=62) == 0
+    limiter.release("unknown", now=62)
+    assert limiter.stats()["tracked_keys"] == 1
+
+
+def test_least_recently_used_keys_are_evicted():
+    limiter = SlidingWindowLimiter(limit=1, window=60, max_keys=2)
+    limiter.hit("a", now=0)
+    limiter.hit("b", now=0)
+    limiter.hit("a", now=1)
+    limiter.hit("c", now=1)
+
+    assert limiter.stats()["evicted"] == 1
+    assert limiter.hit("a", now=2) == 58
+    assert limiter.hit("b", now=2) == 0
+
+
+def test_successful_logins_do_not_count_against_the_email(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "email_login_limiter", SlidingWindowLimiter(limit=2, window=60))
+    monkeypatch.setattr(rate_limiter, "ip_login_limiter", SlidingWindowLimiter(limit=100, window=60))
+
+    for _ in range(10):
+        rate_limiter.check_login_rate_limit("Victim@example.com", "10.0.0.1")
+        rate_limiter.release_login_attempt("victim@example.com ")
+
+    rate_limiter.check_login_rate_limit("victim@example.com", "10.0.0.2")
+    rate_limiter.check_login_rate_limit("VICTIM@example.com", "10.0.0.2")
+    with pytest.raises(HTTPException) as error:
+        rate_limiter.check_login_rate_limit("victim@example.com", "10.0.0.2")
+    assert error.value.status_code == 429
+
+
+def test_concurrent_failures_cannot_outrun_the_email_limit(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "email_login_limiter", SlidingWindowLimiter(limit=3, window=60))
+    monkeypatch.setattr(rate_limiter, "ip_login_limiter", SlidingWindowLimiter(limit=100, window=60))
+
+    async def failed_login(client_ip):
+        try:
+            rate_limiter.check_login_rate_limit("victim@example.com", client_ip)
+        except HTTPException as e:
+            return e.status_code
+        # Every attempt is past the limiter before any password check finishes
+        await asyncio.sleep(0.01)
+        return 401
+
+    async def run():
+        return await asyncio.gather(*(failed_login(f"10.0.0.{i}") for i in range(10)))
+
+    statuses = asyncio.run(run())
+    assert statuses.count(401) == 3
+    assert statuses.count(429) == 7
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth
+import principals
+from auth import RevocationList
+
+
+def test_tombstones_expire_with_the_token_lifetime():
+    revocations = RevocationList(tombstone_ttl=timedelta(hours=24))
+    now = datetime.utcnow()
+    revocations.mark_deleted("old", at=now - timedelta(hours=25))
+    revocations.mark_deleted("recent", at=now - timedelta(hours=1))
+
+    revocations.load_empty()
+
+    assert not revocations.is_revoked({"user_id": "old"})
+    assert revocations.is_revoked({"user_id": "recent"})
+    assert revocations.stats()["deleted_users"] == 1
+
+
+def test_bumped_token_version_revokes_older_tokens():
+    revocations = RevocationList()
+    revocations.replace(set(), {"u1": 2})
+
+    assert revocations.is_revoked({"user_id": "u1", "tv": 1})
+    assert not revocations.is_revoked({"user_id": "u1", "tv": 2})
+
+
+def _credentials(user_id: str, role: str) -> HTTPAuthorizationCredentials:
+    token = auth.create_access_token(user_id, f"{user_id}@example.com", role=role)
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+@pytest.fixture
+def unloaded(monkeypatch):
+    monkeypatch.setattr(auth, "revocation_list", RevocationList())
+    monkeypatch.setattr(principals, "revocation_list", auth.revocation_list)
+    users = {}
+
+    async def get_user_principal(user_id):
+        return users.get(user_id)
+
+    monkeypatch.setattr(auth, "get_user_principal", get_user_principal)
+    monkeypatch.setattr(principals, "get_user_principal", get_user_principal)
+    return users
+
+
+def test_unloaded_list_checks_the_database(unloaded):
+    unloaded["u1"] = {"user_id": "u1", "is_admin": False, "is_active": False, "approval_status": "approved"}
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(auth.get_current_user(_credentials("u1", "user")))
+    assert error.value.status_code == 401
+
+
+def test_unloaded_list_does_not_trust_admin_claims(unloaded):
+    unloaded["u1"] = {"user_id": "u1", "is_admin": False, "is_active": True, "approval_status": "approved"}
+
+    async def resolve():
+        current_user = await auth.get_current_user(_credentials("u1", "admin"))
+        return await principals.get_current_principal(current_user)
+
+    assert asyncio.run(resolve())["is_admin"] is False
@@ -0,0 +1,38 @@
+from bson import ObjectId
+
+import database
+import schema
+
+
+def test_legacy_document_gets_its_id_from_mongo_id(monkeypatch):
+    monkeypatch.setattr(schema, "pending_write_backs", {})
+    stored = {"_id": ObjectId(), "userId": "u1", "monthKey": "2025-01", "type": "reel", "imageUrl": "https://x/y.png"}
+
+    post = schema.upgrade_document("posts", stored)
+
+    assert post["id"] == str(stored["_id"])
+    assert post["user_id"] == "u1"
+    assert post["month_key"] == "2025-01"
+    assert post["content_type"] == "reel"
+    assert post["image"] == {"url": "https://x/y.png", "public_id": ""}
+    assert post["schema_version"] == schema.SCHEMA_VERSIONS["posts"]
+    # Reading it twice gives the same id, and the write-back stores it
+    assert schema.upgrade_document("posts", stored)["id"] == post["id"]
+    _, update = schema.pending_write_backs[("posts", stored["_id"])]
+    assert update["$set"]["id"] == post["id"]
+    assert set(update["$unset"]) == {"userId", "monthKey", "type", "imageUrl"}
+
+
+def test_reads_keep_mongo_id_until_the_collection_is_migrated(monkeypatch):
+    migrated = set()
+    monkeypatch.setattr(database, "migrated_collections", migrated)
+
+    assert database.read_projection("posts") is None
+    migrated.add("posts")
+    assert database.read_projection("posts") == {"_id": 0}
+
+
+def test_current_documents_are_returned_as_is():
+    doc = {"id": "p1", "schema_version": schema.SCHEMA_VERSIONS["posts"]}
+
+    assert schema.upgrade_document("posts", doc) is doc
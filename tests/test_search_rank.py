@@ -0,0 +1,56 @@
+import pytest
+
+from database import _after_search_rank, decode_search_cursor, encode_search_cursor
+
+
+def _ranked_after(doc: dict, kind: str, after: tuple) -> bool:
+    """Evaluate the filter _after_search_rank builds against one document"""
+    def matches(condition: dict) -> bool:
+        for field, test in condition.items():
+            if field == "$or":
+                if not any(matches(branch) for branch in test):
+                    return False
+            elif isinstance(test, dict):
+                ((op, value),) = test.items()
+                if op == "$lt" and not doc[field] < value:
+                    return False
+                if op == "$lte" and not doc[field] <= value:
+                    return False
+                if op == "$gt" and not doc[field] > value:
+                    return False
+            elif doc[field] != test:
+                return False
+        return True
+
+    return matches(_after_search_rank(kind, after))
+
+
+def _rank(hit: dict) -> tuple:
+    return -hit["score"], hit["kind"], hit["id"]
+
+
+HITS = [
+    {"score": score, "kind": kind, "id": item_id}
+    for score in (2.0, 1.5, 1.0)
+    for kind in ("idea", "post")
+    for item_id in ("a", "b")
+]
+
+
+@pytest.mark.parametrize("last", HITS)
+def test_filter_matches_exactly_the_hits_ranked_after_the_cursor(last):
+    for hit in HITS:
+        expected = _rank(hit) > _rank(last)
+        assert _ranked_after(hit, hit["kind"], (last["score"], last["kind"], last["id"])) == expected, hit
+
+
+def test_cursor_round_trips_the_rank():
+    cursor = encode_search_cursor({"score": 1.25, "kind": "post", "id": "abc", "text": "ignored"})
+
+    assert decode_search_cursor(cursor) == (1.25, "post", "abc")
+
+
+@pytest.mark.parametrize("cursor", ["", "W10=", "WyJ4IiwgInBvc3QiLCAiYSJd"])
+def test_malformed_search_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_search_cursor(cursor)
@@ -0,0 +1,53 @@
+import time
+
+from auth import TokenCache
+
+
+def test_hit_returns_a_copy_of_the_payload():
+    cache = TokenCache(max_size=4)
+    cache.put("token", {"user_id": "u1", "exp": time.time() + 60})
+
+    payload = cache.get("token")
+    payload["user_id"] = "changed"
+
+    assert cache.get("token")["user_id"] == "u1"
+    assert cache.stats()["hits"] == 2
+
+
+def test_expired_entry_is_a_miss_and_dropped():
+    cache = TokenCache(max_size=4)
+    cache.put("token", {"user_id": "u1", "exp": time.time() - 1})
+
+    assert cache.get("token") is None
+    stats = cache.stats()
+    assert stats["expired"] == 1
+    assert stats["size"] == 0
+
+
+def test_payload_without_exp_is_not_cached():
+    cache = TokenCache(max_size=4)
+    cache.put("token", {"user_id": "u1"})
+
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TokenCache(max_size=2)
+    exp = time.time() + 60
+    cache.put("a", {"user_id": "a", "exp": exp})
+    cache.put("b", {"user_id": "b", "exp": exp})
+    cache.get("a")
+    cache.put("c", {"user_id": "c", "exp": exp})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evicted"] == 1
+
+
+def test_zero_size_disables_the_cache():
+    cache = TokenCache(max_size=0)
+    cache.put("token", {"user_id": "u1", "exp": time.time() + 60})
+
+    assert cache.get("token") is None